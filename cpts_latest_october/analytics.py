@@ -0,0 +1,141 @@
+import threading
+from datetime import date
+
+import numpy as np
+
+# Status codes in the matrix; 0 means no mark was taken for that student in that session.
+NONE, PRESENT, ABSENT_INFORMED, ABSENT_UNINFORMED = 0, 1, 2, 3
+STATUS_CODES = {"Present": PRESENT, "Absent Informed": ABSENT_INFORMED, "Absent Uninformed": ABSENT_UNINFORMED}
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+
+# One row per session, walking the (subject_id, date, student_id, status) covering index. Each
+# mark is packed as student_id * 4 + code so the whole table comes back as ~one string per class
+# meeting and is converted by NumPy in one call, rather than building a Python tuple per
+# attendance row. Archived years are separate tables with the same index; each is grouped on its
+# own and the results concatenated (a session never spans two files).
+LOAD_QUERY = """
+    SELECT CAST(julianday(date) - 2440587.5 AS INTEGER), subject_id,
+           group_concat(student_id * 4 + CASE status WHEN 'Present' THEN 1 WHEN 'Absent Informed' THEN 2 ELSE 3 END)
+    FROM {table} GROUP BY subject_id, date
+"""
+
+
+def _day(iso):
+    return (date.fromisoformat(iso) - date(1970, 1, 1)).days
+
+
+# students x sessions int8 matrix of attendance codes, where a session is one (date, subject)
+# class meeting. Sessions are appended as they appear, so anything order-sensitive goes through
+# select(), which returns columns sorted by (date, subject).
+class AttendanceMatrix:
+    def __init__(self, student_ids, session_days, session_subjects, matrix):
+        self.student_ids = np.asarray(student_ids, dtype=np.int64)
+        self.session_days = np.asarray(session_days, dtype=np.int64)
+        self.session_subjects = np.asarray(session_subjects, dtype=np.int64)
+        self.matrix = matrix
+        self.student_index = {int(s): i for i, s in enumerate(self.student_ids)}
+        self.session_index = {(int(d), int(s)): j for j, (d, s) in enumerate(zip(self.session_days, self.session_subjects))}
+
+    @classmethod
+    def load(cls, conn, tables=("attendance",)):
+        sessions = conn.execute(" UNION ALL ".join(LOAD_QUERY.format(table=t) for t in tables)).fetchall()
+        counts = np.array([r[2].count(",") + 1 for r in sessions], dtype=np.int64)
+        packed = np.array(",".join(r[2] for r in sessions).split(","), dtype=np.int64) if sessions else np.zeros(0, dtype=np.int64)
+        student_of, code = packed >> 2, (packed & 3).astype(np.int8)
+        students = np.union1d(np.array([r[0] for r in conn.execute("SELECT id FROM students")], dtype=np.int64), student_of)
+        matrix = np.zeros((len(students), len(sessions)), dtype=np.int8)
+        matrix[np.searchsorted(students, student_of), np.repeat(np.arange(len(sessions)), counts)] = code
+        return cls(students, [r[0] for r in sessions], [r[1] for r in sessions], matrix)
+
+    # rows are (iso_date, subject_id, student_id, status) as written by save_attendance_sheets.
+    def apply(self, rows):
+        new_students = sorted({sid for _, _, sid, _ in rows if sid not in self.student_index})
+        new_sessions = sorted({(_day(d), subject) for d, subject, _, _ in rows} - self.session_index.keys())
+        if new_students or new_sessions:
+            grown = np.zeros((len(self.student_ids) + len(new_students), len(self.session_days) + len(new_sessions)), dtype=np.int8)
+            grown[:self.matrix.shape[0], :self.matrix.shape[1]] = self.matrix
+            for sid in new_students:
+                self.student_index[sid] = len(self.student_index)
+            for key in new_sessions:
+                self.session_index[key] = len(self.session_index)
+            self.student_ids = np.append(self.student_ids, new_students).astype(np.int64)
+            self.session_days = np.append(self.session_days, [d for d, _ in new_sessions]).astype(np.int64)
+            self.session_subjects = np.append(self.session_subjects, [s for _, s in new_sessions]).astype(np.int64)
+            self.matrix = grown
+        for d, subject, sid, status in rows:
+            self.matrix[self.student_index[sid], self.session_index[(_day(d), subject)]] = STATUS_CODES[status]
+
+    def select(self, subject_id=None, start=None, end=None):
+        mask = np.ones(len(self.session_days), dtype=bool)
+        if subject_id is not None: mask &= self.session_subjects == subject_id
+        if start: mask &= self.session_days >= _day(start)
+        if end: mask &= self.session_days < _day(end)
+        cols = np.flatnonzero(mask)
+        return cols[np.lexsort((self.session_subjects[cols], self.session_days[cols]))]
+
+    # Per-student counts, percentage, eligibility and absence streaks over the selected sessions,
+    # for every student at once. Sessions with no mark neither extend nor break a streak.
+    def student_stats(self, cols, threshold=75.0):
+        m = self.matrix[:, cols]
+        present = (m == PRESENT).sum(axis=1)
+        informed = (m == ABSENT_INFORMED).sum(axis=1)
+        uninformed = (m == ABSENT_UNINFORMED).sum(axis=1)
+        recorded = present + informed + uninformed
+        with np.errstate(invalid="ignore", divide="ignore"):
+            percentage = np.where(recorded > 0, 100.0 * present / recorded, np.nan)
+        # Classes to attend in a row to get back to the threshold (< 100): smallest n with (p + n) / (r + n) >= t.
+        t = threshold / 100.0
+        needed = np.where(percentage < threshold, np.ceil((t * recorded - present) / (1 - t)), 0)
+        absent = m >= ABSENT_INFORMED
+        if m.shape[1]:
+            count = np.cumsum(absent, axis=1, dtype=np.int32)
+            last_reset = np.maximum.accumulate(np.where(m == PRESENT, count, 0), axis=1)
+            run = count - last_reset
+            longest, current = run.max(axis=1), run[:, -1]
+        else:
+            longest = current = np.zeros(len(self.student_ids), dtype=np.int32)
+        return {"student_id": self.student_ids, "present": present, "absent_informed": informed, "absent_uninformed": uninformed,
+                "recorded": recorded, "percentage": percentage, "classes_needed": needed.astype(np.int64),
+                "longest_absence_streak": longest, "current_absence_streak": current}
+
+    # subject x weekday attendance rate over the selected sessions.
+    def weekday_heatmap(self, cols):
+        m = self.matrix[:, cols]
+        present = (m == PRESENT).sum(axis=0)
+        recorded = (m != NONE).sum(axis=0)
+        subjects, subject_idx = np.unique(self.session_subjects[cols], return_inverse=True)
+        weekday = (self.session_days[cols] + 3) % 7  # 1970-01-01 was a Thursday
+        cell = subject_idx.reshape(-1) * 7 + weekday
+        size = len(subjects) * 7
+        p = np.bincount(cell, weights=present, minlength=size).reshape(-1, 7)
+        r = np.bincount(cell, weights=recorded, minlength=size).reshape(-1, 7)
+        sessions = np.bincount(cell, minlength=size).reshape(-1, 7)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            rate = np.where(r > 0, 100.0 * p / r, np.nan)
+        return subjects, rate, sessions
+
+
+# One matrix per worker process, stamped with the attendance data_version it reflects. A save in
+# this process patches it in place; any other change (another worker, an import, a delete) shows up
+# as a version mismatch and triggers a bulk reload on the next read. Hold `lock` while reading
+# the returned matrix so a concurrent save cannot patch it mid-computation.
+class MatrixCache:
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.matrix = None
+        self.version = None
+        self.path = None
+
+    # tables: the attendance tables to load from (the hot table plus any attached archives).
+    def get(self, conn, path, version, tables=("attendance",)):
+        with self.lock:
+            if self.matrix is None or self.path != path or self.version != version:
+                self.matrix, self.version, self.path = AttendanceMatrix.load(conn, tables), version, path
+            return self.matrix
+
+    # before/after are the attendance versions read inside the writer's transaction.
+    def apply(self, path, before, after, rows):
+        with self.lock:
+            if self.matrix is not None and self.path == path and self.version == before:
+                self.matrix.apply(rows)
+                self.version = after
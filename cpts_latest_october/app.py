@@ -1,34 +1,249 @@
 import sqlite3
 import os
-from datetime import datetime
-from flask import Flask, render_template, request, jsonify, g, url_for, session, redirect, flash
+import re
+import csv
+import hashlib
+import io
+import json
+import mimetypes
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import click
+from flask import Flask, Response, render_template, send_file, send_from_directory, request, jsonify, g, url_for, session, redirect, flash, has_request_context, stream_with_context
 from functools import wraps
-
-APP_DIR = os.path.abspath(os.path.dirname(__file__))
-DB_PATH = os.path.join(APP_DIR, "attendance.db")
+from markupsafe import Markup, escape
+from werkzeug.security import safe_join
+from db import APP_DIR, DB_PATH, DEFAULT_PRAGMAS, ConnectionPool
+from exercism_sync import EXERCISM_SCHEMA, ExercismClient, ExercismSync
+from instrumentation import Metrics, TracedConnection, Tracer
+from migrations import Migrations, execute_script
+from importer import import_rows, read_rows
+from analytics import WEEKDAYS, MatrixCache
+from assets import MIME_TYPES, build_assets, load_manifest
+from archive import ARCHIVES_SCHEMA, ArchiveError, academic_year_range, archive_attendance, archives_for, attendance_source, attendance_tables, is_archived, read_archive
+from events import CHANGE_LOG_SCHEMA, EventBroker, publish
+from jobs import JOB_FIELDS, JOBS_SCHEMA, JobQueue
+from reports import attendance_report, available_formats, grade_sheet
 
 app = Flask(__name__)
 app.secret_key = 'your_very_secret_key'
+app.config.update(
+    DATABASE=os.environ.get("CPTS_DATABASE", DB_PATH),
+    DB_POOL_SIZE=int(os.environ.get("CPTS_DB_POOL_SIZE", 8)),
+    DB_READONLY_POOL_SIZE=int(os.environ.get("CPTS_DB_READONLY_POOL_SIZE", 8)),
+    DB_POOL_TIMEOUT=30.0,
+    DB_STATEMENT_CACHE=256,
+    DB_PRAGMAS=dict(DEFAULT_PRAGMAS),
+    DB_READONLY_GET=True,
+    # Off by default so dev servers, CLI commands and tests never call exercism.org; gunicorn.conf.py turns it on.
+    EXERCISM_SYNC_ENABLED=os.environ.get("CPTS_EXERCISM_SYNC", "0") == "1",
+    EXERCISM_BASE_URL=os.environ.get("CPTS_EXERCISM_BASE_URL", "https://exercism.org"),
+    EXERCISM_TTL=6 * 3600,
+    EXERCISM_ERROR_TTL=15 * 60,
+    EXERCISM_CONCURRENCY=8,
+    EXERCISM_SYNC_INTERVAL=300,
+    IMPORT_CHUNK_SIZE=5000,
+    IMPORT_MAX_ERRORS=1000,
+    REPORTS_DIR=os.environ.get("CPTS_REPORTS_DIR", os.path.join(APP_DIR, "reports")),
+    REPORT_WORKERS=int(os.environ.get("CPTS_REPORT_WORKERS", 2)),
+    REPORT_STALE_AFTER=600,
+    EVENTS_POLL_INTERVAL=float(os.environ.get("CPTS_EVENTS_POLL", 1.0)),
+    EVENTS_HEARTBEAT=15.0,
+    EVENTS_MAX_STREAM=300.0,
+    # Open streams per worker process; past it /api/events falls back to polling every
+    # EVENTS_POLL_RETRY seconds. Defaults to half of gunicorn's CPTS_THREADS so streams can never
+    # take every request thread.
+    EVENTS_MAX_STREAMS=int(os.environ.get("CPTS_EVENTS_MAX_STREAMS", max(1, int(os.environ.get("CPTS_THREADS", 16)) // 2))),
+    EVENTS_POLL_RETRY=float(os.environ.get("CPTS_EVENTS_POLL_RETRY", 10.0)),
+    EVENTS_RETENTION=24 * 3600,
+    ARCHIVE_DIR=os.environ.get("CPTS_ARCHIVE_DIR", os.path.join(APP_DIR, "archives")),
+    ACADEMIC_YEAR_START_MONTH=int(os.environ.get("CPTS_ACADEMIC_YEAR_START", 6)),
+    ASSETS_DIR=os.environ.get("CPTS_ASSETS_DIR", os.path.join(APP_DIR, "static", "dist")),
+    ASSET_IMAGE_WIDTHS=(480, 960, 1440),
+    ASSET_MAX_AGE=365 * 24 * 3600,
+    METRICS_ENABLED=os.environ.get("CPTS_METRICS", "1") == "1",
+    METRICS_TOKEN=os.environ.get("CPTS_METRICS_TOKEN"),
+    SLOW_QUERY_MS=float(os.environ["CPTS_SLOW_QUERY_MS"]) if os.environ.get("CPTS_SLOW_QUERY_MS") else None,
+    SLOW_QUERY_EXPLAIN=False,
+    SERVER_TIMING=False,
+)
 
 # ---------- DB Helpers ----------
-def get_db():
+_pools = {}
+metrics = Metrics()
+tracer = Tracer(metrics, enabled=app.config["METRICS_ENABLED"], slow_ms=app.config["SLOW_QUERY_MS"], explain=app.config["SLOW_QUERY_EXPLAIN"])
+
+def _attach_tracer(conn):
+    conn.tracer = tracer
+
+def get_pool(readonly=False):
+    key = (app.config["DATABASE"], readonly)
+    pool = _pools.get(key)
+    if pool is None:
+        size = app.config["DB_READONLY_POOL_SIZE" if readonly else "DB_POOL_SIZE"]
+        # With metrics off at startup the pool hands out plain connections: no wrapper at all.
+        traced = dict(factory=TracedConnection, on_connect=_attach_tracer) if app.config["METRICS_ENABLED"] else {}
+        pool = _pools.setdefault(key, ConnectionPool(key[0], size=size, readonly=readonly, pragmas=app.config["DB_PRAGMAS"],
+                                                     statement_cache=app.config["DB_STATEMENT_CACHE"], timeout=app.config["DB_POOL_TIMEOUT"], **traced))
+    return pool
+
+# GET/HEAD requests get a read-only connection unless a handler asks otherwise.
+def get_db(readonly=None):
     if "db" not in g:
-        g.db = sqlite3.connect(DB_PATH)
-        g.db.row_factory = sqlite3.Row
+        if readonly is None:
+            readonly = app.config["DB_READONLY_GET"] and has_request_context() and request.method in ("GET", "HEAD")
+        pool = get_pool(readonly)
+        g.db = pool.acquire()
+        g.db_pool = pool
     return g.db
 
 @app.teardown_appcontext
 def close_db(_):
     db = g.pop("db", None)
+    pool = g.pop("db_pool", None)
     if db:
-        db.close()
+        pool.release(db)
 
-# ---------- Database Initialization ----------
-def init_db():
-    db = get_db()
-    db.executescript(
-        """
-        PRAGMA foreign_keys = ON;
+# ---------- Request Metrics ----------
+@app.before_request
+def start_request_timer():
+    if tracer.enabled:
+        g.request_started = time.perf_counter()
+        tracer.begin_request()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop("request_started", None)
+    if started is None:
+        return response
+    seconds = time.perf_counter() - started
+    queries, sql_seconds = tracer.end_request()
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    metrics.observe_request(route, request.method, response.status_code, seconds, queries)
+    if app.config["SERVER_TIMING"]:
+        response.headers["Server-Timing"] = f'app;dur={seconds * 1000:.2f}, sql;dur={sql_seconds * 1000:.2f};desc="{queries} queries"'
+    return response
+
+# ---------- Exercism Sync ----------
+_exercism_sync = None
+
+def get_exercism_sync():
+    global _exercism_sync
+    if _exercism_sync is None or _exercism_sync.db_path != app.config["DATABASE"]:
+        client = ExercismClient(app.config["EXERCISM_BASE_URL"])
+        _exercism_sync = ExercismSync(app.config["DATABASE"], client, ttl=app.config["EXERCISM_TTL"], error_ttl=app.config["EXERCISM_ERROR_TTL"],
+                                      concurrency=app.config["EXERCISM_CONCURRENCY"], interval=app.config["EXERCISM_SYNC_INTERVAL"])
+    return _exercism_sync
+
+# Started lazily from the first request so the thread lives in the gunicorn worker, not the master.
+@app.before_request
+def start_background_jobs():
+    if app.config["EXERCISM_SYNC_ENABLED"]:
+        get_exercism_sync().ensure_started()
+
+# ---------- Report Jobs ----------
+_report_queue = None
+
+def get_report_queue():
+    global _report_queue
+    if _report_queue is None or _report_queue.db_path != app.config["DATABASE"]:
+        _report_queue = JobQueue(app.config["DATABASE"], app.config["REPORTS_DIR"], max_workers=app.config["REPORT_WORKERS"],
+                                 stale_after=app.config["REPORT_STALE_AFTER"])
+    return _report_queue
+
+# ---------- Static Assets ----------
+# `flask build-assets` writes fingerprinted, precompressed copies of static/ to ASSETS_DIR. Templates
+# link through asset_url()/responsive_image(), which use the build when there is one and plain
+# /static URLs otherwise. The manifest is re-read when a rebuild replaces it.
+_asset_manifest = (None, None)
+
+def asset_manifest():
+    global _asset_manifest
+    path = os.path.join(app.config["ASSETS_DIR"], "manifest.json")
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    if _asset_manifest[0] != (path, mtime):
+        _asset_manifest = ((path, mtime), load_manifest(app.config["ASSETS_DIR"]))
+    return _asset_manifest[1]
+
+@app.template_global()
+def asset_url(filename):
+    manifest = asset_manifest()
+    built = manifest and manifest["files"].get(filename)
+    return url_for("asset", filename=built) if built else url_for("static", filename=filename)
+
+# <picture> with AVIF/WebP sources and a srcset per format when the build has resized variants,
+# otherwise a plain <img>. sizes describes the rendered width, e.g. "100vw" for a full-bleed hero.
+# media maps a media query to another image for viewports matching it (art direction, e.g. a
+# portrait crop); its sources come first so they win over the default image.
+# class goes on the outer element, any other attribute (loading, fetchpriority, ...) on the <img>.
+@app.template_global()
+def responsive_image(filename, alt="", sizes="100vw", media=None, **attrs):
+    manifest = asset_manifest()
+    images = manifest["images"] if manifest else {}
+    built = lambda name: images.get(name) if images.get(name) and images[name]["srcset"] else None
+    html_attrs = lambda items: "".join(f' {k.replace("_", "-")}="{escape(v)}"' for k, v in items)
+    if not media and not built(filename):
+        return Markup(f'<img src="{asset_url(filename)}" alt="{escape(alt)}"{html_attrs(attrs.items())}>')
+    srcset = lambda variants: ", ".join(f"{url_for('asset', filename=name)} {width}w" for name, width in variants)
+
+    def sources(name, query=None):
+        image, when = built(name), f' media="{escape(query)}"' if query else ""
+        if not image:
+            return f'<source{when} srcset="{asset_url(name)}">' if query else ""
+        formats = [fmt for fmt in MIME_TYPES if fmt in image["srcset"]] + (["fallback"] if query else [])
+        kind = lambda fmt: f' type="{MIME_TYPES[fmt]}"' if fmt in MIME_TYPES else ""
+        return "".join(f'<source{when}{kind(fmt)} srcset="{srcset(image["srcset"][fmt])}" sizes="{escape(sizes)}">' for fmt in formats)
+
+    image = built(filename)
+    outer = html_attrs((k, v) for k, v in attrs.items() if k == "class")
+    inner = html_attrs((k, v) for k, v in attrs.items() if k != "class")
+    art = "".join(sources(name, query) for query, name in media.items()) if media else ""
+    img = f' srcset="{srcset(image["srcset"]["fallback"])}" sizes="{escape(sizes)}" width="{image["width"]}" height="{image["height"]}"' if image else ""
+    return Markup(f'<picture{outer}>{art}{sources(filename)}<img src="{asset_url(filename)}"{img} alt="{escape(alt)}"{inner}></picture>')
+
+# Fingerprinted files never change, so they are cached for a year without revalidation. A .br or
+# .gz sibling written by the build is sent instead when the browser accepts it.
+@app.route("/assets/<path:filename>")
+def asset(filename):
+    root, mimetype = app.config["ASSETS_DIR"], mimetypes.guess_type(filename)[0]
+    for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+        path = safe_join(root, filename + suffix)
+        if request.accept_encodings[encoding] and path and os.path.isfile(path):
+            resp = send_from_directory(root, filename + suffix, mimetype=mimetype, max_age=app.config["ASSET_MAX_AGE"])
+            resp.content_encoding = encoding
+            break
+    else:
+        resp = send_from_directory(root, filename, mimetype=mimetype, max_age=app.config["ASSET_MAX_AGE"])
+    resp.vary.add("Accept-Encoding")
+    resp.cache_control.public = True
+    resp.cache_control.immutable = True
+    return resp
+
+# ---------- Live Events ----------
+_event_broker = None
+
+def get_event_broker():
+    global _event_broker
+    if _event_broker is None or _event_broker.db_path != app.config["DATABASE"]:
+        _event_broker = EventBroker(app.config["DATABASE"], poll_interval=app.config["EVENTS_POLL_INTERVAL"], retention=app.config["EVENTS_RETENTION"],
+                                    max_streams=app.config["EVENTS_MAX_STREAMS"])
+    return _event_broker
+
+def latest_event_id(db):
+    return db.execute("SELECT COALESCE(MAX(id), 0) FROM change_log").fetchone()[0]
+
+# ---------- Schema Migrations ----------
+# Append new steps with the next version number; never edit a step that has shipped.
+migrations = Migrations()
+
+@migrations.step(1)
+def baseline_schema(db):
+    execute_script(db, """
         CREATE TABLE IF NOT EXISTS users (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             username TEXT UNIQUE NOT NULL,
@@ -73,30 +288,22 @@ def init_db():
             FOREIGN KEY(subject_id) REFERENCES subjects(id) ON DELETE CASCADE,
             FOREIGN KEY(student_id) REFERENCES students(id) ON DELETE CASCADE
         );
-        """
-    )
-    try:
-        cur = db.execute("PRAGMA table_info(students)")
-        cols = [column[1] for column in cur.fetchall()]
-        if 'exercism_username' not in cols:
-            db.execute("ALTER TABLE students ADD COLUMN exercism_username TEXT")
-        if 'user_id' not in cols:
-             db.execute("ALTER TABLE students ADD COLUMN user_id INTEGER UNIQUE REFERENCES users(id) ON DELETE SET NULL")
-
-    except sqlite3.OperationalError:
-        pass
-
-    cur = db.execute("SELECT COUNT(*) c FROM users")
-    if cur.fetchone()['c'] == 0:
-        db.execute("INSERT INTO users (username, password, role) VALUES (?,?,?)",('admin','admin','admin'))
+    """)
+    # Databases created before these columns existed. SQLite cannot add a UNIQUE column,
+    # so user_id gets a unique index instead.
+    cols = [column[1] for column in db.execute("PRAGMA table_info(students)")]
+    if 'exercism_username' not in cols:
+        db.execute("ALTER TABLE students ADD COLUMN exercism_username TEXT")
+    if 'user_id' not in cols:
+        db.execute("ALTER TABLE students ADD COLUMN user_id INTEGER REFERENCES users(id) ON DELETE SET NULL")
+        db.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_students_user ON students(user_id)")
 
-    cur = db.execute("SELECT COUNT(*) c FROM subjects")
-    if cur.fetchone()["c"] == 0:
+    if not db.execute("SELECT 1 FROM users LIMIT 1").fetchone():
+        db.execute("INSERT INTO users (username, password, role) VALUES (?,?,?)",('admin','admin','admin'))
+    if not db.execute("SELECT 1 FROM subjects LIMIT 1").fetchone():
         subjects = [ "Software Engineering","Mobile Applications","Data Structure","Mathematics", "Information Security","Frontend Development","Basic Indian Language", "Information Security lab","Frontend Development lab","Mobile Applications lab", "Data Structure lab","Integral Yoga" ]
         db.executemany("INSERT INTO subjects(name) VALUES(?)", [(s,) for s in subjects])
-
-    cur = db.execute("SELECT COUNT(*) c FROM students")
-    if cur.fetchone()["c"] == 0:
+    if not db.execute("SELECT 1 FROM students LIMIT 1").fetchone():
         students = [
             ("24820001", "Aravindh", "devaravindh-ml-exercism"),
             ("24820002", "Aswin", "aswinas04-exercism"),
@@ -108,8 +315,677 @@ def init_db():
             ("24820008", "Visal Stephen Raj", "Visalstephenraj-exercism"),
         ]
         db.executemany("INSERT INTO students(roll_no, name, exercism_username) VALUES(?, ?, ?)", students)
-    db.commit()
-    print("Database initialized successfully.")
+
+@migrations.step(2)
+def iso_dates(db):
+    # Dates used to be stored as dd-mm-yyyy; rewrite any legacy rows in place to sortable ISO yyyy-mm-dd.
+    legacy = "[0-3][0-9]-[01][0-9]-[0-9][0-9][0-9][0-9]"
+    to_iso = "substr({0},7,4)||'-'||substr({0},4,2)||'-'||substr({0},1,2)"
+    db.execute(f"UPDATE attendance SET date = {to_iso.format('date')} WHERE date GLOB ?", (legacy,))
+    db.execute(f"UPDATE homework SET posted_date = {to_iso.format('posted_date')} WHERE posted_date GLOB ?", (legacy,))
+    db.execute(f"UPDATE homework SET due_date = {to_iso.format('due_date')} WHERE due_date GLOB ?", (legacy,))
+
+@migrations.step(3)
+def date_indexes_and_versions(db):
+    execute_script(db, """
+        CREATE INDEX IF NOT EXISTS idx_attendance_subject_date ON attendance(subject_id, date, student_id, status);
+        CREATE INDEX IF NOT EXISTS idx_attendance_student_date ON attendance(student_id, date, subject_id, status);
+        CREATE INDEX IF NOT EXISTS idx_homework_posted ON homework(posted_date, id);
+        CREATE INDEX IF NOT EXISTS idx_homework_subject_posted ON homework(subject_id, posted_date, id);
+        CREATE INDEX IF NOT EXISTS idx_homework_due ON homework(due_date, id);
+        CREATE TABLE IF NOT EXISTS data_versions (name TEXT PRIMARY KEY, version INTEGER NOT NULL DEFAULT 0);
+    """)
+    create_version_triggers(db, "reference", ("students", "subjects", "users"))
+    create_version_triggers(db, "homework", ("homework",))
+
+@migrations.step(4)
+def attendance_summary(db):
+    execute_script(db, ATTENDANCE_SUMMARY_SCHEMA)
+    fill_attendance_summary(db)
+
+@migrations.step(5)
+def full_text_search(db):
+    for table, columns in FTS_TABLES.items():
+        create_fts_index(db, table, columns)
+
+@migrations.step(6)
+def exercism_cache(db):
+    execute_script(db, EXERCISM_SCHEMA)
+
+@migrations.step(7)
+def report_jobs(db):
+    execute_script(db, JOBS_SCHEMA)
+    # Attendance inserts and updates go through write_attendance_rows, which bumps the version once
+    # per write instead of once per row; only cascaded deletes still need the trigger.
+    create_version_triggers(db, "attendance", ("attendance",), events=("DELETE",))
+    create_version_triggers(db, "grades", ("homework_submissions",))
+
+@migrations.step(8)
+def change_log(db):
+    execute_script(db, CHANGE_LOG_SCHEMA)
+
+@migrations.step(9)
+def attendance_archives(db):
+    execute_script(db, ARCHIVES_SCHEMA)
+
+@migrations.step(10)
+def attendance_revisions(db):
+    execute_script(db, ATTENDANCE_SYNC_SCHEMA)
+
+@migrations.step(11)
+def doubt_threads(db):
+    # asked_date was dd-mm-yyyy HH:MM, which neither sorts nor seeks; same rewrite as iso_dates.
+    db.execute("UPDATE doubts SET asked_date = substr(asked_date,7,4)||'-'||substr(asked_date,4,2)||'-'||substr(asked_date,1,2)||substr(asked_date,11) "
+               "WHERE asked_date GLOB '[0-3][0-9]-[01][0-9]-[0-9][0-9][0-9][0-9]*'")
+    execute_script(db, DOUBT_COUNTS_SCHEMA)
+    db.execute("CREATE INDEX IF NOT EXISTS idx_homework_subject_due ON homework(subject_id, due_date, id)")
+    db.execute("INSERT OR REPLACE INTO homework_doubt_counts(homework_id, total, answered) "
+               "SELECT homework_id, COUNT(*), COUNT(answer) FROM doubts GROUP BY homework_id")
+
+# Entry point for scripts and `python app.py`; gunicorn goes through create_app().
+def init_db():
+    applied = migrations.migrate(app.config["DATABASE"], log=print)
+    print(f"Database initialized successfully (schema version {migrations.latest}, {len(applied)} migrations applied).")
+
+
+# ---------- Data Versions & Response Cache ----------
+# Every write to a watched table bumps a row in data_versions (via triggers), so all gunicorn
+# workers can tell with one primary-key read whether their cached responses are still current.
+# The cache is LRU-bounded at RESPONSE_CACHE_SIZE keys. gthread workers share it between request
+# threads, so lookups and evictions take the lock; bodies are built outside it.
+_response_cache = OrderedDict()
+_response_cache_lock = threading.Lock()
+RESPONSE_CACHE_SIZE = 256
+
+def create_version_triggers(db, scope, tables, events=("INSERT", "UPDATE", "DELETE")):
+    db.execute("INSERT OR IGNORE INTO data_versions(name, version) VALUES(?, 0)", (scope,))
+    for table in tables:
+        for event in events:
+            db.execute(f"CREATE TRIGGER IF NOT EXISTS trg_{table}_{event.lower()}_{scope}_version AFTER {event} ON {table} "
+                       f"BEGIN UPDATE data_versions SET version = version + 1 WHERE name = '{scope}'; END")
+
+def data_version(db, scope):
+    row = db.execute("SELECT version FROM data_versions WHERE name = ?", (scope,)).fetchone()
+    return row[0] if row else 0
+
+def cached_json(key, scope, build):
+    db = get_db()
+    version = data_version(db, scope)
+    with _response_cache_lock:
+        hit = _response_cache.get(key)
+        if hit is not None:
+            _response_cache.move_to_end(key)
+    if hit is None or hit[0] != version:
+        body = app.json.dumps(build(db)).encode()
+        hit = (version, body, hashlib.sha256(body).hexdigest()[:32])
+        with _response_cache_lock:
+            _response_cache.pop(key, None)
+            while len(_response_cache) >= RESPONSE_CACHE_SIZE:
+                _response_cache.popitem(last=False)
+            _response_cache[key] = hit
+    resp = Response(hit[1], mimetype="application/json")
+    resp.set_etag(hit[2])
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp.make_conditional(request)
+
+
+# ---------- Date Helpers ----------
+# Dates are stored as ISO yyyy-mm-dd so they sort and range-scan on an index;
+# the browser still sends and displays dd-mm-yyyy.
+def dmy_to_iso(value):
+    return datetime.strptime(value, "%d-%m-%Y").strftime("%Y-%m-%d")
+
+def iso_to_dmy(value):
+    return datetime.strptime(value, "%Y-%m-%d").strftime("%d-%m-%Y")
+
+def month_range(year, month):
+    y, m = int(year), int(month)
+    if not 1 <= m <= 12: raise ValueError("month out of range")
+    return f"{y:04d}-{m:02d}-01", f"{y + m // 12:04d}-{m % 12 + 1:02d}-01"
+
+def year_range(year):
+    y = int(year)
+    return f"{y:04d}-01-01", f"{y + 1:04d}-01-01"
+
+def next_day(iso):
+    return (datetime.strptime(iso, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+
+
+# ---------- Attendance Archives ----------
+# Closed academic years live in read-only per-year files (see archive.py and `flask archive`).
+# Queries that may reach back into them read attendance through attendance_from() instead of the
+# bare table; it only attaches the archives that overlap [start, end).
+def attendance_from(db, start=None, end=None):
+    return attendance_source(db, start, end, mmap_size=app.config["DB_PRAGMAS"].get("mmap_size", 0))
+
+def academic_year_of(iso):
+    month = app.config["ACADEMIC_YEAR_START_MONTH"]
+    return int(iso[:4]) - (int(iso[5:7]) < month)
+
+def archive_closed_years(db, years=None, log=print):
+    today = datetime.now().strftime("%Y-%m-%d")
+    if years is None:
+        first = db.execute("SELECT MIN(date) FROM attendance").fetchone()[0]
+        years = range(academic_year_of(first), academic_year_of(today)) if first else ()
+    moved = {}
+    for year in years:
+        start, end = academic_year_range(year, app.config["ACADEMIC_YEAR_START_MONTH"])
+        if end > today: raise ArchiveError(f"Academic year {year} is not over until {iso_to_dmy(end)}")
+        if db.execute("SELECT 1 FROM archives WHERE year = ?", (year,)).fetchone(): continue
+        if not db.execute("SELECT 1 FROM attendance WHERE date >= ? AND date < ? LIMIT 1", (start, end)).fetchone():
+            log(f"No attendance for {year}-{str(year + 1)[2:]}; nothing to archive")
+            continue
+        path = os.path.join(app.config["ARCHIVE_DIR"], f"attendance-{year}.db")
+        # Triggers are suspended for the delete, so attendance_summary keeps the archived months and
+        # the attendance version is bumped once here instead of once per row.
+        bump = lambda conn, rows: conn.execute("UPDATE data_versions SET version = version + 1 WHERE name = 'attendance'")
+        moved[year] = archive_attendance(db, year, start, end, path, on_moved=bump)
+        log(f"Archived {moved[year]} attendance rows for {year}-{str(year + 1)[2:]} to {path}")
+    return moved
+
+
+# ---------- Attendance Bulk Save ----------
+ATTENDANCE_STATUSES = ("Present", "Absent Informed", "Absent Uninformed")
+# A mark's contribution to attendance_summary's (present, absent_informed, absent_uninformed) counts.
+STATUS_COUNTS = {status: tuple(int(status == s) for s in ATTENDANCE_STATUSES) for status in ATTENDANCE_STATUSES}
+NO_COUNTS = (0, 0, 0)
+# Every writer goes through write_attendance_rows. One statement writes a whole sheet from a JSON
+# object of {student_id: status}, stamping each row with the sheet's revision; a set-based insert
+# costs noticeably less per row than executemany. ("WHERE true" lets SQLite parse the upsert.)
+ATTENDANCE_UPSERT = """
+    INSERT INTO attendance(date, subject_id, student_id, status, revision)
+    SELECT ?1, ?2, key, value, ?3 FROM json_each(?4) WHERE true
+    ON CONFLICT(date, subject_id, student_id) DO UPDATE SET status = excluded.status, revision = excluded.revision
+"""
+ATTENDANCE_SYNC_SCHEMA = """
+    ALTER TABLE attendance ADD COLUMN revision INTEGER NOT NULL DEFAULT 0;
+    CREATE TABLE IF NOT EXISTS attendance_sheets (
+        date TEXT NOT NULL, subject_id INTEGER NOT NULL, revision INTEGER NOT NULL,
+        PRIMARY KEY(date, subject_id)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS attendance_sync_requests (
+        user_id INTEGER NOT NULL, key TEXT NOT NULL, status INTEGER NOT NULL, response TEXT NOT NULL, created_at REAL NOT NULL,
+        PRIMARY KEY(user_id, key)
+    );
+    CREATE INDEX IF NOT EXISTS idx_attendance_sync_requests_created ON attendance_sync_requests(created_at);
+"""
+
+def as_int(value):
+    if isinstance(value, bool): return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def existing_ids(db, table, ids):
+    # One set-based lookup instead of a SELECT per id; json_each sidesteps the bound-parameter limit.
+    ids = [i for i in ids if i is not None]
+    if not ids: return set()
+    rows = db.execute(f"SELECT id FROM {table} WHERE id IN (SELECT value FROM json_each(?))", (json.dumps(ids),))
+    return {r[0] for r in rows}
+
+# Upserts (iso_date, subject_id, student_id, status) rows inside the caller's write transaction.
+# Each (date, subject) sheet is compared with its stored statuses first; only marks that really
+# change are written, stamped with the sheet's next revision (read once), and listed in the sheet's
+# single attendance.saved event. The same comparison gives the attendance_summary deltas, and the
+# attendance data_version moves once per call, so no per-row trigger runs on this path.
+# Returns {(date, subject_id): revision} for the sheets that changed.
+def write_attendance_rows(db, rows):
+    sheets, changed = {}, {}
+    for date, subject_id, student_id, status in rows:
+        sheets.setdefault((date, subject_id), {})[student_id] = status
+    for (date, subject_id), marks in sheets.items():
+        stored = dict(db.execute("SELECT student_id, status FROM attendance WHERE subject_id = ? AND date = ?", (subject_id, date)).fetchall())
+        marks = {sid: status for sid, status in marks.items() if stored.get(sid) != status}
+        if not marks:
+            continue
+        revision = sheet_revision(db, date, subject_id) + 1
+        db.execute(ATTENDANCE_UPSERT, (date, subject_id, revision, json.dumps(marks)))
+        deltas = []
+        for sid, status in marks.items():
+            (p, i, u), (op, oi, ou) = STATUS_COUNTS[status], STATUS_COUNTS.get(stored.get(sid), NO_COUNTS)
+            deltas.append((sid, p - op, i - oi, u - ou))
+        db.execute(ATTENDANCE_SUMMARY_DELTA, (subject_id, date[:7], json.dumps(deltas)))
+        db.execute("INSERT INTO attendance_sheets(date, subject_id, revision) VALUES (?, ?, ?) "
+                   "ON CONFLICT(date, subject_id) DO UPDATE SET revision = excluded.revision", (date, subject_id, revision))
+        publish(db, f"attendance:{subject_id}", "attendance.saved", {
+            "subject_id": subject_id, "date": iso_to_dmy(date), "revision": revision,
+            "marks": [{"student_id": sid, "status": status} for sid, status in marks.items()],
+        })
+        changed[(date, subject_id)] = revision
+    if changed:
+        db.execute("UPDATE data_versions SET version = version + 1 WHERE name = 'attendance'")
+    return changed
+
+# Validates and upserts every (date, subject) sheet in one write transaction.
+# Returns (saved_count, errors): bad rows are reported and skipped, the rest are still saved.
+def save_attendance_sheets(db, sheets):
+    errors, rows = [], []
+    sheets = [s if isinstance(s, dict) else {} for s in sheets]
+    marks_of = lambda s: s.get("marks") if isinstance(s.get("marks"), list) else []
+    subjects = existing_ids(db, "subjects", {as_int(s.get("subject_id")) for s in sheets})
+    students = existing_ids(db, "students", {as_int(m.get("student_id")) for s in sheets for m in marks_of(s) if isinstance(m, dict)})
+    for i, sheet in enumerate(sheets):
+        try:
+            date = dmy_to_iso(sheet.get("date"))
+        except (ValueError, TypeError):
+            errors.append({"sheet": i, "error": "Invalid date format; use dd-mm-yyyy"})
+            continue
+        if is_archived(db, date):
+            errors.append({"sheet": i, "error": f"Attendance for {sheet.get('date')} is archived and read-only"})
+            continue
+        subject_id = as_int(sheet.get("subject_id"))
+        marks = marks_of(sheet)
+        if not subject_id or not marks:
+            errors.append({"sheet": i, "error": "Missing subject or marks"})
+            continue
+        if subject_id not in subjects:
+            errors.append({"sheet": i, "error": "Subject not found"})
+            continue
+        for j, m in enumerate(marks):
+            m = m if isinstance(m, dict) else {}
+            sid, status = as_int(m.get("student_id")), m.get("status")
+            if status not in ATTENDANCE_STATUSES:
+                errors.append({"sheet": i, "row": j, "student_id": m.get("student_id"), "error": "Invalid status"})
+            elif sid not in students:
+                errors.append({"sheet": i, "row": j, "student_id": m.get("student_id"), "error": f"Student {m.get('student_id')} not found"})
+            else:
+                rows.append((date, subject_id, sid, status))
+    if rows:
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            before = data_version(db, "attendance")
+            write_attendance_rows(db, rows)
+            after = data_version(db, "attendance")
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        attendance_matrix.apply(app.config["DATABASE"], before, after, rows)
+        get_event_broker().notify()
+    return len(rows), errors
+
+
+# ---------- Attendance Sync ----------
+# Delta protocol for the register page. The client loads a sheet with its revision, then sends only
+# the marks it changed together with that base revision and an Idempotency-Key. A mark conflicts
+# when someone else changed the same student's row after the base revision to a different status;
+# then nothing is saved and the current rows come back with a 409. Changes to other students merge.
+# A replayed key gets the stored response instead of a second write.
+SYNC_KEY_TTL = 24 * 3600
+
+def sheet_revision(db, date, subject_id):
+    row = db.execute("SELECT revision FROM attendance_sheets WHERE date = ? AND subject_id = ?", (date, subject_id)).fetchone()
+    return row[0] if row else 0
+
+def sync_attendance_sheet(db, data, user_id, key=None):
+    data = data if isinstance(data, dict) else {}
+    try:
+        date = dmy_to_iso(data.get("date"))
+    except (ValueError, TypeError):
+        return 400, {"ok": False, "error": "Invalid date format; use dd-mm-yyyy"}
+    subject_id, base = as_int(data.get("subject_id")), as_int(data.get("base_revision"))
+    changes = data.get("changes") if isinstance(data.get("changes"), list) else None
+    if not subject_id or base is None or changes is None: return 400, {"ok": False, "error": "subject_id, base_revision and changes are required"}
+    if subject_id not in existing_ids(db, "subjects", {subject_id}): return 400, {"ok": False, "error": "Subject not found"}
+    if is_archived(db, date): return 400, {"ok": False, "error": f"Attendance for {data['date']} is archived and read-only"}
+    marks = {}
+    for m in changes:
+        m = m if isinstance(m, dict) else {}
+        if m.get("status") not in ATTENDANCE_STATUSES: return 400, {"ok": False, "error": "Invalid status", "student_id": m.get("student_id")}
+        marks[as_int(m.get("student_id"))] = m["status"]
+    missing = set(marks) - existing_ids(db, "students", set(marks))
+    if missing: return 400, {"ok": False, "error": f"Student {sorted(missing, key=str)[0]} not found"}
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        if key:
+            hit = db.execute("SELECT status, response FROM attendance_sync_requests WHERE user_id = ? AND key = ?", (user_id, key)).fetchone()
+            if hit:
+                db.rollback()
+                return hit["status"], json.loads(hit["response"]) | {"replayed": True}
+        current = {r["student_id"]: r for r in db.execute("SELECT student_id, status, revision FROM attendance WHERE subject_id = ? AND date = ?", (subject_id, date))}
+        conflicts = [{"student_id": sid, "status": current[sid]["status"], "revision": current[sid]["revision"]}
+                     for sid, status in marks.items() if sid in current and current[sid]["revision"] > base and current[sid]["status"] != status]
+        if conflicts:
+            db.rollback()
+            return 409, {"ok": False, "error": f"{len(conflicts)} mark(s) were changed by someone else", "revision": sheet_revision(db, date, subject_id), "conflicts": conflicts}
+        rows = [(date, subject_id, sid, status) for sid, status in marks.items() if sid not in current or current[sid]["status"] != status]
+        before = data_version(db, "attendance")
+        write_attendance_rows(db, rows)
+        after = data_version(db, "attendance")
+        revision = sheet_revision(db, date, subject_id)
+        body = {"ok": True, "saved": len(rows), "revision": revision}
+        if key:
+            now = time.time()
+            db.execute("DELETE FROM attendance_sync_requests WHERE created_at < ?", (now - SYNC_KEY_TTL,))
+            db.execute("INSERT INTO attendance_sync_requests(user_id, key, status, response, created_at) VALUES (?, ?, 200, ?, ?)", (user_id, key, json.dumps(body), now))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    if rows:
+        attendance_matrix.apply(app.config["DATABASE"], before, after, rows)
+        get_event_broker().notify()
+    return 200, body
+
+
+# ---------- Attendance Rollups ----------
+# attendance_summary holds per (student, subject, yyyy-mm) status counts. write_attendance_rows adds
+# each save's deltas inside the writer's own transaction and a trigger takes deleted rows back out;
+# rebuild_attendance_summary recomputes it.
+# Takes one sheet's JSON array of [student_id, present, absent_informed, absent_uninformed] deltas.
+ATTENDANCE_SUMMARY_DELTA = """
+    INSERT INTO attendance_summary(student_id, subject_id, month, present, absent_informed, absent_uninformed)
+    SELECT json_extract(value, '$[0]'), ?1, ?2, json_extract(value, '$[1]'), json_extract(value, '$[2]'), json_extract(value, '$[3]')
+    FROM json_each(?3) WHERE true
+    ON CONFLICT(student_id, subject_id, month) DO UPDATE SET present = present + excluded.present,
+        absent_informed = absent_informed + excluded.absent_informed, absent_uninformed = absent_uninformed + excluded.absent_uninformed
+"""
+_SUMMARY_REMOVE = """
+    UPDATE attendance_summary SET present = present - (OLD.status = 'Present'),
+        absent_informed = absent_informed - (OLD.status = 'Absent Informed'), absent_uninformed = absent_uninformed - (OLD.status = 'Absent Uninformed')
+    WHERE student_id = OLD.student_id AND subject_id = OLD.subject_id AND month = substr(OLD.date, 1, 7);
+"""
+ATTENDANCE_SUMMARY_SCHEMA = f"""
+    CREATE TABLE IF NOT EXISTS attendance_summary (
+        student_id INTEGER NOT NULL, subject_id INTEGER NOT NULL, month TEXT NOT NULL,
+        present INTEGER NOT NULL DEFAULT 0, absent_informed INTEGER NOT NULL DEFAULT 0, absent_uninformed INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY(student_id, subject_id, month)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS idx_attendance_summary_subject ON attendance_summary(subject_id, month, student_id);
+    CREATE TRIGGER IF NOT EXISTS trg_attendance_summary_delete AFTER DELETE ON attendance BEGIN {_SUMMARY_REMOVE} END;
+"""
+
+MONTHLY_COUNTS = """
+    SELECT student_id, subject_id, substr(date, 1, 7), SUM(status = 'Present'), SUM(status = 'Absent Informed'), SUM(status = 'Absent Uninformed')
+    FROM {source} GROUP BY student_id, subject_id, substr(date, 1, 7)
+"""
+_SUMMARY_ADD_COUNTS = """
+    INSERT INTO attendance_summary(student_id, subject_id, month, present, absent_informed, absent_uninformed) VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(student_id, subject_id, month) DO UPDATE SET present = present + excluded.present,
+        absent_informed = absent_informed + excluded.absent_informed, absent_uninformed = absent_uninformed + excluded.absent_uninformed
+"""
+
+def fill_attendance_summary(db, source="attendance"):
+    db.execute("DELETE FROM attendance_summary")
+    db.execute("INSERT INTO attendance_summary(student_id, subject_id, month, present, absent_informed, absent_uninformed)" + MONTHLY_COUNTS.format(source=source))
+
+# Archived years are counted one file at a time on their own read-only connection and added in,
+# so the rebuild never attaches an archive and is not capped by SQLite's attach limit.
+def rebuild_attendance_summary(db):
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        fill_attendance_summary(db)
+        for archive in archives_for(db):
+            counts = read_archive(archive["path"], MONTHLY_COUNTS.format(source="attendance"), mmap_size=app.config["DB_PRAGMAS"].get("mmap_size", 0))
+            db.executemany(_SUMMARY_ADD_COUNTS, counts)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+def summary_totals(row):
+    total = row["present"] + row["absent_informed"] + row["absent_uninformed"]
+    return {"present": row["present"], "absent_informed": row["absent_informed"], "absent_uninformed": row["absent_uninformed"],
+            "total": total, "percentage": round(100.0 * row["present"] / total, 1) if total else None}
+
+# Month bounds (yyyy-mm, end exclusive) for the summary endpoints' year/month filters.
+def summary_month_bounds(args):
+    year, month = args.get("year"), args.get("month")
+    if year and month:
+        start, end = month_range(year, month)
+    elif year:
+        start, end = year_range(year)
+    else:
+        return None
+    return start[:7], end[:7]
+
+
+# ---------- Homework Grades ----------
+HOMEWORK_STATUSES = ("Pending", "Completed", "Graded")
+GRADE_UPSERT = "INSERT INTO homework_submissions (homework_id, student_id, grade, status) VALUES (?, ?, ?, 'Graded') ON CONFLICT(homework_id, student_id) DO UPDATE SET grade = excluded.grade, status = 'Graded'"
+
+# Same contract as save_attendance_sheets: one write transaction, bad rows reported and skipped.
+def save_grades(db, grades):
+    grades = [g if isinstance(g, dict) else {} for g in grades]
+    homework = existing_ids(db, "homework", {as_int(g.get("homework_id")) for g in grades})
+    students = existing_ids(db, "students", {as_int(g.get("student_id")) for g in grades})
+    errors, rows = [], []
+    for i, item in enumerate(grades):
+        hw, sid, grade = as_int(item.get("homework_id")), as_int(item.get("student_id")), item.get("grade")
+        if hw not in homework:
+            errors.append({"row": i, "error": f"Homework {item.get('homework_id')} not found"})
+        elif sid not in students:
+            errors.append({"row": i, "error": f"Student {item.get('student_id')} not found"})
+        elif grade is not None and as_int(grade) is None:
+            errors.append({"row": i, "error": "Grade must be a whole number"})
+        else:
+            rows.append((hw, sid, None if grade is None else as_int(grade)))
+    if rows:
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.executemany(GRADE_UPSERT, rows)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+    return len(rows), errors
+
+
+# ---------- Homework Doubts ----------
+# asked_date is stored as ISO yyyy-mm-dd HH:MM and shown as dd-mm-yyyy HH:MM. Threads are read newest
+# first off idx_doubts_homework_asked and paged with a keyset cursor; homework_doubt_counts keeps each
+# homework's total/answered counts in step through triggers, so no page has to count its thread.
+DOUBTS_PAGE_SIZE = 20
+_DOUBT_COUNT_ADD = """
+    INSERT INTO homework_doubt_counts(homework_id, total, answered) VALUES (NEW.homework_id, 1, NEW.answer IS NOT NULL)
+    ON CONFLICT(homework_id) DO UPDATE SET total = total + 1, answered = answered + excluded.answered;
+"""
+_DOUBT_COUNT_REMOVE = """
+    UPDATE homework_doubt_counts SET total = total - 1, answered = answered - (OLD.answer IS NOT NULL) WHERE homework_id = OLD.homework_id;
+"""
+DOUBT_COUNTS_SCHEMA = f"""
+    CREATE INDEX IF NOT EXISTS idx_doubts_homework_asked ON doubts(homework_id, asked_date, id);
+    CREATE TABLE IF NOT EXISTS homework_doubt_counts (
+        homework_id INTEGER PRIMARY KEY, total INTEGER NOT NULL DEFAULT 0, answered INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE TRIGGER IF NOT EXISTS trg_doubts_count_insert AFTER INSERT ON doubts BEGIN {_DOUBT_COUNT_ADD} END;
+    CREATE TRIGGER IF NOT EXISTS trg_doubts_count_delete AFTER DELETE ON doubts BEGIN {_DOUBT_COUNT_REMOVE} END;
+    CREATE TRIGGER IF NOT EXISTS trg_doubts_count_update AFTER UPDATE OF homework_id, answer ON doubts
+    WHEN OLD.homework_id IS NOT NEW.homework_id OR (OLD.answer IS NULL) IS NOT (NEW.answer IS NULL)
+    BEGIN {_DOUBT_COUNT_REMOVE} {_DOUBT_COUNT_ADD} END;
+"""
+DOUBT_SELECT = """
+    SELECT d.id, d.homework_id, d.question, d.answer, d.asked_date AS asked_at, strftime('%d-%m-%Y %H:%M', d.asked_date) AS asked_date,
+           s.name AS student_name
+    FROM doubts d JOIN students s ON s.id = d.student_id
+"""
+
+def doubt_counts(db, homework_id):
+    row = db.execute("SELECT total, answered FROM homework_doubt_counts WHERE homework_id = ?", (homework_id,)).fetchone()
+    total, answered = (row["total"], row["answered"]) if row else (0, 0)
+    return {"total": total, "answered": answered, "unanswered": total - answered}
+
+# One page of a thread, newest first. `after` is the (asked_at, id) of the last doubt already shown;
+# returns the page and the cursor for the next one (None on the last page).
+def doubts_page(db, homework_id, after=None, limit=DOUBTS_PAGE_SIZE):
+    conditions, params = ["d.homework_id = ?"], [homework_id]
+    if after:
+        conditions.append("(d.asked_date, d.id) < (?, ?)")
+        params.extend(after)
+    rows = db.execute(f"{DOUBT_SELECT} WHERE {' AND '.join(conditions)} ORDER BY d.asked_date DESC, d.id DESC LIMIT ?", params + [limit + 1]).fetchall()
+    page = [dict(r) for r in rows[:limit]]
+    return page, f"{page[-1]['asked_at']},{page[-1]['id']}" if len(rows) > limit else None
+
+
+# ---------- Bulk Import ----------
+# Row parsers for /api/import/<kind>. Each builder preloads the lookup maps once per upload, so
+# validating a row is a few dict hits rather than queries; bad rows raise ValueError.
+STUDENT_UPSERT = "INSERT INTO students(roll_no, name, exercism_username) VALUES(?, ?, ?) ON CONFLICT(roll_no) DO UPDATE SET name = excluded.name, exercism_username = COALESCE(excluded.exercism_username, students.exercism_username)"
+STATUS_ALIASES = {**{s.lower(): s for s in ATTENDANCE_STATUSES}, "p": "Present", "ai": "Absent Informed", "au": "Absent Uninformed"}
+
+def student_lookup(db):
+    by_roll = {r[0]: r[1] for r in db.execute("SELECT roll_no, id FROM students")}
+    ids = set(by_roll.values())
+    def lookup(row):
+        if row.get("roll_no"):
+            sid = by_roll.get(row["roll_no"])
+            if sid is None: raise ValueError(f"Unknown roll_no {row['roll_no']}")
+            return sid
+        sid = as_int(row.get("student_id"))
+        if sid not in ids: raise ValueError(f"Unknown student_id {row.get('student_id')}" if row.get("student_id") else "Missing roll_no or student_id")
+        return sid
+    return lookup
+
+def parse_students(db):
+    def parse(row):
+        roll_no, name = row.get("roll_no"), row.get("name")
+        if not roll_no or not name: raise ValueError("roll_no and name are required")
+        return roll_no, name, row.get("exercism_username") or None
+    return parse
+
+def parse_attendance(db):
+    student = student_lookup(db)
+    subject_ids = {r[0] for r in db.execute("SELECT id FROM subjects")}
+    subject_names = {r[1].lower(): r[0] for r in db.execute("SELECT id, name FROM subjects")}
+    dates = {}
+    def iso_date(value):
+        if value not in dates:
+            for fmt in ("%d-%m-%Y", "%Y-%m-%d"):
+                try:
+                    dates[value] = datetime.strptime(value, fmt).strftime("%Y-%m-%d")
+                    break
+                except ValueError:
+                    continue
+            else:
+                raise ValueError(f"Invalid date {value!r}; use dd-mm-yyyy")
+            if is_archived(db, dates[value]): raise ValueError(f"Attendance for {value} is archived and read-only")
+        return dates[value]
+    def parse(row):
+        date = iso_date(row.get("date") or "")
+        subject_id = as_int(row.get("subject_id")) if row.get("subject_id") else subject_names.get((row.get("subject") or "").lower())
+        if subject_id not in subject_ids: raise ValueError(f"Unknown subject {row.get('subject_id') or row.get('subject') or ''}".strip())
+        status = STATUS_ALIASES.get((row.get("status") or "").lower())
+        if status is None: raise ValueError(f"Invalid status {row.get('status')!r}")
+        return date, subject_id, student(row), status
+    return parse
+
+def parse_grades(db):
+    student = student_lookup(db)
+    homework = {r[0] for r in db.execute("SELECT id FROM homework")}
+    def parse(row):
+        hw, grade = as_int(row.get("homework_id")), row.get("grade")
+        if hw not in homework: raise ValueError(f"Unknown homework_id {row.get('homework_id')}")
+        if grade and as_int(grade) is None: raise ValueError("Grade must be a whole number")
+        return hw, student(row), as_int(grade) if grade else None
+    return parse
+
+IMPORT_KINDS = {
+    "students": (parse_students, STUDENT_UPSERT),
+    "attendance": (parse_attendance, write_attendance_rows),
+    "grades": (parse_grades, GRADE_UPSERT),
+}
+
+
+# ---------- Attendance Analytics ----------
+ELIGIBILITY_THRESHOLD = 75.0
+attendance_matrix = MatrixCache()
+
+# Built over the hot table and every archived year, so the analytics cover the full history.
+def current_attendance_matrix(db):
+    tables = attendance_tables(db, mmap_size=app.config["DB_PRAGMAS"].get("mmap_size", 0))
+    return attendance_matrix.get(db, app.config["DATABASE"], data_version(db, "attendance"), tables)
+
+# subject_id/year/month filters shared by the analytics endpoints -> matrix column selection.
+def analytics_columns(matrix, args):
+    start = end = None
+    if args.get("year") and args.get("month"):
+        start, end = month_range(args["year"], args["month"])
+    elif args.get("year"): start, end = year_range(args["year"])
+    return matrix.select(args.get("subject_id", type=int), start, end)
+
+def nan_to_none(value, digits=1):
+    return None if value != value else round(float(value), digits)
+
+
+# ---------- Reports ----------
+# kind -> (task run in the job pool, data_versions scopes the report is built from)
+REPORTS = {
+    "attendance": (attendance_report, ("attendance", "reference")),
+    "grades": (grade_sheet, ("grades", "homework", "reference")),
+}
+
+def report_params(db, kind, data):
+    subject_id = as_int(data.get("subject_id"))
+    if not subject_id or not existing_ids(db, "subjects", [subject_id]): raise ValueError("Subject not found")
+    if kind == "grades": return {"subject_id": subject_id}
+    year, month = data.get("year"), data.get("month")
+    if year and month:
+        start, end = month_range(year, month)
+    elif year:
+        start, end = year_range(year)
+    else:
+        start, end = "0000-01-01", "9999-12-31"
+    return {"subject_id": subject_id, "start": start, "end": end}
+
+def report_job_json(job):
+    out = {k: job[k] for k in JOB_FIELDS}
+    out["status_url"] = url_for("api_report_status", job_id=job["id"])
+    if job["state"] == "done": out["download_url"] = url_for("api_report_download", job_id=job["id"])
+    return out
+
+
+# ---------- Full-Text Search ----------
+# External-content FTS5 indexes over the source tables, kept in sync by triggers.
+FTS_TABLES = {"students": ("roll_no", "name"), "homework": ("title", "description"), "doubts": ("question", "answer")}
+
+def create_fts_index(db, table, columns):
+    fts = f"{table}_fts"
+    exists = db.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (fts,)).fetchone()
+    cols = ", ".join(columns)
+    new_cols = ", ".join(f"new.{c}" for c in columns)
+    old_cols = ", ".join(f"old.{c}" for c in columns)
+    insert_new = f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_cols});"
+    delete_old = f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_cols});"
+    execute_script(db, f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({cols}, content='{table}', content_rowid='id', prefix='2 3');
+        CREATE TRIGGER IF NOT EXISTS trg_{fts}_insert AFTER INSERT ON {table} BEGIN {insert_new} END;
+        CREATE TRIGGER IF NOT EXISTS trg_{fts}_delete AFTER DELETE ON {table} BEGIN {delete_old} END;
+        CREATE TRIGGER IF NOT EXISTS trg_{fts}_update AFTER UPDATE OF {cols} ON {table} BEGIN {delete_old} {insert_new} END;
+    """)
+    if not exists:
+        db.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+# Turns free text into an FTS5 prefix query: every word must match the start of a token.
+def fts_query(text):
+    return " ".join(f'"{term}"*' for term in re.findall(r"\w+", text or ""))
+
+SEARCH_QUERIES = {
+    "students": """
+        SELECT s.id, s.roll_no, s.name FROM students_fts f JOIN students s ON s.id = f.rowid
+        WHERE students_fts MATCH ? ORDER BY bm25(students_fts, 2.0, 1.0) LIMIT ? OFFSET ?""",
+    "homework": """
+        SELECT h.id, h.title, snippet(homework_fts, 1, '[', ']', '…', 12) AS snippet, sub.name AS subject,
+               strftime('%d-%m-%Y', h.due_date) AS due_date
+        FROM homework_fts f JOIN homework h ON h.id = f.rowid JOIN subjects sub ON sub.id = h.subject_id
+        WHERE homework_fts MATCH ? ORDER BY bm25(homework_fts, 2.0, 1.0) LIMIT ? OFFSET ?""",
+    "doubts": """
+        SELECT d.id, d.homework_id, snippet(doubts_fts, -1, '[', ']', '…', 12) AS snippet, d.answer IS NOT NULL AS answered
+        FROM doubts_fts f JOIN doubts d ON d.id = f.rowid
+        WHERE doubts_fts MATCH ? ORDER BY bm25(doubts_fts) LIMIT ? OFFSET ?""",
+}
+# FTS only matches token prefixes, but roll numbers are also looked up by their tail ("0001" for
+# 24820001), so an all-digit student search keeps the substring match it had before FTS.
+ROLL_NO_QUERY = "SELECT id, roll_no, name FROM students WHERE roll_no LIKE ? ORDER BY roll_no LIMIT ? OFFSET ?"
+
+def search(db, kind, text, limit=20, offset=0):
+    if kind == "students" and (text or "").strip().isdigit():
+        rows = db.execute(ROLL_NO_QUERY, (f"%{text.strip()}%", limit + 1, offset)).fetchall()
+        return [dict(r) for r in rows[:limit]], len(rows) > limit
+    match = fts_query(text)
+    if not match: return [], False
+    rows = db.execute(SEARCH_QUERIES[kind], (match, limit + 1, offset)).fetchall()
+    return [dict(r) for r in rows[:limit]], len(rows) > limit
 
 
 # ---------- Auth Decorators ----------
@@ -197,59 +1073,30 @@ def homework_home():
 def manage_homework():
     if session['role'] == 'student':
         return redirect(url_for('homework_status'))
-    db = get_db()
-    subject_filter = request.args.get("subject_id", type=int)
-    date_filter = request.args.get("date", type=str)
-    base_query = """
-        SELECT h.id, h.title, h.description, h.posted_date, h.due_date, s.name as subject, s.id as subject_id
-        FROM homework h JOIN subjects s ON h.subject_id = s.id
-    """
-    conditions = []; params = []
-    if subject_filter:
-        conditions.append("h.subject_id = ?"); params.append(subject_filter)
-    if date_filter:
-        dmy_date = datetime.strptime(date_filter, "%Y-%m-%d").strftime("%d-%m-%Y")
-        conditions.append("h.posted_date = ?"); params.append(dmy_date)
-    if conditions:
-        base_query += " WHERE " + " AND ".join(conditions)
-    base_query += " ORDER BY substr(h.posted_date,7,4)||'-'||substr(h.posted_date,4,2)||'-'||substr(h.posted_date,1,2) DESC"
-    
-    homeworks = db.execute(base_query, params).fetchall()
-    students = db.execute("SELECT id, name FROM students ORDER BY name").fetchall()
-    submissions = {}
-    if homeworks:
-        hw_ids = [h['id'] for h in homeworks]
-        submission_rows = db.execute(f"SELECT homework_id, student_id, grade FROM homework_submissions WHERE homework_id IN ({','.join(['?']*len(hw_ids))})", hw_ids).fetchall()
-        for sub in submission_rows:
-            if sub['homework_id'] not in submissions: submissions[sub['homework_id']] = {}
-            submissions[sub['homework_id']][sub['student_id']] = sub['grade']
-
-    return render_template("manage_homework.html", page="manage_homework", homeworks=homeworks, students=students, submissions=submissions)
+    # The gradebook grid is filled in by static/js/app.js from /api/homework/grade_matrix.
+    return render_template("manage_homework.html", page="manage_homework")
 
 @app.route("/homework/status")
 @login_required
 def homework_status():
+    if session['role'] != 'student':
+        # Class-wide overview, filled in by static/js/app.js from /api/homework/status_summary.
+        return render_template("homework_overview.html", page="homework_overview")
     db = get_db()
     student_id = None
-    if session['role'] == 'student':
-        user_id = session['user_id']
-        student = db.execute("SELECT id FROM students WHERE user_id = ?", (user_id,)).fetchone()
-        if student:
-            student_id = student['id']
-    else:
-        first_student = db.execute("SELECT id FROM students LIMIT 1").fetchone()
-        if first_student:
-            student_id = first_student['id']
-            
+    student = db.execute("SELECT id FROM students WHERE user_id = ?", (session['user_id'],)).fetchone()
+    if student:
+        student_id = student['id']
+
     if not student_id:
         return render_template("homework_status.html", page="homework_status", homeworks=[])
 
     homeworks = db.execute("""
-        SELECT h.id, h.title, h.description, h.due_date, s.name as subject,
+        SELECT h.id, h.title, h.description, strftime('%d-%m-%Y', h.due_date) as due_date, s.name as subject,
                COALESCE(hs.status, 'Pending') as student_status
         FROM homework h JOIN subjects s ON h.subject_id = s.id
         LEFT JOIN homework_submissions hs ON hs.homework_id = h.id AND hs.student_id = ?
-        ORDER BY substr(h.due_date,7,4)||'-'||substr(h.due_date,4,2)||'-'||substr(h.due_date,1,2) ASC
+        ORDER BY h.due_date ASC, h.id ASC
     """, (student_id,)).fetchall()
     return render_template("homework_status.html", page="homework_status", homeworks=homeworks)
     
@@ -259,8 +1106,11 @@ def homework_doubts(homework_id):
     db = get_db()
     homework = db.execute("SELECT id, title FROM homework WHERE id = ?", (homework_id,)).fetchone()
     students = db.execute("SELECT id, name FROM students ORDER BY name").fetchall()
-    doubts = db.execute("SELECT d.id, d.question, d.answer, s.name as student_name, d.asked_date FROM doubts d JOIN students s ON d.student_id = s.id WHERE d.homework_id = ? ORDER BY d.asked_date DESC", (homework_id,)).fetchall()
-    return render_template("homework_doubts.html", page="homework_doubts", homework=homework, doubts=doubts, students=students)
+    # Read the event id first so a change committed while the page renders is replayed, not lost.
+    last_event_id = latest_event_id(db)
+    doubts, next_cursor = doubts_page(db, homework_id)
+    return render_template("homework_doubts.html", page="homework_doubts", homework=homework, doubts=doubts, next_cursor=next_cursor,
+                           counts=doubt_counts(db, homework_id), students=students, last_event_id=last_event_id)
 
 @app.route("/homework/calendar")
 @login_required
@@ -270,8 +1120,19 @@ def homework_calendar():
 @app.route("/exercism")
 @login_required
 def exercism():
+    # Rendered only from the sync cache; missing or expired entries just wake the background sync.
     db = get_db()
-    students = db.execute("SELECT name, exercism_username FROM students WHERE exercism_username IS NOT NULL").fetchall()
+    rows = db.execute("""
+        SELECT s.name, s.exercism_username, c.solved, c.tracks, c.fetched_at, c.expires_at, c.error
+        FROM students s LEFT JOIN exercism_cache c ON c.username = s.exercism_username
+        WHERE s.exercism_username IS NOT NULL ORDER BY s.name
+    """).fetchall()
+    now = datetime.now().timestamp()
+    students = [dict(r, tracks=json.loads(r["tracks"]) if r["tracks"] else [],
+                     synced=datetime.fromtimestamp(r["fetched_at"]).strftime("%d-%m-%Y %H:%M") if r["fetched_at"] else None)
+                for r in rows]
+    if app.config["EXERCISM_SYNC_ENABLED"] and any(r["expires_at"] is None or r["expires_at"] < now for r in rows):
+        get_exercism_sync().nudge()
     return render_template("exercism.html", page="exercism", students=students)
 
 @app.route('/admin/manage_users')
@@ -284,19 +1145,52 @@ def manage_users():
     return render_template('manage_users.html', users=users, students_without_users=students_without_users, page='manage_users')
 
 # ---------- APIs ----------
+@app.route("/api/admin/db_pool")
+@login_required
+@role_required('admin')
+def api_db_pool_stats():
+    return jsonify({"ok": True, "pools": [pool.stats() for pool in _pools.values()]})
+
+@app.route("/api/admin/tracing", methods=["POST"])
+@login_required
+@role_required('admin')
+def api_set_tracing():
+    data = request.get_json(silent=True) or {}
+    try:
+        if "enabled" in data: tracer.enabled = bool(data["enabled"])
+        if "slow_query_ms" in data: tracer.slow_ms = None if data["slow_query_ms"] is None else float(data["slow_query_ms"])
+        if "explain" in data: tracer.explain = bool(data["explain"])
+    except (TypeError, ValueError):
+        return jsonify({"ok": False, "error": "slow_query_ms must be a number or null"}), 400
+    return jsonify({"ok": True, "enabled": tracer.enabled, "slow_query_ms": tracer.slow_ms, "explain": tracer.explain,
+                    "connections_traced": app.config["METRICS_ENABLED"]})
+
+# Prometheus text format. Admin session, or `Authorization: Bearer $CPTS_METRICS_TOKEN` for scrapers.
+@app.route("/metrics")
+def metrics_endpoint():
+    token = app.config["METRICS_TOKEN"]
+    if session.get("role") != "admin" and not (token and request.headers.get("Authorization") == f"Bearer {token}"):
+        return jsonify({"ok": False, "error": "Forbidden"}), 403
+    gauges = {"cpts_db_pool_connections": ("Pool connections by state.", []),
+              "cpts_db_pool_events": ("Pool lifecycle counters.", [])}
+    for pool in list(_pools.values()):
+        stats = pool.stats()
+        mode = "readonly" if stats["readonly"] else "readwrite"
+        for state in ("idle", "in_use"):
+            gauges["cpts_db_pool_connections"][1].append(({"pool": mode, "state": state}, stats[state]))
+        for event in ("created", "acquired", "reused", "waits", "timeouts", "discarded"):
+            gauges["cpts_db_pool_events"][1].append(({"pool": mode, "event": event}, stats[event]))
+    return Response(metrics.render(gauges), mimetype="text/plain; version=0.0.4")
+
 @app.route("/api/subjects")
 @login_required
 def api_subjects():
-    db = get_db()
-    rows = db.execute("SELECT id, name FROM subjects ORDER BY name").fetchall()
-    return jsonify([dict(row) for row in rows])
+    return cached_json("subjects", "reference", lambda db: [dict(row) for row in db.execute("SELECT id, name FROM subjects ORDER BY name")])
 
 @app.route("/api/students")
 @login_required
 def api_students():
-    db = get_db()
-    rows = db.execute("SELECT id, roll_no, name FROM students ORDER BY name").fetchall()
-    return jsonify([dict(row) for row in rows])
+    return cached_json("students", "reference", lambda db: [dict(row) for row in db.execute("SELECT id, roll_no, name FROM students ORDER BY name")])
 
 @app.route("/api/save_attendance", methods=["POST"])
 @login_required
@@ -305,36 +1199,158 @@ def api_save_attendance():
     if session['role'] == 'student':
         return jsonify({"ok": False, "error": "Unauthorized"}), 403
 
+    # Accepts a single sheet {date, subject_id, marks} or {"sheets": [...]} for multi-subject saves.
     data = request.get_json(force=True)
-    date = data.get("date")
-    subject_id = data.get("subject_id")
-    marks = data.get("marks", [])
-    try: datetime.strptime(date, "%d-%m-%Y")
-    except Exception: return jsonify({"ok": False, "error": "Invalid date format; use dd-mm-yyyy"}), 400
-    if not subject_id or not isinstance(marks, list) or len(marks) == 0: return jsonify({"ok": False, "error": "Missing subject or marks"}), 400
+    sheets = data.get("sheets") if isinstance(data, dict) and "sheets" in data else [data]
+    if not isinstance(sheets, list) or len(sheets) == 0: return jsonify({"ok": False, "error": "Missing sheets"}), 400
+    saved, errors = save_attendance_sheets(get_db(), sheets)
+    if errors:
+        return jsonify({"ok": False, "saved": saved, "error": errors[0]["error"], "errors": errors}), 200 if saved else 400
+    return jsonify({"ok": True, "saved": saved})
+
+# Delta save for one sheet: {date, subject_id, base_revision, changes: [{student_id, status}]}, with an
+# optional Idempotency-Key header so a retried request is answered from the first one (see sync_attendance_sheet).
+@app.route("/api/attendance/sync", methods=["POST"])
+@login_required
+def api_sync_attendance():
+    if session['role'] == 'student': return jsonify({"ok": False, "error": "Unauthorized"}), 403
+    key = request.headers.get("Idempotency-Key") or None
+    if key and len(key) > 200: return jsonify({"ok": False, "error": "Idempotency-Key is too long"}), 400
+    status, body = sync_attendance_sheet(get_db(), request.get_json(silent=True), session['user_id'], key)
+    return jsonify(body), status
+
+# Streams a CSV (or .xlsx) upload, either as multipart field "file" or as the raw request body.
+@app.route("/api/import/<kind>", methods=["POST"])
+@login_required
+def api_import(kind):
+    if kind not in IMPORT_KINDS: return jsonify({"ok": False, "error": "Unknown import type"}), 404
+    if session['role'] == 'student' or (kind == "students" and session['role'] != 'admin'):
+        return jsonify({"ok": False, "error": "Unauthorized"}), 403
+    upload = request.files.get("file")
+    stream, filename = (upload.stream, upload.filename) if upload else (request.stream, "")
+    db = get_db(readonly=False)
+    build_parser, write = IMPORT_KINDS[kind]
+    rows = read_rows(stream, filename, upload.mimetype if upload else request.mimetype)
+    # Attendance chunks publish attendance.saved per sheet (see write_attendance_rows); wake the broker as each one lands.
+    on_commit = get_event_broker().notify if kind == "attendance" else None
+    result = import_rows(db, rows, build_parser(db), write, chunk_size=app.config["IMPORT_CHUNK_SIZE"],
+                         max_errors=app.config["IMPORT_MAX_ERRORS"], on_commit=on_commit)
+    if result["failed"]:
+        return jsonify({"ok": False, "error": result["errors"][0]["error"], **result}), 200 if result["saved"] else 400
+    return jsonify({"ok": True, **result})
+
+# Queues (or finds) a report job; poll status_url until state is "done", then fetch download_url.
+@app.route("/api/reports", methods=["POST"])
+@login_required
+def api_create_report():
+    if session['role'] == 'student': return jsonify({"ok": False, "error": "Unauthorized"}), 403
+    data = request.get_json(silent=True) or {}
+    kind, fmt = data.get("kind"), (data.get("format") or "csv").lower()
+    if kind not in REPORTS: return jsonify({"ok": False, "error": f"kind must be one of {', '.join(REPORTS)}"}), 400
+    if fmt not in available_formats(): return jsonify({"ok": False, "error": f"format must be one of {', '.join(available_formats())}"}), 400
+    db = get_db(readonly=False)
+    try:
+        params = report_params(db, kind, data)
+    except ValueError as exc:
+        return jsonify({"ok": False, "error": str(exc)}), 400
+    task, scopes = REPORTS[kind]
+    version = ":".join(str(data_version(db, scope)) for scope in scopes)
+    job = get_report_queue().submit(db, task, kind, fmt, params, version, session['user_id'])
+    return jsonify({"ok": True, "job": report_job_json(job)}), 200 if job["state"] == "done" else 202
+
+@app.route("/api/reports/<int:job_id>")
+@login_required
+def api_report_status(job_id):
+    if session['role'] == 'student': return jsonify({"ok": False, "error": "Unauthorized"}), 403
+    job = get_report_queue().get(get_db(), job_id)
+    if not job: return jsonify({"ok": False, "error": "Report not found"}), 404
+    return jsonify({"ok": True, "job": report_job_json(job)})
+
+@app.route("/api/reports/<int:job_id>/download")
+@login_required
+def api_report_download(job_id):
+    if session['role'] == 'student': return jsonify({"ok": False, "error": "Unauthorized"}), 403
+    job = get_report_queue().get(get_db(), job_id)
+    if not job or job["state"] != "done" or not os.path.exists(job["artifact"]): return jsonify({"ok": False, "error": "Report not ready"}), 404
+    return send_file(job["artifact"], as_attachment=True, download_name=job["filename"], max_age=0)
+
+# Every student's percentage against the eligibility threshold plus absence streaks, computed for
+# the whole class in one pass over the cached status matrix. at_risk=1 keeps only those below it.
+@app.route("/api/analytics/attendance")
+@login_required
+def api_attendance_analytics():
+    if session['role'] == 'student': return jsonify({"ok": False, "error": "Unauthorized"}), 403
+    threshold = request.args.get("threshold", ELIGIBILITY_THRESHOLD, type=float)
+    if not 0 < threshold < 100: return jsonify({"ok": False, "error": "threshold must be between 0 and 100"}), 400
     db = get_db()
-    s = db.execute("SELECT id FROM subjects WHERE id=?", (subject_id,)).fetchone()
-    if not s: return jsonify({"ok": False, "error": "Subject not found"}), 404
-    for m in marks:
-        sid = m.get("student_id")
-        status = m.get("status")
-        if status not in ("Present", "Absent Informed", "Absent Uninformed"): return jsonify({"ok": False, "error": "Invalid status"}), 400
-        st = db.execute("SELECT id FROM students WHERE id=?", (sid,)).fetchone()
-        if not st: return jsonify({"ok": False, "error": f"Student {sid} not found"}), 404
-        db.execute("INSERT INTO attendance(date, subject_id, student_id, status) VALUES(?,?,?,?) ON CONFLICT(date, subject_id, student_id) DO UPDATE SET status=excluded.status", (date, subject_id, sid, status))
-    db.commit()
-    return jsonify({"ok": True})
+    names = {r["id"]: r for r in db.execute("SELECT id, roll_no, name FROM students")}
+    with attendance_matrix.lock:
+        try:
+            matrix = current_attendance_matrix(db)
+        except ArchiveError as e:
+            return jsonify({"ok": False, "error": str(e)}), 400
+        try:
+            cols = analytics_columns(matrix, request.args)
+        except ValueError:
+            return jsonify({"ok": False, "error": "Invalid year or month"}), 400
+        stats = matrix.student_stats(cols, threshold)
+    students = []
+    for i, sid in enumerate(stats["student_id"].tolist()):
+        if sid not in names: continue
+        pct = nan_to_none(stats["percentage"][i])
+        students.append({
+            "id": sid, "roll_no": names[sid]["roll_no"], "name": names[sid]["name"],
+            **{k: int(stats[k][i]) for k in ("present", "absent_informed", "absent_uninformed", "recorded", "classes_needed", "current_absence_streak", "longest_absence_streak")},
+            "percentage": pct, "eligible": None if pct is None else pct >= threshold,
+        })
+    recorded = [s for s in students if s["percentage"] is not None]
+    summary = {"students": len(students), "sessions": len(cols), "eligible": sum(s["eligible"] for s in recorded), "at_risk": sum(not s["eligible"] for s in recorded),
+               "average_percentage": round(sum(s["percentage"] for s in recorded) / len(recorded), 1) if recorded else None}
+    if request.args.get("at_risk") == "1": students = [s for s in students if s["eligible"] is False]
+    students.sort(key=lambda s: (s["percentage"] is None, s["percentage"] or 0, s["roll_no"]))
+    return jsonify({"ok": True, "threshold": threshold, "summary": summary, "students": students})
 
+@app.route("/api/analytics/heatmap")
+@login_required
+def api_attendance_heatmap():
+    if session['role'] == 'student': return jsonify({"ok": False, "error": "Unauthorized"}), 403
+    db = get_db()
+    names = {r[0]: r[1] for r in db.execute("SELECT id, name FROM subjects")}
+    with attendance_matrix.lock:
+        try:
+            matrix = current_attendance_matrix(db)
+        except ArchiveError as e:
+            return jsonify({"ok": False, "error": str(e)}), 400
+        try:
+            cols = analytics_columns(matrix, request.args)
+        except ValueError:
+            return jsonify({"ok": False, "error": "Invalid year or month"}), 400
+        subjects, rate, sessions = matrix.weekday_heatmap(cols)
+    rows = [{"subject_id": sid, "subject": names.get(sid), "rates": [nan_to_none(v) for v in rate[i]], "sessions": sessions[i].tolist()}
+            for i, sid in enumerate(subjects.tolist())]
+    return jsonify({"ok": True, "weekdays": WEEKDAYS, "subjects": rows})
+
+# One register sheet with its revision; ?since=<revision> returns only the rows changed after it.
 @app.route("/api/get_attendance_for_store")
 @login_required
 def api_get_attendance_for_store():
     subject_id = request.args.get("subject_id", type=int)
     date = request.args.get("date", type=str)
-    try: datetime.strptime(date, "%d-%m-%Y")
-    except Exception: return jsonify({"ok": False, "error": "Invalid date format; use dd-mm-yyyy"}), 400
+    try:
+        date = dmy_to_iso(date)
+    except Exception:
+        return jsonify({"ok": False, "error": "Invalid date format; use dd-mm-yyyy"}), 400
+    since = request.args.get("since")
+    if since is not None and not since.isdigit(): return jsonify({"ok": False, "error": "since must be a revision number"}), 400
     db = get_db()
-    rows = db.execute("SELECT st.id as student_id, COALESCE(a.status, 'none') AS status FROM students st LEFT JOIN attendance a ON a.student_id = st.id AND a.subject_id = ? AND a.date = ?", (subject_id, date)).fetchall()
-    return jsonify({"ok": True, "records": [dict(r) for r in rows]})
+    # Revision first: rows written after it are at worst sent again next time, never missed.
+    event_id, revision = latest_event_id(db), sheet_revision(db, date, subject_id)
+    if since is not None:
+        rows = db.execute("SELECT student_id, status FROM attendance WHERE subject_id = ? AND date = ? AND revision > ?", (subject_id, date, int(since))).fetchall()
+    else:
+        source = attendance_from(db, date, next_day(date))
+        rows = db.execute(f"SELECT st.id as student_id, COALESCE(a.status, 'none') AS status FROM students st LEFT JOIN {source} a ON a.student_id = st.id AND a.subject_id = ? AND a.date = ?", (subject_id, date)).fetchall()
+    return jsonify({"ok": True, "records": [dict(r) for r in rows], "revision": revision, "last_event_id": event_id})
 
 @app.route("/api/get_attendance")
 @login_required
@@ -346,27 +1362,145 @@ def api_get_attendance():
     if filter_type == "day":
         date = request.args.get("date", type=str)
         if not date: return jsonify({"ok": False, "error": "Date is required for day view"}), 400
-        try: datetime.strptime(date, "%d-%m-%Y")
-        except (ValueError, TypeError): return jsonify({"ok": False, "error": "Invalid date format"}), 400
-        rows = db.execute("SELECT st.roll_no, st.name, COALESCE(a.status,'Absent Uninformed') AS status FROM students st LEFT JOIN attendance a ON a.student_id = st.id AND a.subject_id = ? AND a.date = ? ORDER BY st.name", (subject_id, date)).fetchall()
+        try:
+            date = dmy_to_iso(date)
+        except (ValueError, TypeError):
+            return jsonify({"ok": False, "error": "Invalid date format"}), 400
+        try:
+            source = attendance_from(db, date, next_day(date))
+        except ArchiveError as e:
+            return jsonify({"ok": False, "error": str(e)}), 400
+        rows = db.execute(f"SELECT st.roll_no, st.name, COALESCE(a.status,'Absent Uninformed') AS status FROM students st LEFT JOIN {source} a ON a.student_id = st.id AND a.subject_id = ? AND a.date = ? ORDER BY st.name", (subject_id, date)).fetchall()
         return jsonify({"ok": True, "records": [dict(r) for r in rows]})
     else:
-        base_query = "SELECT a.date, st.roll_no, st.name, a.status FROM attendance a JOIN students st ON a.student_id = st.id WHERE a.subject_id = ?"
-        params = [subject_id]
+        base_query = "SELECT strftime('%d-%m-%Y', a.date) AS date, st.roll_no, st.name, a.status FROM {source} a JOIN students st ON a.student_id = st.id WHERE a.subject_id = ?"
+        params, start, end = [subject_id], None, None
         if filter_type == "year":
             year = request.args.get("year", type=str)
             if not year: return jsonify({"ok": False, "error": "Year is required"}), 400
-            base_query += " AND substr(a.date, 7, 4) = ?"
-            params.append(year)
+            try:
+                start, end = year_range(year)
+            except ValueError:
+                return jsonify({"ok": False, "error": "Invalid year"}), 400
+            base_query += " AND a.date >= ? AND a.date < ?"
+            params.extend([start, end])
         elif filter_type == "month":
             year = request.args.get("year", type=str)
             month = request.args.get("month", type=str)
             if not year or not month: return jsonify({"ok": False, "error": "Year and month are required"}), 400
-            base_query += " AND substr(a.date, 7, 4) = ? AND substr(a.date, 4, 2) = ?"
-            params.extend([year, month.zfill(2)])
-        base_query += " ORDER BY substr(a.date,7,4), substr(a.date,4,2), substr(a.date,1,2), st.name"
-        rows = db.execute(base_query, params).fetchall()
-        return jsonify({"ok": True, "records": [dict(r) for r in rows]})
+            try:
+                start, end = month_range(year, month)
+            except ValueError:
+                return jsonify({"ok": False, "error": "Invalid year or month"}), 400
+            base_query += " AND a.date >= ? AND a.date < ?"
+            params.extend([start, end])
+        try:
+            base_query = base_query.format(source=attendance_from(db, start, end))
+        except ArchiveError as e:
+            return jsonify({"ok": False, "error": str(e)}), 400
+        export = request.args.get("format")
+        if export in ("ndjson", "csv"):
+            return stream_attendance(db, base_query + " ORDER BY a.date, a.student_id", params, export, subject_id)
+        limit = request.args.get("limit", type=int)
+        after = request.args.get("after", type=str)
+        if after:
+            # Keyset cursor "dd-mm-yyyy,roll_no" -> seek past (date, student_id) on the index.
+            try:
+                after_date, after_roll = after.split(",", 1)
+                after_date = dmy_to_iso(after_date)
+            except ValueError:
+                return jsonify({"ok": False, "error": "Invalid cursor; use after=dd-mm-yyyy,roll_no"}), 400
+            st = db.execute("SELECT id FROM students WHERE roll_no = ?", (after_roll,)).fetchone()
+            if not st: return jsonify({"ok": False, "error": f"Student {after_roll} not found"}), 400
+            base_query += " AND (a.date, a.student_id) > (?, ?)"
+            params.extend([after_date, st["id"]])
+        # (subject_id, date, student_id) index order: no sort step.
+        base_query += " ORDER BY a.date, a.student_id"
+        if not limit:
+            rows = db.execute(base_query, params).fetchall()
+            return jsonify({"ok": True, "records": [dict(r) for r in rows]})
+        limit = max(1, min(limit, 5000))
+        rows = db.execute(base_query + " LIMIT ?", params + [limit + 1]).fetchall()
+        records = [dict(r) for r in rows[:limit]]
+        next_cursor = f"{records[-1]['date']},{records[-1]['roll_no']}" if len(rows) > limit else None
+        return jsonify({"ok": True, "records": records, "next": next_cursor})
+
+def stream_attendance(db, query, params, export, subject_id):
+    columns = ("date", "roll_no", "name", "status")
+    def generate():
+        cur = db.execute(query, params)
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        if export == "csv": writer.writerow(columns)
+        while True:
+            batch = cur.fetchmany(500)
+            if not batch: break
+            if export == "csv":
+                writer.writerows(tuple(r) for r in batch)
+            else:
+                buf.writelines(json.dumps(dict(r)) + "\n" for r in batch)
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+        yield buf.getvalue()
+    mimetype = "text/csv" if export == "csv" else "application/x-ndjson"
+    resp = Response(stream_with_context(generate()), mimetype=mimetype)
+    if export == "csv": resp.headers["Content-Disposition"] = f"attachment; filename=attendance_subject_{subject_id}.csv"
+    return resp
+
+@app.route("/api/attendance/summary")
+@login_required
+def api_attendance_summary():
+    subject_id = request.args.get("subject_id", type=int)
+    try:
+        bounds = summary_month_bounds(request.args)
+    except ValueError:
+        return jsonify({"ok": False, "error": "Invalid year or month"}), 400
+    join, params = "", []
+    if subject_id:
+        join += " AND x.subject_id = ?"
+        params.append(subject_id)
+    if bounds:
+        join += " AND x.month >= ? AND x.month < ?"
+        params.extend(bounds)
+    rows = get_db().execute(f"""
+        SELECT st.id AS student_id, st.roll_no, st.name, COALESCE(SUM(x.present), 0) AS present,
+               COALESCE(SUM(x.absent_informed), 0) AS absent_informed, COALESCE(SUM(x.absent_uninformed), 0) AS absent_uninformed
+        FROM students st LEFT JOIN attendance_summary x ON x.student_id = st.id{join}
+        GROUP BY st.id ORDER BY st.name
+    """, params).fetchall()
+    return jsonify({"ok": True, "students": [{"student_id": r["student_id"], "roll_no": r["roll_no"], "name": r["name"], **summary_totals(r)} for r in rows]})
+
+@app.route("/api/attendance/summary/<int:student_id>")
+@login_required
+def api_student_attendance_summary(student_id):
+    db = get_db()
+    stu = db.execute("SELECT id, roll_no, name FROM students WHERE id = ?", (student_id,)).fetchone()
+    if not stu: return jsonify({"ok": False, "error": "Student not found"}), 404
+    try:
+        bounds = summary_month_bounds(request.args)
+    except ValueError:
+        return jsonify({"ok": False, "error": "Invalid year or month"}), 400
+    condition, params = "", [student_id]
+    if bounds:
+        condition = " AND x.month >= ? AND x.month < ?"
+        params.extend(bounds)
+    rows = db.execute(f"""
+        SELECT x.subject_id, s.name AS subject, x.month, x.present, x.absent_informed, x.absent_uninformed
+        FROM attendance_summary x JOIN subjects s ON s.id = x.subject_id
+        WHERE x.student_id = ?{condition} ORDER BY s.name, x.month
+    """, params).fetchall()
+    subjects = {}
+    for r in rows:
+        t = subjects.setdefault(r["subject_id"], {"subject_id": r["subject_id"], "subject": r["subject"], "present": 0, "absent_informed": 0, "absent_uninformed": 0})
+        for k in ("present", "absent_informed", "absent_uninformed"):
+            t[k] += r[k]
+    overall = {k: sum(t[k] for t in subjects.values()) for k in ("present", "absent_informed", "absent_uninformed")}
+    return jsonify({
+        "ok": True, "student": dict(stu), "overall": summary_totals(overall),
+        "subjects": [{"subject_id": t["subject_id"], "subject": t["subject"], **summary_totals(t)} for t in subjects.values()],
+        "months": [{"subject_id": r["subject_id"], "subject": r["subject"], "month": r["month"], **summary_totals(r)} for r in rows],
+    })
 
 @app.route("/api/student_report")
 @login_required
@@ -377,22 +1511,64 @@ def api_student_report():
     year = request.args.get("year")
     month = request.args.get("month")
     date = request.args.get("date")
+    student_id = request.args.get("student_id", type=int)
     db = get_db()
-    stu = db.execute("SELECT * FROM students WHERE roll_no LIKE ? OR name LIKE ? ORDER BY name LIMIT 1", (f"%{q}%", f"%{q}%")).fetchone()
-    if not stu: return jsonify({"ok": True, "student": None, "rows": []})
-    conditions = ["a.student_id = ?"]; params = [stu["id"]]
+    # An exact roll number or an explicit student_id wins; otherwise take the best-ranked FTS match
+    # and hand the other candidates back so the page can offer them.
+    matches = []
+    if student_id:
+        stu = db.execute("SELECT id, roll_no, name FROM students WHERE id = ?", (student_id,)).fetchone()
+    else:
+        stu = db.execute("SELECT id, roll_no, name FROM students WHERE roll_no = ?", (q,)).fetchone()
+    if not stu:
+        matches, _ = search(db, "students", q, limit=10)
+        stu = matches[0] if matches else None
+    if not stu: return jsonify({"ok": True, "student": None, "matches": [], "rows": []})
+    conditions = ["a.student_id = ?"]
+    params = [stu["id"]]
+    bounds = (None, None)
     if subject_id: conditions.append("a.subject_id = ?"); params.append(subject_id)
-    if date_type == "year" and year: conditions.append("substr(a.date,7,4) = ?"); params.append(year)
-    if date_type == "month" and month and year:
-        conditions.append("substr(a.date,4,2) = ? AND substr(a.date,7,4) = ?"); params.extend([month.zfill(2), year])
+    try:
+        if date_type == "year" and year:
+            bounds = year_range(year)
+            conditions.append("a.date >= ? AND a.date < ?")
+            params.extend(bounds)
+        if date_type == "month" and month and year:
+            bounds = month_range(year, month)
+            conditions.append("a.date >= ? AND a.date < ?")
+            params.extend(bounds)
+    except ValueError:
+        return jsonify({"ok": False, "error": "Invalid year or month"}), 400
     if date_type == "date" and date:
         try:
-            dmy = datetime.strptime(date, "%Y-%m-%d").strftime("%d-%m-%Y")
-            conditions.append("a.date = ?"); params.append(dmy)
-        except (ValueError, TypeError): return jsonify({"ok": False, "error": "Invalid date format"}), 400
-    query = f"SELECT a.date, s.name AS subject, a.status FROM attendance a JOIN subjects s ON s.id = a.subject_id WHERE {' AND '.join(conditions)} ORDER BY substr(a.date,7,4)||'-'||substr(a.date,4,2)||'-'||substr(a.date,1,2) ASC, s.name ASC"
+            datetime.strptime(date, "%Y-%m-%d")
+            bounds = (date, next_day(date))
+            conditions.append("a.date = ?")
+            params.append(date)
+        except (ValueError, TypeError):
+            return jsonify({"ok": False, "error": "Invalid date format"}), 400
+    try:
+        source = attendance_from(db, *bounds)
+    except ArchiveError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    # (student_id, date, subject_id) index order: no sort step (unless archives are unioned in).
+    query = f"SELECT strftime('%d-%m-%Y', a.date) AS date, s.name AS subject, a.status FROM {source} a JOIN subjects s ON s.id = a.subject_id WHERE {' AND '.join(conditions)} ORDER BY a.date ASC, a.subject_id ASC"
     rows = db.execute(query, params).fetchall()
-    return jsonify({"ok": True, "student": {"id": stu["id"], "roll_no": stu["roll_no"], "name": stu["name"]}, "rows": [dict(r) for r in rows]})
+    return jsonify({"ok": True, "student": {"id": stu["id"], "roll_no": stu["roll_no"], "name": stu["name"]}, "matches": matches, "rows": [dict(r) for r in rows]})
+
+@app.route("/api/search")
+@login_required
+def api_search():
+    q = (request.args.get("q") or "").strip()
+    kinds = [k for k in (request.args.get("type") or ",".join(SEARCH_QUERIES)).split(",") if k]
+    if any(k not in SEARCH_QUERIES for k in kinds): return jsonify({"ok": False, "error": f"type must be one of {', '.join(SEARCH_QUERIES)}"}), 400
+    limit = max(1, min(request.args.get("limit", 20, type=int), 100))
+    offset = max(0, request.args.get("offset", 0, type=int))
+    db = get_db()
+    results, has_more = {}, {}
+    for kind in kinds:
+        results[kind], has_more[kind] = search(db, kind, q, limit, offset)
+    return jsonify({"ok": True, "q": q, "results": results, "has_more": has_more, "limit": limit, "offset": offset})
 
 @app.route("/api/homework", methods=["POST"])
 @login_required
@@ -400,12 +1576,12 @@ def api_add_homework():
     if session['role'] == 'student':
         return jsonify({"ok": False, "error": "Unauthorized"}), 403
     data = request.get_json()
-    posted_date = datetime.now().strftime("%d-%m-%Y")
-    due_date = datetime.strptime(data['due_date'], "%Y-%m-%d").strftime("%d-%m-%Y")
+    posted_date = datetime.now().strftime("%Y-%m-%d")
+    due_date = datetime.strptime(data['due_date'], "%Y-%m-%d").strftime("%Y-%m-%d")
     db = get_db()
     cursor = db.execute("INSERT INTO homework (subject_id, title, description, posted_date, due_date) VALUES (?, ?, ?, ?, ?)", (data['subject_id'], data['title'], data.get('description', ''), posted_date, due_date))
     db.commit()
-    return jsonify({"ok": True, "new_id": cursor.lastrowid, "posted_date": posted_date})
+    return jsonify({"ok": True, "new_id": cursor.lastrowid, "posted_date": iso_to_dmy(posted_date)})
 
 @app.route("/api/homework/<int:homework_id>", methods=["POST"])
 @login_required
@@ -413,7 +1589,7 @@ def api_update_homework(homework_id):
     if session['role'] == 'student':
         return jsonify({"ok": False, "error": "Unauthorized"}), 403
     data = request.get_json(force=True)
-    due_date = datetime.strptime(data.get("due_date"), "%Y-%m-%d").strftime("%d-%m-%Y")
+    due_date = datetime.strptime(data.get("due_date"), "%Y-%m-%d").strftime("%Y-%m-%d")
     db = get_db()
     db.execute("UPDATE homework SET subject_id = ?, title = ?, description = ?, due_date = ? WHERE id = ?", (data.get("subject_id"), data.get("title"), data.get("description"), due_date, homework_id))
     db.commit()
@@ -436,20 +1612,194 @@ def api_grade_homework():
         return jsonify({"ok": False, "error": "Unauthorized"}), 403
     data = request.get_json()
     db = get_db()
-    db.execute("INSERT INTO homework_submissions (homework_id, student_id, grade, status) VALUES (?, ?, ?, 'Graded') ON CONFLICT(homework_id, student_id) DO UPDATE SET grade = excluded.grade, status = 'Graded'",(data['homework_id'], data['student_id'], data.get('grade')))
+    db.execute(GRADE_UPSERT,(data['homework_id'], data['student_id'], data.get('grade')))
     db.commit()
     return jsonify({"ok": True})
 
+@app.route("/api/homework/grades", methods=["POST"])
+@login_required
+def api_grade_homework_batch():
+    if session['role'] == 'student':
+        return jsonify({"ok": False, "error": "Unauthorized"}), 403
+    data = request.get_json(force=True)
+    grades = data.get("grades") if isinstance(data, dict) else None
+    if not isinstance(grades, list) or not grades: return jsonify({"ok": False, "error": "Missing grades"}), 400
+    saved, errors = save_grades(get_db(), grades)
+    if errors:
+        return jsonify({"ok": False, "saved": saved, "error": errors[0]["error"], "errors": errors}), 200 if saved else 400
+    return jsonify({"ok": True, "saved": saved})
+
+@app.route("/api/homework/grade_matrix")
+@login_required
+def api_grade_matrix():
+    if session['role'] == 'student':
+        return jsonify({"ok": False, "error": "Unauthorized"}), 403
+    db = get_db()
+    conditions, params = [], []
+    subject_id = request.args.get("subject_id", type=int)
+    posted = request.args.get("date", type=str)
+    after = request.args.get("after", type=int)
+    limit = max(1, min(request.args.get("limit", 50, type=int), 500))
+    if subject_id:
+        conditions.append("h.subject_id = ?")
+        params.append(subject_id)
+    if posted:
+        try:
+            datetime.strptime(posted, "%Y-%m-%d")
+        except ValueError:
+            return jsonify({"ok": False, "error": "Invalid date; use yyyy-mm-dd"}), 400
+        conditions.append("h.posted_date = ?")
+        params.append(posted)
+    if after:
+        # Keyset cursor: the last homework id of the previous page, newest first.
+        last = db.execute("SELECT posted_date FROM homework WHERE id = ?", (after,)).fetchone()
+        if not last: return jsonify({"ok": False, "error": "Invalid cursor"}), 400
+        conditions.append("(h.posted_date, h.id) < (?, ?)")
+        params.extend([last["posted_date"], after])
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    rows = db.execute(f"""
+        SELECT h.id, h.title, h.description, h.subject_id, s.name AS subject,
+               strftime('%d-%m-%Y', h.posted_date) AS posted_date, strftime('%d-%m-%Y', h.due_date) AS due_date
+        FROM homework h JOIN subjects s ON h.subject_id = s.id {where}
+        ORDER BY h.posted_date DESC, h.id DESC LIMIT ?
+    """, params + [limit + 1]).fetchall()
+    page = rows[:limit]
+    students = db.execute("SELECT id, name FROM students ORDER BY name").fetchall()
+    # Column-oriented payload: grades is row-major, len(homework.id) x len(students.id), null = ungraded.
+    hw_index = {r["id"]: i for i, r in enumerate(page)}
+    st_index = {r["id"]: j for j, r in enumerate(students)}
+    grades = [None] * (len(page) * len(students))
+    if page:
+        for sub in db.execute("SELECT homework_id, student_id, grade FROM homework_submissions WHERE homework_id IN (SELECT value FROM json_each(?))",
+                              (json.dumps(list(hw_index)),)):
+            j = st_index.get(sub["student_id"])
+            if j is not None: grades[hw_index[sub["homework_id"]] * len(students) + j] = sub["grade"]
+    columns = ("id", "title", "description", "subject_id", "subject", "posted_date", "due_date")
+    return jsonify({
+        "ok": True,
+        "homework": {c: [r[c] for r in page] for c in columns},
+        "students": {"id": [r["id"] for r in students], "name": [r["name"] for r in students]},
+        "grades": grades,
+        "next": page[-1]["id"] if len(rows) > limit else None,
+    })
+
+# Class-wide submission state for a page of homework, newest due date first: one grouped query over
+# just that page's submissions. Pending counts every student without a Completed or Graded row.
+@app.route("/api/homework/status_summary")
+@login_required
+def api_homework_status_summary():
+    if session['role'] == 'student':
+        return jsonify({"ok": False, "error": "Unauthorized"}), 403
+    db = get_db()
+    conditions, params = [], []
+    subject_id = request.args.get("subject_id", type=int)
+    after = request.args.get("after", type=int)
+    limit = max(1, min(request.args.get("limit", 50, type=int), 500))
+    if subject_id:
+        conditions.append("subject_id = ?")
+        params.append(subject_id)
+    if after:
+        # Keyset cursor: the last homework id of the previous page.
+        last = db.execute("SELECT due_date FROM homework WHERE id = ?", (after,)).fetchone()
+        if not last: return jsonify({"ok": False, "error": "Invalid cursor"}), 400
+        conditions.append("(due_date, id) < (?, ?)")
+        params.extend([last["due_date"], after])
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    rows = db.execute(f"""
+        WITH page AS (SELECT id, subject_id, title, due_date FROM homework {where} ORDER BY due_date DESC, id DESC LIMIT ?)
+        SELECT p.id, p.title, s.name AS subject, strftime('%d-%m-%Y', p.due_date) AS due_date,
+               COALESCE(SUM(hs.status = 'Completed'), 0) AS completed, COALESCE(SUM(hs.status = 'Graded'), 0) AS graded,
+               COALESCE(c.total, 0) AS doubts, COALESCE(c.total - c.answered, 0) AS unanswered
+        FROM page p JOIN subjects s ON s.id = p.subject_id
+        LEFT JOIN homework_submissions hs ON hs.homework_id = p.id
+        LEFT JOIN homework_doubt_counts c ON c.homework_id = p.id
+        GROUP BY p.id ORDER BY p.due_date DESC, p.id DESC
+    """, params + [limit + 1]).fetchall()
+    students = db.execute("SELECT COUNT(*) FROM students").fetchone()[0]
+    homework = [dict(r, pending=max(0, students - r["completed"] - r["graded"])) for r in rows[:limit]]
+    return jsonify({"ok": True, "students": students, "homework": homework, "next": homework[-1]["id"] if len(rows) > limit else None})
+
+# Per-student drill-down for one homework, optionally only one status (Pending / Completed / Graded).
+@app.route("/api/homework/<int:homework_id>/status")
+@login_required
+def api_homework_student_status(homework_id):
+    if session['role'] == 'student':
+        return jsonify({"ok": False, "error": "Unauthorized"}), 403
+    status = request.args.get("status")
+    if status and status not in HOMEWORK_STATUSES: return jsonify({"ok": False, "error": f"status must be one of {', '.join(HOMEWORK_STATUSES)}"}), 400
+    db = get_db()
+    homework = db.execute("SELECT id, title FROM homework WHERE id = ?", (homework_id,)).fetchone()
+    if not homework: return jsonify({"ok": False, "error": "Homework not found"}), 404
+    query = """
+        SELECT st.id, st.roll_no, st.name, COALESCE(hs.status, 'Pending') AS status, hs.grade
+        FROM students st LEFT JOIN homework_submissions hs ON hs.homework_id = ? AND hs.student_id = st.id
+    """
+    params = [homework_id]
+    if status:
+        query += " WHERE COALESCE(hs.status, 'Pending') = ?"
+        params.append(status)
+    rows = db.execute(query + " ORDER BY st.roll_no", params).fetchall()
+    return jsonify({"ok": True, "homework": dict(homework), "students": [dict(r) for r in rows]})
+
+# Publishes the doubt's row and its homework's updated counts on the homework's channel. For a delete,
+# read the row before deleting and pass it in, since the counts are only current afterwards.
+def publish_doubt(db, event, doubt_id, row=None):
+    row = row or db.execute(f"{DOUBT_SELECT} WHERE d.id = ?", (doubt_id,)).fetchone()
+    if row: publish(db, f"homework:{row['homework_id']}", event, {**dict(row), "counts": doubt_counts(db, row['homework_id'])})
+
+# Server-sent events for ?channel=homework:<id> (doubts) and ?channel=attendance:<subject_id> (staff only).
+# Holds no DB connection while open; resumes from Last-Event-ID (or ?last_event_id= on first connect).
+@app.route("/api/events")
+@login_required
+def api_events():
+    channels = request.args.getlist("channel")
+    if not channels: return jsonify({"ok": False, "error": "At least one channel is required"}), 400
+    for channel in channels:
+        kind, _, key = channel.partition(":")
+        if kind not in ("homework", "attendance") or not key.isdigit(): return jsonify({"ok": False, "error": f"Invalid channel {channel}"}), 400
+        if kind == "attendance" and session['role'] == 'student': return jsonify({"ok": False, "error": "Unauthorized"}), 403
+    after = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+    after = int(after) if after and after.isdigit() else None
+    broker = get_event_broker()
+    if not broker.acquire_stream():
+        # No stream slot left: answer what is new right away and let EventSource poll again.
+        body = broker.poll(channels, after, retry_ms=int(app.config["EVENTS_POLL_RETRY"] * 1000))
+        return Response(body, mimetype="text/event-stream", headers={"Cache-Control": "no-cache"})
+    stream = broker.stream(channels, after, heartbeat=app.config["EVENTS_HEARTBEAT"], max_duration=app.config["EVENTS_MAX_STREAM"])
+    resp = Response(stream, mimetype="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    resp.call_on_close(broker.release_stream)
+    return resp
+
+# Older pages of a doubts thread, for "load more" on the doubts page.
+@app.route("/api/homework/<int:homework_id>/doubts")
+@login_required
+def api_homework_doubts(homework_id):
+    after = request.args.get("after")
+    limit = max(1, min(request.args.get("limit", DOUBTS_PAGE_SIZE, type=int), 100))
+    if after:
+        # Keyset cursor "yyyy-mm-dd HH:MM,id" -> seek past (asked_date, id) on the index.
+        asked_at, _, doubt_id = after.rpartition(",")
+        try:
+            datetime.strptime(asked_at, "%Y-%m-%d %H:%M")
+            after = (asked_at, int(doubt_id))
+        except ValueError:
+            return jsonify({"ok": False, "error": "Invalid cursor; use after=yyyy-mm-dd HH:MM,id"}), 400
+    db = get_db()
+    doubts, next_cursor = doubts_page(db, homework_id, after, limit)
+    return jsonify({"ok": True, "doubts": doubts, "counts": doubt_counts(db, homework_id), "next": next_cursor})
+
 @app.route("/api/doubts/ask", methods=["POST"])
 @login_required
 def api_ask_doubt():
     data = request.get_json()
     student_id = data.get('student_id')
     if not student_id: return jsonify({"ok": False, "message": "Please select a student."}), 400
-    asked_date = datetime.now().strftime("%d-%m-%Y %H:%M")
+    asked_date = datetime.now().strftime("%Y-%m-%d %H:%M")
     db = get_db()
-    db.execute("INSERT INTO doubts (homework_id, student_id, question, asked_date) VALUES (?, ?, ?, ?)",(data['homework_id'], student_id, data['question'], asked_date))
+    doubt_id = db.execute("INSERT INTO doubts (homework_id, student_id, question, asked_date) VALUES (?, ?, ?, ?)",(data['homework_id'], student_id, data['question'], asked_date)).lastrowid
+    publish_doubt(db, "doubt.asked", doubt_id)
     db.commit()
+    get_event_broker().notify()
     return jsonify({"ok": True, "message": "Doubt posted!"})
 
 @app.route("/api/doubts/answer", methods=["POST"])
@@ -460,7 +1810,9 @@ def api_answer_doubt():
     data = request.get_json()
     db = get_db()
     db.execute("UPDATE doubts SET answer = ? WHERE id = ?",(data['answer'], data['doubt_id']))
+    publish_doubt(db, "doubt.answered", data['doubt_id'])
     db.commit()
+    get_event_broker().notify()
     return jsonify({"ok": True, "message": "Answer posted!"})
 
 @app.route("/api/doubts/<int:doubt_id>", methods=["POST"])
@@ -471,30 +1823,47 @@ def api_update_doubt(doubt_id):
     if not question_text: return jsonify({"ok": False, "message": "Question text cannot be empty."}), 400
     db = get_db()
     db.execute("UPDATE doubts SET question = ? WHERE id = ?", (question_text, doubt_id))
+    publish_doubt(db, "doubt.updated", doubt_id)
     db.commit()
+    get_event_broker().notify()
     return jsonify({"ok": True})
 
 @app.route("/api/doubts/<int:doubt_id>", methods=["DELETE"])
 @login_required
 def api_delete_doubt(doubt_id):
     db = get_db()
+    row = db.execute(f"{DOUBT_SELECT} WHERE d.id = ?", (doubt_id,)).fetchone()
     db.execute("DELETE FROM doubts WHERE id = ?", (doubt_id,))
+    publish_doubt(db, "doubt.deleted", doubt_id, row)
     db.commit()
+    get_event_broker().notify()
     return jsonify({"ok": True})
 
 @app.route("/api/homework/events")
 @login_required
 def api_homework_events():
-    db = get_db()
-    homeworks = db.execute("SELECT id, title, due_date FROM homework").fetchall()
-    events = []
-    for hw in homeworks:
-        try:
-            d, m, y = hw['due_date'].split('-')
-            start_date = f"{y}-{m}-{d}"
-            events.append({'title': hw['title'],'start': start_date,'url': url_for('homework_doubts', homework_id=hw['id']),'color': '#b58900'})
-        except (ValueError, IndexError): continue
-    return jsonify(events)
+    # FullCalendar sends the visible window as ISO start/end (end exclusive), possibly with a time part.
+    start = (request.args.get("start") or "")[:10]
+    end = (request.args.get("end") or "")[:10]
+    try:
+        for value in filter(None, (start, end)):
+            datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        return jsonify({"ok": False, "error": "Invalid start/end; use yyyy-mm-dd"}), 400
+    def build(db):
+        conditions, params = [], []
+        if start:
+            conditions.append("due_date >= ?")
+            params.append(start)
+        if end:
+            conditions.append("due_date < ?")
+            params.append(end)
+        query = "SELECT id, title, due_date FROM homework"
+        if conditions: query += " WHERE " + " AND ".join(conditions)
+        doubts_url = url_for('homework_doubts', homework_id=0)[:-1]
+        return [{'title': hw['title'],'start': hw['due_date'],'url': f"{doubts_url}{hw['id']}",'color': '#b58900'}
+                for hw in db.execute(query + " ORDER BY due_date, id", params)]
+    return cached_json(("homework_events", start, end), "homework", build)
 
 @app.route('/api/users', methods=['POST'])
 @login_required
@@ -522,6 +1891,59 @@ def delete_user(user_id):
     return jsonify({"ok": True})
 
 
+@app.cli.command("sync-exercism")
+@click.option("--force", is_flag=True, help="Refetch every profile, not just expired ones.")
+def sync_exercism_command(force):
+    count = get_exercism_sync().run_once(force=force)
+    print(f"Synced {count} Exercism profile(s).")
+
+@app.cli.command("rebuild-summary")
+def rebuild_summary_command():
+    rebuild_attendance_summary(get_db(readonly=False))
+    print("Attendance summary rebuilt.")
+
+
+@app.cli.command("build-assets")
+def build_assets_command():
+    files = build_assets(app.static_folder, app.config["ASSETS_DIR"], widths=app.config["ASSET_IMAGE_WIDTHS"], log=click.echo)
+    click.echo(f"Built {len(files)} asset(s) into {app.config['ASSETS_DIR']}.")
+
+@app.cli.command("archive")
+@click.argument("years", nargs=-1, type=int)  # academic years by starting year, e.g. 2023 for 2023-24; default: every closed one
+@click.option("--list", "show", is_flag=True, help="List archived academic years and exit.")
+@click.option("--vacuum", is_flag=True, help="VACUUM the live database afterwards to return the freed space.")
+def archive_command(years, show, vacuum):
+    db = get_db(readonly=False)
+    if show:
+        for a in db.execute("SELECT year, path, start, end, rows FROM archives ORDER BY year"):
+            click.echo(f"{a['year']}-{str(a['year'] + 1)[2:]}  {iso_to_dmy(a['start'])} to {iso_to_dmy(a['end'])}  {a['rows']} rows  {a['path']}")
+        return
+    try:
+        moved = archive_closed_years(db, years or None, log=click.echo)
+    except ArchiveError as e:
+        raise click.ClickException(str(e))
+    if moved and vacuum:
+        db.execute("VACUUM")
+    click.echo(f"{len(moved)} academic year(s) archived.")
+
+@app.cli.command("migrate")
+@click.option("--status", is_flag=True, help="Show the schema version without migrating.")
+def migrate_command(status):
+    path = app.config["DATABASE"]
+    if status:
+        current = migrations.current(path)
+        pending = [fn.__name__ for _, fn in migrations.pending(current)]
+        click.echo(f"Schema version {current} of {migrations.latest}; pending: {', '.join(pending) or 'none'}")
+        return
+    applied = migrations.migrate(path, log=click.echo)
+    click.echo(f"Schema version {migrations.latest} ({len(applied)} migrations applied).")
+
+# WSGI entry point (see gunicorn.conf.py). With preload_app the master migrates once before
+# forking workers; an already-current database costs a single PRAGMA user_version read.
+def create_app():
+    migrations.migrate(app.config["DATABASE"])
+    return app
+
 if __name__ == "__main__":
     with app.app_context():
         print("Initializing database...")
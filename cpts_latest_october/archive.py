@@ -0,0 +1,157 @@
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from urllib.parse import quote
+
+from migrations import execute_script
+
+ARCHIVES_SCHEMA = """
+CREATE TABLE IF NOT EXISTS archives (
+    year INTEGER PRIMARY KEY, path TEXT NOT NULL, start TEXT NOT NULL, end TEXT NOT NULL,
+    rows INTEGER NOT NULL, archived_at REAL NOT NULL
+);
+"""
+
+ATTENDANCE_COLUMNS = "id, date, subject_id, student_id, status"
+
+# Same shape and lookup indexes as the hot table, minus the foreign keys: an archive is only read.
+ARCHIVE_SCHEMA = """
+CREATE TABLE {schema}.attendance (
+    id INTEGER PRIMARY KEY, date TEXT NOT NULL, subject_id INTEGER NOT NULL, student_id INTEGER NOT NULL,
+    status TEXT NOT NULL, UNIQUE(date, subject_id, student_id)
+);
+CREATE INDEX {schema}.idx_attendance_subject_date ON attendance(subject_id, date, student_id, status);
+CREATE INDEX {schema}.idx_attendance_student_date ON attendance(student_id, date, subject_id, status);
+"""
+
+
+class ArchiveError(Exception):
+    pass
+
+
+def academic_year_range(year, start_month):
+    y = int(year)
+    return f"{y:04d}-{start_month:02d}-01", f"{y + 1:04d}-{start_month:02d}-01"
+
+
+def schema_name(year):
+    return f"archive_{int(year)}"
+
+
+# Archives overlapping [start, end) (either bound may be None for an open range).
+def archives_for(conn, start=None, end=None):
+    return conn.execute("SELECT year, path, start, end FROM archives WHERE (? IS NULL OR start < ?) AND (? IS NULL OR end > ?) ORDER BY year",
+                        (end, end, start, start)).fetchall()
+
+
+def is_archived(conn, iso_date):
+    return conn.execute("SELECT 1 FROM archives WHERE start <= ? AND end > ?", (iso_date, iso_date)).fetchone() is not None
+
+
+# Attaches archives on a pooled connection and leaves them attached for the next request. Archive
+# files never change once written, so they are opened immutable (no locking or change detection)
+# and memory-mapped. When the attach limit is reached, archives this query does not need are
+# detached first. Needs a URI-enabled connection and no open transaction.
+def attach(conn, archives, mmap_size=256 * 1024 * 1024):
+    attached = {row[1] for row in conn.execute("PRAGMA database_list")}
+    wanted = [schema_name(a["year"]) for a in archives]
+    missing = [(name, a) for name, a in zip(wanted, archives) if name not in attached]
+    limit = conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+    spare = limit - (len(attached) - 2)  # main and temp do not count
+    for name in sorted(n for n in attached if n.startswith("archive_") and n not in wanted):
+        if spare >= len(missing):
+            break
+        conn.execute(f"DETACH DATABASE {name}")
+        spare += 1
+    if spare < len(missing):
+        raise ArchiveError(f"Range spans {len(wanted)} archived years; at most {limit} can be read at once")
+    for name, a in missing:
+        conn.execute(f"ATTACH DATABASE ? AS {name}", (f"file:{quote(a['path'])}?mode=ro&immutable=1",))
+        conn.execute(f"PRAGMA {name}.mmap_size={int(mmap_size)}")
+    return wanted
+
+
+# Runs one query against a single archive file on its own short-lived read-only connection, for
+# work that has to cover every archive and so cannot attach them all (SQLITE_LIMIT_ATTACHED).
+def read_archive(path, sql, params=(), mmap_size=256 * 1024 * 1024):
+    conn = sqlite3.connect(f"file:{quote(path)}?mode=ro&immutable=1", uri=True)
+    try:
+        conn.execute(f"PRAGMA mmap_size={int(mmap_size)}")
+        return conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+
+# Every attendance table holding rows in [start, end): the hot table, then the overlapping
+# archives (attached on the way). Each covers its own dates, so a GROUP BY date can run per table.
+def attendance_tables(conn, start=None, end=None, mmap_size=256 * 1024 * 1024):
+    archives = archives_for(conn, start, end)
+    if not archives:
+        return ["attendance"]
+    return ["main.attendance"] + [f"{name}.attendance" for name in attach(conn, archives, mmap_size)]
+
+
+# FROM-clause source for attendance covering [start, end): the hot table alone when no archive
+# overlaps (the common case costs one registry lookup), otherwise a UNION ALL over the hot table
+# and the attached archives. SQLite pushes the outer WHERE into each arm, so every file is still
+# searched on its own indexes.
+def attendance_source(conn, start=None, end=None, mmap_size=256 * 1024 * 1024):
+    tables = attendance_tables(conn, start, end, mmap_size)
+    if len(tables) == 1:
+        return tables[0]
+    return f"({' UNION ALL '.join(f'SELECT {ATTENDANCE_COLUMNS} FROM {table}' for table in tables)})"
+
+
+# Drops every trigger on `table` for the block and recreates it from its stored SQL afterwards,
+# inside the caller's transaction, so a bulk delete skips the per-row trigger work.
+@contextmanager
+def suspended_triggers(conn, table):
+    triggers = conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = ?", (table,)).fetchall()
+    for name, _ in triggers:
+        conn.execute(f"DROP TRIGGER {name}")
+    yield
+    for _, sql in triggers:
+        conn.execute(sql)
+
+
+# Moves attendance in [start, end) from the hot database into a new per-year file at `path`, in one
+# write transaction: copy in index order, build the indexes and statistics, delete the hot rows
+# with their triggers suspended, register the archive and call on_moved(conn, rows) for any extra
+# bookkeeping. The finished file is made read-only. Returns the number of rows moved.
+def archive_attendance(conn, year, start, end, path, on_moved=None):
+    if conn.execute("SELECT 1 FROM archives WHERE year = ?", (year,)).fetchone():
+        raise ArchiveError(f"Academic year {year} is already archived")
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if os.path.exists(path):
+        os.remove(path)  # left over from an interrupted run; never registered
+    name = schema_name(year)
+    conn.execute(f"ATTACH DATABASE ? AS {name}", (path,))
+    committed = False
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            execute_script(conn, ARCHIVE_SCHEMA.format(schema=name))
+            rows = conn.execute(f"INSERT INTO {name}.attendance SELECT {ATTENDANCE_COLUMNS} FROM main.attendance WHERE date >= ? AND date < ? ORDER BY date, subject_id, student_id",
+                                (start, end)).rowcount
+            conn.execute(f"ANALYZE {name}")
+            with suspended_triggers(conn, "attendance"):
+                moved = conn.execute("DELETE FROM main.attendance WHERE date >= ? AND date < ?", (start, end)).rowcount
+            if moved != rows:
+                raise ArchiveError(f"Copied {rows} rows but deleted {moved}")
+            conn.execute("INSERT INTO archives(year, path, start, end, rows, archived_at) VALUES (?, ?, ?, ?, ?, ?)",
+                         (year, os.path.abspath(path), start, end, rows, time.time()))
+            if on_moved:
+                on_moved(conn, rows)
+            conn.commit()
+            committed = True
+        except Exception:
+            conn.rollback()
+            raise
+    finally:
+        conn.execute(f"DETACH DATABASE {name}")
+        if committed:
+            os.chmod(path, 0o444)
+        elif os.path.exists(path):
+            os.remove(path)
+    return rows
@@ -0,0 +1,136 @@
+import gzip
+import hashlib
+import io
+import json
+import os
+import re
+import shutil
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:
+    Image = None
+
+MANIFEST = "manifest.json"
+COMPRESSIBLE = (".css", ".js", ".svg", ".json", ".txt", ".map")
+IMAGES = (".jpg", ".jpeg", ".png")
+# Modern formats tried in order of preference; each is built only if this Pillow can encode it.
+IMAGE_FORMATS = {"avif": ("AVIF", ".avif", {"quality": 55}), "webp": ("WEBP", ".webp", {"quality": 80, "method": 6})}
+MIME_TYPES = {"avif": "image/avif", "webp": "image/webp"}
+CSS_URL = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+
+
+def image_formats():
+    return [fmt for fmt in IMAGE_FORMATS if Image is not None and features.check(fmt)]
+
+
+def _hashed(rel, data, variant=""):
+    stem, ext = os.path.splitext(rel)
+    return f"{stem}{variant}.{hashlib.sha256(data).hexdigest()[:12]}{ext}"
+
+
+# Writes one fingerprinted file plus .gz (and .br with the brotli module) next to it for text
+# assets; a compressed copy is only kept when it is actually smaller.
+def _emit(out_dir, name, data):
+    path = os.path.join(out_dir, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+    if os.path.splitext(name)[1] in COMPRESSIBLE:
+        variants = [(".gz", gzip.compress(data, 9, mtime=0))]
+        if brotli:
+            variants.append((".br", brotli.compress(data, quality=11)))
+        for suffix, packed in variants:
+            if len(packed) < len(data):
+                with open(path + suffix, "wb") as f:
+                    f.write(packed)
+    return name
+
+
+def _encode(im, fmt, options):
+    buf = io.BytesIO()
+    if fmt == "JPEG" and im.mode != "RGB":
+        im = im.convert("RGB")
+    im.save(buf, fmt, **options)
+    return buf.getvalue()
+
+
+# Original plus, with Pillow, a resized copy per width (never upscaled) in every available modern
+# format and in the original one, for <img srcset> / <picture>.
+def _build_image(out_dir, rel, data, widths):
+    entry = {"src": _emit(out_dir, _hashed(rel, data), data), "srcset": {}}
+    if Image is None:
+        return entry
+    with Image.open(io.BytesIO(data)) as im:
+        im = ImageOps.exif_transpose(im)
+        im.load()
+    width, height = im.size
+    entry.update(width=width, height=height)
+    stem, ext = os.path.splitext(rel)
+    original = ("PNG", ext, {"optimize": True}) if ext == ".png" else ("JPEG", ext, {"quality": 82, "optimize": True, "progressive": True})
+    targets = [(fmt, *IMAGE_FORMATS[fmt]) for fmt in image_formats()] + [("fallback", *original)]
+    for size in sorted({w for w in widths if w < width} | {width}):
+        resized = im if size == width else im.resize((size, round(height * size / width)), Image.LANCZOS)
+        for key, fmt, suffix, options in targets:
+            encoded = _encode(resized, fmt, options)
+            entry["srcset"].setdefault(key, []).append([_emit(out_dir, _hashed(stem + suffix, encoded, f"-{size}w"), encoded), size])
+    return entry
+
+
+# Points url(...) references in a stylesheet at the fingerprinted files, relative to where the
+# stylesheet itself ends up (the directory layout is kept, so that is the same directory).
+def _rewrite_css(rel, text, files):
+    base = os.path.dirname(rel)
+
+    def replace(match):
+        path, suffix = re.match(r"([^?#]*)(.*)", match.group(2).strip()).groups()
+        if re.match(r"^(data:|[a-z]+:|//|/)", path):
+            return match.group(0)
+        target = os.path.normpath(os.path.join(base, path)).replace(os.sep, "/")
+        if target not in files:
+            return match.group(0)
+        return f"url('{os.path.relpath(files[target], base or '.').replace(os.sep, '/')}{suffix}')"
+    return CSS_URL.sub(replace, text)
+
+
+# Builds static_dir into out_dir: content-hashed copies of every file, compressed variants of text
+# assets, responsive image variants, and manifest.json mapping each source path to its build.
+# Stylesheets go last so their url()s can point at the hashed images and fonts. The new build is
+# assembled next to the old one and swapped in at the end.
+def build_assets(static_dir, out_dir, widths=(480, 960, 1440), log=print):
+    static_dir, out_dir = os.path.abspath(static_dir), os.path.abspath(out_dir)
+    staging = out_dir + ".tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    sources = []
+    for root, dirs, names in os.walk(static_dir):
+        dirs[:] = sorted(d for d in dirs if os.path.join(root, d) not in (out_dir, staging) and not d.startswith("."))
+        sources += [os.path.relpath(os.path.join(root, n), static_dir).replace(os.sep, "/") for n in sorted(names) if not n.startswith(".")]
+    files, images = {}, {}
+    for rel in sorted(sources, key=lambda r: r.endswith(".css")):
+        with open(os.path.join(static_dir, rel), "rb") as f:
+            data = f.read()
+        if rel.endswith(".css"):
+            data = _rewrite_css(rel, data.decode("utf-8"), files).encode("utf-8")
+        if os.path.splitext(rel)[1].lower() in IMAGES:
+            images[rel] = _build_image(staging, rel, data, widths)
+            files[rel] = images[rel]["src"]
+        else:
+            files[rel] = _emit(staging, _hashed(rel, data), data)
+        log(f"{rel} -> {files[rel]}")
+    with open(os.path.join(staging, MANIFEST), "w") as f:
+        json.dump({"files": files, "images": images}, f, indent=1, sort_keys=True)
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(staging, out_dir)
+    return files
+
+
+def load_manifest(out_dir):
+    try:
+        with open(os.path.join(out_dir, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
@@ -0,0 +1,87 @@
+# Local stand-in for the Exercism v2 API, and a check of the sync against it: a paged profile is
+# summed, a 404 is cached as "Profile not found", a 429 is retried (with its Retry-After capped),
+# and a profile that keeps failing is cached as an error. Exits non-zero if any check fails.
+#   python benchmarks/exercism_stub.py
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from exercism_sync import EXERCISM_SCHEMA, ExercismClient, sync_profiles
+
+TRACKS = ("Python", "Rust", "Go")
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    hits = Counter()
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status, body=None, headers=()):
+        data = json.dumps(body or {}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    # /api/v2/profiles/<username>/solutions?page=N; the username picks the behaviour.
+    def do_GET(self):
+        url = urlparse(self.path)
+        parts = url.path.strip("/").split("/")
+        if parts[:3] != ["api", "v2", "profiles"] or len(parts) != 5:
+            return self.reply(404)
+        username, page = parts[3], int(parse_qs(url.query).get("page", ["1"])[0])
+        self.hits[username] += 1
+        if username == "missing":
+            return self.reply(404, {"error": {"type": "not_found"}})
+        if username == "throttled" and self.hits[username] == 1:
+            return self.reply(429, headers=[("Retry-After", "3600")])
+        if username == "down":
+            return self.reply(503)
+        results = [{"track": {"title": TRACKS[(page + i) % len(TRACKS)]}} for i in range(100 if page == 1 else 20)]
+        self.reply(200, {"results": results, "meta": {"current_page": page, "total_pages": 2, "total_count": 120}})
+
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "exercism.db")
+        conn = sqlite3.connect(path)
+        conn.executescript(EXERCISM_SCHEMA + "CREATE TABLE students (id INTEGER PRIMARY KEY, exercism_username TEXT);")
+        conn.executemany("INSERT INTO students(exercism_username) VALUES (?)", [(u,) for u in ("paged", "missing", "throttled", "down")])
+        conn.commit()
+        client = ExercismClient(f"http://127.0.0.1:{server.server_port}", timeout=5, retries=2, backoff=0.05, max_wait=0.5)
+        started = time.monotonic()
+        synced = sync_profiles(path, client, ttl=3600, error_ttl=900)
+        elapsed = time.monotonic() - started
+        cache = {r[0]: r[1:] for r in conn.execute("SELECT username, solved, tracks, error FROM exercism_cache")}
+        conn.close()
+    server.shutdown()
+    checks = [
+        ("all four profiles synced", synced == 4),
+        ("paged profile summed over both pages", cache.get("paged", (None,))[:2] == (120, json.dumps(sorted(TRACKS)))),
+        ("404 cached as Profile not found", cache.get("missing", (None,) * 3)[2] == "Profile not found" and StubHandler.hits["missing"] == 1),
+        ("429 retried and then saved", cache.get("throttled", (None,) * 3)[0] == 120 and cache["throttled"][2] is None),
+        ("Retry-After: 3600 capped at max_wait", elapsed < 5),
+        ("5xx retried, then cached as an error", StubHandler.hits["down"] == 3 and cache.get("down", (None,) * 3)[2] is not None),
+    ]
+    for name, ok in checks:
+        print(f"{'ok  ' if ok else 'FAIL'} {name}")
+    print(f"sync took {elapsed:.2f}s")
+    return 0 if all(ok for _, ok in checks) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+# Throughput and memory of /api/import/attendance on a large CSV upload (1M rows by default).
+# Exits non-zero if the import saves or rejects the wrong rows, or runs below --min-rate rows/s.
+# The default floor of 15,000 rows/s leaves plenty of headroom under the ~50,000 rows/s a 300k-row
+# import reaches on a single core with the summary, revision and version upkeep in place.
+#   python benchmarks/import_attendance.py --rows 1000000
+#   python benchmarks/import_attendance.py --check    # quick error-path check, no timing
+import argparse
+import csv
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import app as cpts
+
+
+def make_db(path, students):
+    cpts.app.config.update(DATABASE=path, EXERCISM_SYNC_ENABLED=False)
+    cpts.init_db()
+    with cpts.app.app_context():
+        db = cpts.get_db(readonly=False)
+        db.executemany("INSERT INTO students(roll_no, name) VALUES(?, ?)", [(f"B{i:06d}", f"Bench {i}") for i in range(students)])
+        db.commit()
+        return [r[0] for r in db.execute("SELECT roll_no FROM students")], [r[0] for r in db.execute("SELECT name FROM subjects")]
+
+
+# One register per (day, subject): every student, with a few bad rows mixed in for the error path.
+def write_csv(path, rows, rolls, subjects, bad_every):
+    statuses = ("P", "AI", "AU", "Present", "Absent Informed")
+    day, n = date(2024, 6, 3), 0
+    with open(path, "w", newline="") as f:
+        out = csv.writer(f)
+        out.writerow(["date", "subject", "roll_no", "status"])
+        while n < rows:
+            for subject in subjects:
+                d = day.strftime("%d-%m-%Y")
+                for roll in rolls:
+                    if n >= rows: return
+                    n += 1
+                    out.writerow([d, subject, "UNKNOWN" if bad_every and n % bad_every == 0 else roll, statuses[n % 5]])
+            day += timedelta(days=1)
+
+
+def admin_client():
+    client = cpts.app.test_client()
+    with client.session_transaction() as sess:
+        sess.update(user_id=1, username="admin", role="admin")
+    return client
+
+
+# Bad rows of every kind spread over several small chunks: each must be reported with its line
+# number, and every good row around them must still be saved.
+def check_errors():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "check.db")
+        rolls, subjects = make_db(db_path, 6)
+        cpts.app.config["IMPORT_CHUNK_SIZE"] = 4
+        lines = ["date,subject,roll_no,status"] + [f"0{d}-06-2024,{subjects[0]},{roll},P" for d in (3, 4, 5) for roll in rolls]
+        # line number -> (column, bad value): unknown student, impossible date, bad status, unknown subject.
+        bad = {3: (2, "nobody"), 8: (0, "31-02-2024"), 12: (3, "Late"), 17: (1, "Nope Subject")}
+        for line, (column, value) in bad.items():
+            cells = lines[line - 1].split(",")
+            cells[column] = value
+            lines[line - 1] = ",".join(cells)
+        resp = admin_client().post("/api/import/attendance", data="\n".join(lines).encode(), content_type="text/csv")
+        result = resp.get_json()
+        conn = sqlite3.connect(db_path)
+        stored = conn.execute("SELECT COUNT(*) FROM attendance").fetchone()[0]
+        conn.close()
+    good = len(lines) - 1 - len(bad)
+    checks = [
+        ("partial success is a 200", resp.status_code == 200),
+        ("every bad row reported with its line", sorted(e.get("line") for e in result["errors"]) == sorted(bad)),
+        ("good rows saved across chunks", result["saved"] == good and stored == good),
+        ("counts add up", result["rows"] == len(lines) - 1 and result["failed"] == len(bad)),
+    ]
+    for name, ok in checks:
+        print(f"{'ok  ' if ok else 'FAIL'} {name}")
+    return all(ok for _, ok in checks)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--students", type=int, default=500)
+    parser.add_argument("--chunk-size", type=int, default=cpts.app.config["IMPORT_CHUNK_SIZE"])
+    parser.add_argument("--bad-every", type=int, default=10_000, help="make every Nth row invalid (0 = none)")
+    parser.add_argument("--memory", action="store_true", help="trace Python allocations (slows the import down)")
+    parser.add_argument("--min-rate", type=float, default=15_000, help="fail below this many rows/s (0 = no floor)")
+    parser.add_argument("--check", action="store_true", help="only run the error-path check")
+    args = parser.parse_args()
+    if args.check:
+        return 0 if check_errors() else 1
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path, csv_path = os.path.join(tmp, "bench.db"), os.path.join(tmp, "attendance.csv")
+        rolls, subjects = make_db(db_path, args.students)
+        write_csv(csv_path, args.rows, rolls, subjects, args.bad_every)
+        size = os.path.getsize(csv_path)
+        cpts.app.config["IMPORT_CHUNK_SIZE"] = args.chunk_size
+        client = admin_client()
+        if args.memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        # input_stream, not data=: the test client would otherwise read the whole file into memory first.
+        with open(csv_path, "rb") as f:
+            resp = client.post("/api/import/attendance", input_stream=f, content_length=size, content_type="text/csv")
+        elapsed = time.perf_counter() - started
+        result = resp.get_json()
+    print(f"file        {size / 2**20:.1f} MiB, {result['rows']:,} rows")
+    print(f"saved       {result['saved']:,} rows, {result['failed']:,} rejected (status {resp.status_code})")
+    print(f"elapsed     {elapsed:.2f}s  {result['rows'] / elapsed:,.0f} rows/s")
+    if args.memory:
+        print(f"peak heap   {tracemalloc.get_traced_memory()[1] / 2**20:.1f} MiB (Python allocations during the import)")
+    bad = args.rows // args.bad_every if args.bad_every else 0
+    if result["saved"] != args.rows - bad or result["failed"] != bad:
+        print(f"FAIL expected {args.rows - bad:,} saved and {bad:,} rejected")
+        return 1
+    if args.min_rate and result["rows"] / elapsed < args.min_rate:
+        print(f"FAIL below the floor of {args.min_rate:,.0f} rows/s")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,182 @@
+# Drives the real Flask app through its test client against a seeded database and reports
+# p50/p95 latency, throughput and peak memory per endpoint.
+#   python benchmarks/seed.py --out /tmp/cpts-medium.db --scale medium
+#   python benchmarks/run.py --db /tmp/cpts-medium.db
+#   python benchmarks/run.py --compare benchmarks/results/a.json benchmarks/results/b.json
+import argparse
+import json
+import os
+import random
+import resource
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+import app as cpts
+
+
+class Sampler:
+    def __init__(self, path, seed):
+        db = sqlite3.connect(path)
+        self.rng = random.Random(seed)
+        self.students = db.execute("SELECT id, roll_no, name FROM students").fetchall()
+        self.subjects = [r[0] for r in db.execute("SELECT id FROM subjects")]
+        self.days = [r[0] for r in db.execute("SELECT DISTINCT date FROM attendance ORDER BY date")] or ["2025-01-06"]
+        self.months = sorted({d[:7] for d in self.days})
+        self.homework = [r[0] for r in db.execute("SELECT id FROM homework")] or [1]
+        db.close()
+
+    def dmy(self):
+        y, m, d = self.rng.choice(self.days).split("-")
+        return f"{d}-{m}-{y}"
+
+    def month(self):
+        return self.rng.choice(self.months).split("-")
+
+
+def endpoints(s, class_size):
+    def save_attendance():
+        marks = [{"student_id": st[0], "status": s.rng.choice(cpts.ATTENDANCE_STATUSES)} for st in s.rng.sample(s.students, min(class_size, len(s.students)))]
+        return "POST", "/api/save_attendance", {"date": s.dmy(), "subject_id": s.rng.choice(s.subjects), "marks": marks}
+
+    def month_window():
+        y, m = map(int, s.month())
+        return f"{y:04d}-{m:02d}-01", f"{y + m // 12:04d}-{m % 12 + 1:02d}-01"
+
+    return {
+        "save_attendance": save_attendance,
+        "get_attendance_day": lambda: ("GET", f"/api/get_attendance?subject_id={s.rng.choice(s.subjects)}&filter_type=day&date={s.dmy()}", None),
+        "get_attendance_month": lambda: ("GET", "/api/get_attendance?subject_id={}&filter_type=month&year={}&month={}".format(s.rng.choice(s.subjects), *s.month()), None),
+        "get_attendance_year": lambda: ("GET", f"/api/get_attendance?subject_id={s.rng.choice(s.subjects)}&filter_type=year&year={s.month()[0]}", None),
+        "student_report": lambda: ("GET", f"/api/student_report?query={s.rng.choice(s.students)[2].split()[0]}&dateType=year&year={s.month()[0]}", None),
+        "manage_homework": lambda: ("GET", "/homework/manage", None),
+        "grade_matrix": lambda: ("GET", f"/api/homework/grade_matrix?subject_id={s.rng.choice(s.subjects)}", None),
+        "homework_doubts": lambda: ("GET", f"/homework/doubts/{s.rng.choice(s.homework)}", None),
+        "homework_status_summary": lambda: ("GET", f"/api/homework/status_summary?subject_id={s.rng.choice(s.subjects)}", None),
+        "homework_events": lambda: ("GET", "/api/homework/events?start={}&end={}".format(*month_window()), None),
+        "analytics_attendance": lambda: ("GET", f"/api/analytics/attendance?subject_id={s.rng.choice(s.subjects)}&year={s.month()[0]}", None),
+        "analytics_heatmap": lambda: ("GET", f"/api/analytics/heatmap?year={s.month()[0]}", None),
+    }
+
+
+def call(client, method, url, body):
+    resp = client.open(url, method=method, json=body)
+    resp.get_data()
+    return resp.status_code
+
+
+def bench_endpoint(client, make_request, iterations, warmup, memory_iterations):
+    for _ in range(warmup):
+        call(client, *make_request())
+    latencies, errors = [], 0
+    started = time.perf_counter()
+    for _ in range(iterations):
+        req = make_request()
+        t0 = time.perf_counter()
+        status = call(client, *req)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        errors += status >= 400
+    elapsed = time.perf_counter() - started
+    # Separate pass: tracemalloc slows everything down, so it does not share the timing loop.
+    tracemalloc.start()
+    for _ in range(memory_iterations):
+        call(client, *make_request())
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    latencies.sort()
+    return {
+        "iterations": iterations,
+        "errors": errors,
+        "p50_ms": round(statistics.median(latencies), 3),
+        "p95_ms": round(latencies[max(0, int(len(latencies) * 0.95) - 1)], 3),
+        "mean_ms": round(statistics.fmean(latencies), 3),
+        "throughput_rps": round(iterations / elapsed, 1),
+        "peak_python_kib": round(peak / 1024, 1),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        # Work on a copy so save_attendance runs do not drift the seeded database between commits.
+        path = os.path.join(tmp, "bench.db")
+        shutil.copy(args.db, path)
+        cpts.app.config.update(DATABASE=path, EXERCISM_SYNC_ENABLED=False)
+        with cpts.app.app_context():
+            cpts.init_db()
+        sampler = Sampler(path, args.seed)
+        client = cpts.app.test_client()
+        with client.session_transaction() as sess:
+            sess.update(user_id=1, username="admin", role="admin")
+        selected = endpoints(sampler, args.class_size)
+        names = args.only.split(",") if args.only else list(selected)
+        db = sqlite3.connect(path)
+        counts = {t: db.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0] for t in ("students", "subjects", "attendance", "homework", "homework_submissions", "doubts")}
+        db.close()
+        results = {}
+        for name in names:
+            results[name] = bench_endpoint(client, selected[name], args.iterations, args.warmup, args.memory_iterations)
+            r = results[name]
+            print(f"{name:<22} p50 {r['p50_ms']:>9.2f} ms  p95 {r['p95_ms']:>9.2f} ms  {r['throughput_rps']:>8.1f} req/s  peak {r['peak_python_kib']:>10.1f} KiB  errors {r['errors']}")
+    report = {
+        "commit": git_commit(), "timestamp": datetime.now().isoformat(timespec="seconds"), "db": os.path.abspath(args.db),
+        "counts": counts, "iterations": args.iterations, "max_rss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, "results": results,
+    }
+    os.makedirs(args.results_dir, exist_ok=True)
+    out = os.path.join(args.results_dir, f"{report['timestamp'].replace(':', '')}-{report['commit']}.json")
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved {out}")
+
+
+def compare(old_path, new_path):
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print(f"{'endpoint':<22} {'p50 ' + old['commit']:>14} {'p50 ' + new['commit']:>14} {'change':>8}   {'p95 change':>10}")
+    for name, n in new["results"].items():
+        o = old["results"].get(name)
+        if not o:
+            print(f"{name:<22} {'-':>14} {n['p50_ms']:>14.2f}")
+            continue
+        change = lambda key: f"{(n[key] - o[key]) / o[key] * 100:+.0f}%" if o[key] else "n/a"
+        print(f"{name:<22} {o['p50_ms']:>14.2f} {n['p50_ms']:>14.2f} {change('p50_ms'):>8}   {change('p95_ms'):>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", help="database produced by benchmarks/seed.py")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--memory-iterations", type=int, default=5)
+    parser.add_argument("--class-size", type=int, default=60, help="marks per save_attendance request")
+    parser.add_argument("--only", help="comma-separated endpoint names")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--results-dir", default=os.path.join(BENCH_DIR, "results"))
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    args = parser.parse_args()
+    if args.compare:
+        compare(*args.compare)
+    elif args.db:
+        run(args)
+    else:
+        parser.error("--db or --compare is required")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+# Rows-saved-per-second for /api/save_attendance: the baseline per-row handler on the baseline
+# schema vs save_attendance_sheets on the current schema, each on the connection the app used then.
+#   python benchmarks/save_attendance.py --students 60 --sheets 200
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import app as cpts
+
+
+def add_roster(db, students, subjects):
+    db.executemany("INSERT INTO students(roll_no, name) VALUES(?, ?)", [(f"B{i:06d}", f"Bench {i}") for i in range(students)])
+    db.executemany("INSERT OR IGNORE INTO subjects(name) VALUES(?)", [(f"Bench Subject {i}",) for i in range(subjects)])
+    db.commit()
+
+
+def make_db(path, students, subjects):
+    cpts.app.config.update(DATABASE=path, EXERCISM_SYNC_ENABLED=False)
+    with cpts.app.app_context():
+        cpts.init_db()
+        add_roster(cpts.get_db(readonly=False), students, subjects)
+
+
+# The schema as it was before any of the performance work: migration 1 only, no extra indexes or
+# triggers, and the default rollback journal the old get_db() ran with.
+def make_baseline_db(path, students, subjects):
+    db = sqlite3.connect(path, isolation_level=None)
+    db.execute("BEGIN")
+    cpts.baseline_schema(db)
+    db.execute("COMMIT")
+    db.isolation_level = ""
+    add_roster(db, students, subjects)
+    db.close()
+
+
+def make_sheets(db, count):
+    student_ids = [r[0] for r in db.execute("SELECT id FROM students")]
+    subject_ids = [r[0] for r in db.execute("SELECT id FROM subjects")]
+    statuses = cpts.ATTENDANCE_STATUSES
+    day = date(2024, 6, 1)
+    sheets = []
+    for n in range(count):
+        d = (day + timedelta(days=n // len(subject_ids))).strftime("%d-%m-%Y")
+        marks = [{"student_id": sid, "status": statuses[(sid + n) % 3]} for sid in student_ids]
+        sheets.append({"date": d, "subject_id": subject_ids[n % len(subject_ids)], "marks": marks})
+    return sheets
+
+
+# The baseline /api/save_attendance body: a SELECT per mark and one upsert per row, committed per sheet.
+def baseline_save(db, sheet):
+    date, subject_id = sheet["date"], sheet["subject_id"]
+    db.execute("SELECT id FROM subjects WHERE id=?", (subject_id,)).fetchone()
+    for m in sheet["marks"]:
+        db.execute("SELECT id FROM students WHERE id=?", (m["student_id"],)).fetchone()
+        db.execute("INSERT INTO attendance(date, subject_id, student_id, status) VALUES(?,?,?,?) ON CONFLICT(date, subject_id, student_id) DO UPDATE SET status=excluded.status",
+                   (date, subject_id, m["student_id"], m["status"]))
+    db.commit()
+
+
+# The same sheets resubmitted with one mark in `every` changed, as when a teacher corrects a register.
+def make_edits(sheets, every=20):
+    statuses = cpts.ATTENDANCE_STATUSES
+    return [{**sheet, "marks": [{**m, "status": statuses[(statuses.index(m["status"]) + 1) % 3]} if i % every == 0 else m
+                                for i, m in enumerate(sheet["marks"])]} for sheet in sheets]
+
+
+# Each run starts from an empty register; with `edits`, the sheets are saved first (untimed) and
+# the edits are what gets timed.
+def baseline_run(path, sheets, edits=None):
+    db = sqlite3.connect(path)
+    db.row_factory = sqlite3.Row
+    db.execute("DELETE FROM attendance")
+    db.commit()
+    if edits:
+        for sheet in sheets:
+            baseline_save(db, sheet)
+        sheets = edits
+    started = time.perf_counter()
+    for sheet in sheets:
+        baseline_save(db, sheet)
+    elapsed = time.perf_counter() - started
+    db.close()
+    return elapsed
+
+
+# Runs on the app's own pooled, tuned connection.
+def bulk_run(path, sheets, per_sheet, edits=None):
+    with cpts.app.app_context():
+        db = cpts.get_db(readonly=False)
+        for table in ("attendance", "attendance_summary", "attendance_sheets", "change_log"):
+            db.execute(f"DELETE FROM {table}")
+        db.commit()
+        if edits:
+            cpts.save_attendance_sheets(db, sheets)
+            sheets = edits
+        # Clearing the tables ran the delete triggers; keep that WAL out of the timed run.
+        db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        started = time.perf_counter()
+        if per_sheet:
+            for sheet in sheets:
+                cpts.save_attendance_sheets(db, [sheet])
+        else:
+            cpts.save_attendance_sheets(db, sheets)
+        return time.perf_counter() - started
+
+
+def report(label, rows, timings):
+    elapsed = min(timings)
+    print(f"{label:<40} {rows:>9} rows  {elapsed:8.3f}s  {rows / elapsed:>12,.0f} rows/s")
+    return rows / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--students", type=int, default=60)
+    parser.add_argument("--subjects", type=int, default=12)
+    parser.add_argument("--sheets", type=int, default=120)
+    parser.add_argument("--repeat", type=int, default=3, help="Report the best of this many runs.")
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        path, baseline_path = os.path.join(tmp, "bench.db"), os.path.join(tmp, "baseline.db")
+        make_db(path, args.students, args.subjects)
+        make_baseline_db(baseline_path, args.students, args.subjects)
+        db = sqlite3.connect(path)
+        sheets = make_sheets(db, args.sheets)
+        db.close()
+        edits = make_edits(sheets)
+        rows = sum(len(s["marks"]) for s in sheets)
+        runs = range(args.repeat)
+        print("first save of every sheet")
+        before = report("  baseline per-row handler", rows, [baseline_run(baseline_path, sheets) for _ in runs])
+        per_sheet = report("  bulk, one request per sheet", rows, [bulk_run(path, sheets, True) for _ in runs])
+        multi = report("  bulk, all sheets in one request", rows, [bulk_run(path, sheets, False) for _ in runs])
+        print("resubmitting every sheet with 1 mark in 20 changed")
+        edit_before = report("  baseline per-row handler", rows, [baseline_run(baseline_path, sheets, edits) for _ in runs])
+        edit_after = report("  bulk, one request per sheet", rows, [bulk_run(path, sheets, True, edits) for _ in runs])
+        print(f"speed-up: {per_sheet / before:.1f}x per sheet, {multi / before:.1f}x multi-sheet, {edit_after / edit_before:.1f}x resubmitting")
+
+
+if __name__ == "__main__":
+    main()
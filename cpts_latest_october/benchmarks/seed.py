@@ -0,0 +1,139 @@
+# Generates a synthetic attendance.db at scale for benchmarking.
+#   python benchmarks/seed.py --out /tmp/cpts-large.db --scale large
+#   python benchmarks/seed.py --out /tmp/custom.db --students 800 --subjects 20 --years 2
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import app as cpts
+
+# sessions = class meetings per subject per academic year
+SCALES = {
+    "small": dict(students=60, subjects=12, years=1, sessions=60, homework=200, submissions=60, doubts=300),
+    "medium": dict(students=800, subjects=20, years=2, sessions=40, homework=2000, submissions=200, doubts=4000),
+    "large": dict(students=5000, subjects=50, years=3, sessions=10, homework=10000, submissions=150, doubts=20000),
+}
+
+FIRST_NAMES = ["Aravind", "Aswin", "Bhavana", "Gokul", "Hari", "Meena", "Siva", "Visal", "Priya", "Karthik", "Divya",
+               "Lakshmi", "Ravi", "Anitha", "Suresh", "Deepa", "Vijay", "Kavya", "Arjun", "Nila", "Pranav", "Ishwarya"]
+LAST_NAMES = ["Raman", "Kumar", "Subramani", "Krishnan", "Murugan", "Selvam", "Natarajan", "Pillai", "Iyer", "Rajan"]
+TOPICS = ["recursion", "linked lists", "probability", "matrices", "encryption", "React hooks", "REST APIs", "sorting",
+          "graph search", "hash tables", "Android layouts", "SQL joins", "regular expressions", "unit testing", "CSS grid"]
+QUESTIONS = ["How should we approach {t}?", "Is {t} part of the test?", "Can you explain the {t} example again?",
+             "What is the expected output for the {t} exercise?", "Do we submit {t} on paper or online?"]
+
+
+def academic_days(first_year, years):
+    # Teaching days (Mon-Fri) from June of first_year through April of the final year.
+    start, end = date(first_year, 6, 1), date(first_year + years, 5, 1)
+    day = start
+    while day < end:
+        if day.weekday() < 5 and day.month != 5:
+            yield day
+        day += timedelta(days=1)
+
+
+def drop_triggers(db, table):
+    rows = db.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = ?", (table,)).fetchall()
+    for name, _ in rows:
+        db.execute(f"DROP TRIGGER {name}")
+    return [sql for _, sql in rows]
+
+
+def seed(path, students, subjects, years, sessions, homework, submissions, doubts, seed_value=42):
+    rng = random.Random(seed_value)
+    if os.path.exists(path):
+        os.remove(path)
+    cpts.app.config.update(DATABASE=path, EXERCISM_SYNC_ENABLED=False)
+    with cpts.app.app_context():
+        cpts.init_db()
+    db = sqlite3.connect(path, isolation_level=None)
+    db.execute("PRAGMA synchronous=OFF")
+    db.execute("BEGIN")
+
+    have = db.execute("SELECT COUNT(*) FROM subjects").fetchone()[0]
+    db.executemany("INSERT INTO subjects(name) VALUES(?)", [(f"Elective {i:03d}",) for i in range(max(0, subjects - have))])
+    subject_ids = [r[0] for r in db.execute("SELECT id FROM subjects ORDER BY id LIMIT ?", (subjects,))]
+    have = db.execute("SELECT COUNT(*) FROM students").fetchone()[0]
+    db.executemany("INSERT INTO students(roll_no, name, exercism_username) VALUES(?, ?, ?)", (
+        (f"25{i:06d}", f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {i}", f"student{i}-exercism" if rng.random() < 0.4 else None)
+        for i in range(max(0, students - have))))
+    student_ids = [r[0] for r in db.execute("SELECT id FROM students ORDER BY id")]
+
+    # Attendance: each subject meets on `sessions` random teaching days per year. The rows go in
+    # with the remaining attendance triggers dropped and the summary is rebuilt afterwards.
+    attendance_triggers = drop_triggers(db, "attendance")
+    reliability = {sid: rng.uniform(0.6, 0.98) for sid in student_ids}
+    first_year = datetime.now().year - years
+    days = list(academic_days(first_year, years))
+    per_year = len(days) // years
+    rows = 0
+    for y in range(years):
+        year_days = days[y * per_year:(y + 1) * per_year]
+        for subject_id in subject_ids:
+            for day in sorted(rng.sample(year_days, min(sessions, len(year_days)))):
+                iso = day.isoformat()
+                batch = []
+                for sid in student_ids:
+                    r = rng.random()
+                    status = "Present" if r < reliability[sid] else ("Absent Informed" if r < reliability[sid] + (1 - reliability[sid]) / 2 else "Absent Uninformed")
+                    batch.append((iso, subject_id, sid, status))
+                db.executemany("INSERT INTO attendance(date, subject_id, student_id, status) VALUES(?,?,?,?)", batch)
+                rows += len(batch)
+    for sql in attendance_triggers:
+        db.execute(sql)
+
+    hw_rows = []
+    for _ in range(homework):
+        posted = rng.choice(days)
+        topic = rng.choice(TOPICS)
+        hw_rows.append((rng.choice(subject_ids), f"Practice set: {topic}", f"Work through the {topic} problems from this week's class.",
+                        posted.isoformat(), (posted + timedelta(days=rng.randint(2, 14))).isoformat()))
+    db.executemany("INSERT INTO homework(subject_id, title, description, posted_date, due_date) VALUES(?,?,?,?,?)", hw_rows)
+    hw_ids = [r[0] for r in db.execute("SELECT id FROM homework")]
+    db.executemany("INSERT OR IGNORE INTO homework_submissions(homework_id, student_id, status, grade) VALUES(?,?,?,?)", (
+        (hw, sid, "Graded" if rng.random() < 0.7 else "Completed", rng.randint(4, 10))
+        for hw in hw_ids for sid in rng.sample(student_ids, min(submissions, len(student_ids)))))
+    doubt_rows = []
+    for _ in range(doubts):
+        posted = rng.choice(days)
+        answered = rng.random() < 0.6
+        doubt_rows.append((rng.choice(hw_ids), rng.choice(student_ids), rng.choice(QUESTIONS).format(t=rng.choice(TOPICS)),
+                           f"See the worked example on {rng.choice(TOPICS)}." if answered else None,
+                           f"{posted.isoformat()} {rng.randint(8, 17):02d}:{rng.randint(0, 59):02d}"))
+    db.executemany("INSERT INTO doubts(homework_id, student_id, question, answer, asked_date) VALUES(?,?,?,?,?)", doubt_rows)
+    db.execute("COMMIT")
+    db.close()
+
+    with cpts.app.app_context():
+        cpts.rebuild_attendance_summary(cpts.get_db(readonly=False))
+    db = sqlite3.connect(path)
+    db.execute("ANALYZE")
+    db.close()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    for name in SCALES["small"]:
+        parser.add_argument(f"--{name}", type=int)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    params = dict(SCALES[args.scale])
+    params.update({k: v for k, v in vars(args).items() if k in params and v is not None})
+    estimate = params["students"] * params["subjects"] * params["years"] * params["sessions"]
+    print(f"Seeding {args.out}: {params} (~{estimate:,} attendance rows)")
+    started = time.perf_counter()
+    rows = seed(args.out, seed_value=args.seed, **params)
+    print(f"Done: {rows:,} attendance rows in {time.perf_counter() - started:.1f}s, {os.path.getsize(args.out) / 2**20:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
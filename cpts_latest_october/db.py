@@ -0,0 +1,116 @@
+import os
+import queue
+import sqlite3
+import threading
+from urllib.parse import quote
+
+APP_DIR = os.path.abspath(os.path.dirname(__file__))
+DB_PATH = os.path.join(APP_DIR, "attendance.db")
+
+# Applied to every pooled connection; override through app.config["DB_PRAGMAS"].
+DEFAULT_PRAGMAS = {
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "cache_size": -16000,
+    "mmap_size": 256 * 1024 * 1024,
+    "temp_store": "MEMORY",
+}
+
+
+class PoolTimeout(sqlite3.OperationalError):
+    pass
+
+
+# Per-process pool of long-lived connections. Gunicorn forks workers after import, so a pool
+# notices a pid change and starts over instead of sharing the parent's SQLite handles.
+class ConnectionPool:
+    def __init__(self, path, size=8, readonly=False, pragmas=None, statement_cache=256, timeout=30.0,
+                 factory=sqlite3.Connection, on_connect=None):
+        self.path = path
+        self.size = size
+        self.readonly = readonly
+        self.pragmas = dict(DEFAULT_PRAGMAS if pragmas is None else pragmas)
+        self.statement_cache = statement_cache
+        self.timeout = timeout
+        self.factory = factory
+        self.on_connect = on_connect
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._stats = {"created": 0, "acquired": 0, "reused": 0, "waits": 0, "timeouts": 0, "discarded": 0, "in_use": 0}
+
+    def _bump(self, key, n=1):
+        with self._lock:
+            self._stats[key] += n
+
+    def _connect(self):
+        busy = int(self.pragmas.get("busy_timeout", 5000)) / 1000
+        if self.readonly:
+            conn = sqlite3.connect(f"file:{quote(self.path)}?mode=ro", uri=True, timeout=busy, factory=self.factory,
+                                   check_same_thread=False, cached_statements=self.statement_cache)
+        else:
+            # URI-enabled like the read-only side, so ATTACH can open archives with ?mode=ro&immutable=1.
+            conn = sqlite3.connect(f"file:{quote(self.path)}", uri=True, timeout=busy, factory=self.factory, check_same_thread=False,
+                                   cached_statements=self.statement_cache)
+            conn.execute("PRAGMA journal_mode=WAL")
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name}={value}")
+        conn.row_factory = sqlite3.Row
+        if self.on_connect:
+            self.on_connect(conn)
+        self._bump("created")
+        return conn
+
+    def acquire(self):
+        if self._pid != os.getpid():
+            self._reset()
+        if not self._slots.acquire(blocking=False):
+            self._bump("waits")
+            if not self._slots.acquire(timeout=self.timeout):
+                self._bump("timeouts")
+                raise PoolTimeout(f"no free database connection after {self.timeout}s")
+        try:
+            conn = self._idle.get_nowait()
+            self._bump("reused")
+        except queue.Empty:
+            try:
+                conn = self._connect()
+            except Exception:
+                self._slots.release()
+                raise
+        self._bump("acquired")
+        self._bump("in_use")
+        return conn
+
+    def release(self, conn, discard=False):
+        if self._pid != os.getpid():
+            return
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            discard = True
+        if discard:
+            conn.close()
+            self._bump("discarded")
+        else:
+            self._idle.put(conn)
+        self._bump("in_use", -1)
+        self._slots.release()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update(path=self.path, readonly=self.readonly, size=self.size, idle=self._idle.qsize(), pid=self._pid)
+        return stats
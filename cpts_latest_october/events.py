@@ -0,0 +1,154 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+
+CHANGE_LOG_SCHEMA = """
+CREATE TABLE IF NOT EXISTS change_log (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    channel TEXT NOT NULL, event TEXT NOT NULL, payload TEXT NOT NULL, created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_change_log_channel ON change_log(channel, id);
+CREATE INDEX IF NOT EXISTS idx_change_log_created ON change_log(created_at);
+"""
+
+
+# Appends an event inside the caller's transaction, so it becomes visible exactly when the change
+# it describes commits. Call broker.notify() after the commit to skip the poll delay locally.
+def publish(db, channel, event, payload):
+    db.execute("INSERT INTO change_log(channel, event, payload, created_at) VALUES (?, ?, ?, ?)",
+               (channel, event, json.dumps(payload, separators=(",", ":")), time.time()))
+
+
+def format_event(event_id, event, payload):
+    return f"id: {event_id}\nevent: {event}\ndata: {payload}\n\n"
+
+
+# Per-process fan-out for server-sent events. One daemon thread tails change_log (woken at once by
+# local publishes, otherwise every poll_interval to pick up other gunicorn workers' writes) into a
+# ring buffer and notifies a Condition; every open stream waits on that Condition instead of
+# querying SQLite itself. Resumes older than the buffer are served from change_log directly.
+# Each open stream parks a request thread, so at most max_streams are open at once per process;
+# the rest of the worker's threads stay free for ordinary requests. Browsers past the cap get poll()
+# instead: a short response that ends at once and has EventSource come back after retry_ms.
+class EventBroker:
+    def __init__(self, db_path, poll_interval=1.0, buffer_size=2000, retention=86400, max_streams=8):
+        self.db_path = db_path
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.max_streams = max_streams
+        self.open_streams = 0
+        self.events = deque(maxlen=buffer_size)
+        self.last_id = 0
+        self._cond = threading.Condition()
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA busy_timeout=30000")
+        return conn
+
+    def ensure_started(self):
+        if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+            return
+        with self._cond:
+            if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+                return
+            conn = self._connect()
+            try:
+                self.last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM change_log").fetchone()[0]
+            finally:
+                conn.close()
+            self.events.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="event-broker", daemon=True)
+            self._thread.start()
+
+    def notify(self):
+        self._wake.set()
+
+    # Claims a stream slot; False when this process already has max_streams open. Pair a True
+    # with release_stream() once the response is closed.
+    def acquire_stream(self):
+        with self._cond:
+            if self.open_streams >= self.max_streams:
+                return False
+            self.open_streams += 1
+            return True
+
+    def release_stream(self):
+        with self._cond:
+            self.open_streams -= 1
+
+    def _run(self):
+        conn = self._connect()
+        pruned = 0.0
+        while True:
+            try:
+                rows = conn.execute("SELECT id, channel, event, payload FROM change_log WHERE id > ? ORDER BY id LIMIT 1000", (self.last_id,)).fetchall()
+                if rows:
+                    with self._cond:
+                        self.events.extend(rows)
+                        self.last_id = rows[-1][0]
+                        self._cond.notify_all()
+                    if len(rows) == 1000:
+                        continue
+                if time.time() - pruned > 600:
+                    pruned = time.time()
+                    with conn:
+                        conn.execute("DELETE FROM change_log WHERE created_at < ?", (pruned - self.retention,))
+            except sqlite3.Error:
+                pass
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    # Events on `channels` with after < id <= last_id, plus the id to resume from next time.
+    def _since(self, channels, after):
+        with self._cond:
+            upto = self.last_id
+            if after >= upto:
+                return [], after
+            if self.events and self.events[0][0] <= after + 1:
+                return [e for e in self.events if after < e[0] <= upto and e[1] in channels], upto
+        conn = self._connect()
+        try:
+            marks = ",".join("?" * len(channels))
+            rows = conn.execute(f"SELECT id, channel, event, payload FROM change_log WHERE channel IN ({marks}) AND id > ? AND id <= ? ORDER BY id",
+                                (*channels, after, upto)).fetchall()
+        finally:
+            conn.close()
+        return rows, upto
+
+    # SSE body for a browser without a stream slot: what is new on `channels` since `after`, then an
+    # id-only message so the reconnect resumes from here even when nothing on these channels changed.
+    def poll(self, channels, after=None, retry_ms=10000):
+        self.ensure_started()
+        rows, cursor = self._since(set(channels), self.last_id if after is None else after)
+        body = [f"retry: {retry_ms}\n\n"]
+        body.extend(format_event(event_id, event, payload) for event_id, _, event, payload in rows)
+        body.append(f"id: {cursor}\n\n")
+        return "".join(body)
+
+    # SSE body for one browser. Ends after max_duration so connections get spread over the workers
+    # again; EventSource reconnects with Last-Event-ID and resumes where it stopped.
+    def stream(self, channels, after=None, heartbeat=15.0, max_duration=300.0, retry_ms=3000):
+        self.ensure_started()
+        channels = set(channels)
+        cursor = self.last_id if after is None else after
+        deadline = time.monotonic() + max_duration
+        yield f"retry: {retry_ms}\n\n"
+        while True:
+            rows, cursor = self._since(channels, cursor)
+            for event_id, _, event, payload in rows:
+                yield format_event(event_id, event, payload)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            with self._cond:
+                woke = self._cond.wait_for(lambda: self.last_id > cursor, timeout=min(heartbeat, remaining))
+            if not woke:
+                yield ": keepalive\n\n"
@@ -0,0 +1,203 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+import requests
+
+EXERCISM_SCHEMA = """
+CREATE TABLE IF NOT EXISTS exercism_cache (
+    username TEXT PRIMARY KEY, solved INTEGER, tracks TEXT,
+    fetched_at REAL, expires_at REAL NOT NULL, error TEXT
+);
+CREATE TABLE IF NOT EXISTS sync_leases (name TEXT PRIMARY KEY, holder TEXT, expires_at REAL NOT NULL);
+"""
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class ProfileNotFound(Exception):
+    pass
+
+
+# Reads a user's published solutions from the Exercism v2 API. base_url is pluggable so a local
+# stub server can stand in for exercism.org (see benchmarks/exercism_stub.py). A Retry-After from
+# upstream is honoured only up to max_wait seconds, so one throttled profile cannot stall a sync.
+class ExercismClient:
+    def __init__(self, base_url="https://exercism.org", timeout=10.0, retries=3, backoff=0.5, max_pages=10, max_wait=60.0):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_pages = max_pages
+        self.max_wait = max_wait
+        self._local = threading.local()
+
+    @property
+    def session(self):
+        if not hasattr(self._local, "session"):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def _get(self, url, params):
+        for attempt in range(self.retries + 1):
+            try:
+                resp = self.session.get(url, params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.retries:
+                    raise
+                time.sleep(self.backoff * 2 ** attempt)
+                continue
+            if resp.status_code == 404:
+                raise ProfileNotFound(url)
+            if resp.status_code in RETRY_STATUSES and attempt < self.retries:
+                retry_after = resp.headers.get("Retry-After", "")
+                wait = float(retry_after) if retry_after.isdigit() else self.backoff * 2 ** attempt
+                time.sleep(min(wait, self.max_wait))
+                continue
+            resp.raise_for_status()
+            return resp.json()
+
+    def fetch_profile(self, username):
+        url = f"{self.base_url}/api/v2/profiles/{quote(username)}/solutions"
+        tracks, solved, page = set(), 0, 1
+        while page <= self.max_pages:
+            data = self._get(url, {"page": page, "per_page": 100})
+            results = data.get("results") or []
+            meta = data.get("meta") or {}
+            tracks.update(r["track"]["title"] for r in results if isinstance(r.get("track"), dict) and r["track"].get("title"))
+            solved = meta.get("total_count", solved + len(results))
+            if page >= meta.get("total_pages", 1) or not results:
+                break
+            page += 1
+        return {"solved": solved, "tracks": sorted(tracks)}
+
+
+def connect(db_path):
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.execute("PRAGMA busy_timeout=30000")
+    return conn
+
+
+def stale_usernames(conn, now, force=False):
+    rows = conn.execute(
+        "SELECT DISTINCT s.exercism_username FROM students s LEFT JOIN exercism_cache c ON c.username = s.exercism_username "
+        "WHERE s.exercism_username IS NOT NULL AND s.exercism_username != '' AND (? OR c.username IS NULL OR c.expires_at < ?)",
+        (force, now),
+    )
+    return [r[0] for r in rows]
+
+
+# Fetches every stale profile concurrently (bounded by `concurrency`); only the calling thread
+# touches SQLite. Failures are cached for error_ttl so a bad handle is not retried every cycle.
+def sync_profiles(db_path, client, ttl, error_ttl, concurrency=8, force=False):
+    conn = connect(db_path)
+    try:
+        usernames = stale_usernames(conn, time.time(), force)
+        if not usernames:
+            return 0
+
+        def fetch(username):
+            try:
+                return username, client.fetch_profile(username), None
+            except ProfileNotFound:
+                return username, None, "Profile not found"
+            except (requests.RequestException, ValueError) as exc:
+                return username, None, str(exc)[:200]
+
+        with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(usernames)))) as pool:
+            results = list(pool.map(fetch, usernames))
+        now = time.time()
+        with conn:
+            for username, profile, error in results:
+                if profile:
+                    conn.execute(
+                        "INSERT INTO exercism_cache(username, solved, tracks, fetched_at, expires_at, error) VALUES (?, ?, ?, ?, ?, NULL) "
+                        "ON CONFLICT(username) DO UPDATE SET solved = excluded.solved, tracks = excluded.tracks, "
+                        "fetched_at = excluded.fetched_at, expires_at = excluded.expires_at, error = NULL",
+                        (username, profile["solved"], json.dumps(profile["tracks"]), now, now + ttl),
+                    )
+                else:
+                    # Keep the last good numbers; just record the error and back off.
+                    conn.execute(
+                        "INSERT INTO exercism_cache(username, expires_at, error) VALUES (?, ?, ?) "
+                        "ON CONFLICT(username) DO UPDATE SET expires_at = excluded.expires_at, error = excluded.error",
+                        (username, now + error_ttl, error),
+                    )
+        return len(results)
+    finally:
+        conn.close()
+
+
+def acquire_lease(conn, name, holder, duration):
+    now = time.time()
+    with conn:
+        conn.execute("INSERT OR IGNORE INTO sync_leases(name, holder, expires_at) VALUES (?, NULL, 0)", (name,))
+        cur = conn.execute(
+            "UPDATE sync_leases SET holder = ?, expires_at = ? WHERE name = ? AND (expires_at < ? OR holder = ?)",
+            (holder, now + duration, name, now, holder),
+        )
+    return cur.rowcount == 1
+
+
+def release_lease(conn, name, holder):
+    with conn:
+        conn.execute("UPDATE sync_leases SET expires_at = 0 WHERE name = ? AND holder = ?", (name, holder))
+
+
+# One daemon thread per worker process. A lease row in SQLite makes sure only one gunicorn worker
+# syncs at a time; whoever holds it releases it when done, so any worker can pick up a nudge().
+class ExercismSync:
+    def __init__(self, db_path, client, ttl=6 * 3600, error_ttl=900, concurrency=8, interval=300):
+        self.db_path = db_path
+        self.client = client
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self.concurrency = concurrency
+        self.interval = interval
+        self.last_run = None
+        self.last_error = None
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._holder = f"{socket.gethostname()}:{os.getpid()}"
+
+    def ensure_started(self):
+        if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+            return
+        self._pid = os.getpid()
+        self._holder = f"{socket.gethostname()}:{self._pid}"
+        self._thread = threading.Thread(target=self._run, name="exercism-sync", daemon=True)
+        self._thread.start()
+
+    def nudge(self):
+        self._wake.set()
+
+    def run_once(self, force=False):
+        conn = connect(self.db_path)
+        try:
+            # The lease expiry only matters if this process dies mid-sync.
+            if not acquire_lease(conn, "exercism", self._holder, 900):
+                return 0
+            try:
+                count = sync_profiles(self.db_path, self.client, self.ttl, self.error_ttl, self.concurrency, force)
+            finally:
+                release_lease(conn, "exercism", self._holder)
+        finally:
+            conn.close()
+        self.last_run = time.time()
+        return count
+
+    def _run(self):
+        while True:
+            try:
+                self.run_once()
+                self.last_error = None
+            except Exception as exc:
+                self.last_error = str(exc)
+            self._wake.wait(self.interval)
+            self._wake.clear()
@@ -0,0 +1,18 @@
+# gunicorn -c gunicorn.conf.py
+# preload_app runs create_app() (and so the schema migrations) once in the master before
+# the workers fork; the workers then open their own pooled connections lazily.
+import os
+
+# The background Exercism sync only runs in served workers; CPTS_EXERCISM_SYNC=0 still turns it off.
+os.environ.setdefault("CPTS_EXERCISM_SYNC", "1")
+
+wsgi_app = "app:create_app()"
+preload_app = True
+bind = os.environ.get("CPTS_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", 4))
+# Threaded workers: an open /api/events stream parks one thread, not a whole worker process.
+# At most CPTS_EVENTS_MAX_STREAMS (default threads // 2) of them are streams and further tabs poll
+# instead; see README "Live updates".
+worker_class = "gthread"
+threads = int(os.environ.get("CPTS_THREADS", 16))
+timeout = 60
@@ -0,0 +1,124 @@
+import csv
+import io
+import os
+from datetime import date, datetime
+
+try:
+    import openpyxl
+except ImportError:  # Excel uploads are optional; CSV always works.
+    openpyxl = None
+
+XLSX_TYPES = ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",)
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+def _header(cells):
+    header = [str(c or "").strip().lower().replace(" ", "_") for c in cells]
+    if not any(header):
+        raise ImportFormatError("The first row must be a header row")
+    return header
+
+
+def iter_csv(stream):
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    reader = csv.reader(text)
+    try:
+        header = _header(next(reader))
+    except StopIteration:
+        raise ImportFormatError("The file is empty") from None
+    except UnicodeDecodeError:
+        raise ImportFormatError("CSV files must be UTF-8 encoded") from None
+    try:
+        for row in reader:
+            if any(cell.strip() for cell in row):
+                yield reader.line_num, dict(zip(header, (cell.strip() for cell in row)))
+    except UnicodeDecodeError:
+        raise ImportFormatError(f"Line {reader.line_num + 1} is not valid UTF-8") from None
+    except csv.Error as exc:
+        raise ImportFormatError(f"Line {reader.line_num}: {exc}") from None
+
+
+def _cell(value):
+    if value is None: return ""
+    if isinstance(value, (datetime, date)): return value.strftime("%Y-%m-%d")
+    if isinstance(value, float) and value.is_integer(): return str(int(value))
+    return str(value).strip()
+
+
+# read_only mode streams the sheet XML instead of building the whole workbook in memory.
+def iter_xlsx(stream):
+    if openpyxl is None:
+        raise ImportFormatError("Excel import needs the openpyxl package; upload a CSV file instead")
+    try:
+        workbook = openpyxl.load_workbook(stream, read_only=True, data_only=True)
+    except Exception:
+        raise ImportFormatError("Could not read the Excel file") from None
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        try:
+            header = _header(next(rows))
+        except StopIteration:
+            raise ImportFormatError("The file is empty") from None
+        for line, row in enumerate(rows, start=2):
+            cells = [_cell(v) for v in row]
+            if any(cells):
+                yield line, dict(zip(header, cells))
+    finally:
+        workbook.close()
+
+
+# Yields (line_number, {header: value}) one row at a time.
+def read_rows(stream, filename="", content_type=""):
+    if os.path.splitext(filename or "")[1].lower() == ".xlsx" or content_type in XLSX_TYPES:
+        return iter_xlsx(stream)
+    return iter_csv(stream)
+
+
+def _write_chunk(db, write, rows, on_commit=None):
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        if callable(write):
+            write(db, rows)
+        else:
+            db.executemany(write, rows)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    if on_commit:
+        on_commit()
+    return len(rows)
+
+
+# parse(row) returns the parameter tuple for `write` or raises ValueError with a message for the
+# error report. `write` is an SQL statement run with executemany, or a write(db, rows) function
+# called inside the chunk's transaction; on_commit() runs after each chunk commits. Rows are
+# written chunk_size at a time, each chunk in its own transaction, so memory stays flat and other
+# writers get the lock between chunks. At most max_errors errors are listed; `failed` counts all
+# of them. A malformed file stops the import but keeps the rows before it, and is reported as an
+# error without a line number.
+def import_rows(db, rows, parse, write, chunk_size=5000, max_errors=1000, on_commit=None):
+    errors, chunk = [], []
+    total = saved = failed = 0
+    try:
+        for line, row in rows:
+            total += 1
+            try:
+                chunk.append(parse(row))
+            except ValueError as exc:
+                failed += 1
+                if len(errors) < max_errors:
+                    errors.append({"line": line, "error": str(exc)})
+                continue
+            if len(chunk) >= chunk_size:
+                saved += _write_chunk(db, write, chunk, on_commit)
+                chunk = []
+    except ImportFormatError as exc:
+        failed += 1
+        errors.append({"error": str(exc)})
+    if chunk:
+        saved += _write_chunk(db, write, chunk, on_commit)
+    return {"rows": total, "saved": saved, "failed": failed, "errors": errors}
@@ -0,0 +1,196 @@
+import bisect
+import logging
+import re
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250, 1000)
+
+logger = logging.getLogger("cpts.sql")
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+# Collapses literals and whitespace so one statement shape maps to one metric series.
+@lru_cache(maxsize=2048)
+def fingerprint(sql):
+    sql = re.sub(r"'(?:[^']|'')*'", "?", sql)
+    sql = re.sub(r"\b\d+\b", "?", sql)
+    return " ".join(sql.split())[:200]
+
+
+# Prometheus-style registry. Every gunicorn worker keeps its own, so a scrape reflects
+# whichever worker answered it.
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = {}
+        self.request_queries = {}
+        self.statements = {}
+        self.fetch_seconds = {}
+
+    def observe_request(self, route, method, status, seconds, queries):
+        with self._lock:
+            self.requests.setdefault((route, method, str(status)), Histogram(REQUEST_BUCKETS)).observe(seconds)
+            self.request_queries.setdefault((route, method), Histogram(QUERY_COUNT_BUCKETS)).observe(queries)
+
+    def observe_statement(self, statement, seconds):
+        with self._lock:
+            self.statements.setdefault(statement, Histogram(STATEMENT_BUCKETS)).observe(seconds)
+
+    def add_fetch(self, statement, seconds):
+        with self._lock:
+            self.fetch_seconds[statement] = self.fetch_seconds.get(statement, 0.0) + seconds
+
+    # gauges: {name: (help, [(labels_dict, value), ...])}
+    def render(self, gauges=None):
+        gauges = gauges or {}
+        out = []
+
+        def histogram(name, help_text, series, label_names):
+            out.append(f"# HELP {name} {help_text}")
+            out.append(f"# TYPE {name} histogram")
+            for key, h in sorted(series.items()):
+                labels = ",".join(f'{n}="{_label(v)}"' for n, v in zip(label_names, key if isinstance(key, tuple) else (key,)))
+                cumulative = 0
+                for bound, count in zip(list(h.buckets) + ["+Inf"], h.counts):
+                    cumulative += count
+                    out.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                out.append(f"{name}_sum{{{labels}}} {h.sum:.6f}")
+                out.append(f"{name}_count{{{labels}}} {h.count}")
+
+        with self._lock:
+            histogram("cpts_http_request_duration_seconds", "Request latency by route.", self.requests, ("route", "method", "status"))
+            histogram("cpts_http_request_sql_queries", "SQL statements executed per request.", self.request_queries, ("route", "method"))
+            histogram("cpts_sql_statement_duration_seconds", "Statement execute time by normalized SQL.", self.statements, ("statement",))
+            out.append("# HELP cpts_sql_fetch_seconds_total Time spent fetching rows by normalized SQL.")
+            out.append("# TYPE cpts_sql_fetch_seconds_total counter")
+            for statement, seconds in sorted(self.fetch_seconds.items()):
+                out.append(f'cpts_sql_fetch_seconds_total{{statement="{_label(statement)}"}} {seconds:.6f}')
+        for name, (help_text, samples) in gauges.items():
+            out.append(f"# HELP {name} {help_text}")
+            out.append(f"# TYPE {name} gauge")
+            for labels, value in samples:
+                labels = ",".join(f'{k}="{_label(v)}"' for k, v in labels.items())
+                out.append(f"{name}{{{labels}}} {value}")
+        return "\n".join(out) + "\n"
+
+
+# Per-request query counting plus the optional slow-query log. `enabled`, `slow_ms` and
+# `explain` can be flipped at runtime; when disabled a traced call costs one attribute check.
+class Tracer:
+    def __init__(self, metrics, enabled=True, slow_ms=None, explain=False):
+        self.metrics = metrics
+        self.enabled = enabled
+        self.slow_ms = slow_ms
+        self.explain = explain
+        self._local = threading.local()
+
+    def begin_request(self):
+        self._local.stats = [0, 0.0]
+
+    def end_request(self):
+        stats = getattr(self._local, "stats", None) or [0, 0.0]
+        self._local.stats = None
+        return stats
+
+    def record(self, conn, sql, params, seconds):
+        statement = fingerprint(sql)
+        self.metrics.observe_statement(statement, seconds)
+        stats = getattr(self._local, "stats", None)
+        if stats is not None:
+            stats[0] += 1
+            stats[1] += seconds
+        if self.slow_ms is not None and seconds * 1000 >= self.slow_ms:
+            plan = ""
+            if self.explain and sql.lstrip()[:6].upper() in ("SELECT", "WITH"):
+                try:
+                    rows = sqlite3.Connection.execute(conn, "EXPLAIN QUERY PLAN " + sql, params).fetchall()
+                    plan = " | plan: " + "; ".join(r[3] for r in rows)
+                except sqlite3.Error:
+                    pass
+            logger.warning("slow query %.1f ms: %s%s", seconds * 1000, statement, plan)
+
+    def record_fetch(self, sql, seconds):
+        self.metrics.add_fetch(fingerprint(sql), seconds)
+        stats = getattr(self._local, "stats", None)
+        if stats is not None:
+            stats[1] += seconds
+
+
+class TracedCursor(sqlite3.Cursor):
+    _sql = None
+
+    def execute(self, sql, params=()):
+        tracer = self.connection.tracer
+        if tracer is None or not tracer.enabled:
+            return super().execute(sql, params)
+        self._sql = sql
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, params)
+        finally:
+            tracer.record(self.connection, sql, params, time.perf_counter() - started)
+
+    def executemany(self, sql, seq):
+        tracer = self.connection.tracer
+        if tracer is None or not tracer.enabled:
+            return super().executemany(sql, seq)
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq)
+        finally:
+            tracer.record(self.connection, sql, (), time.perf_counter() - started)
+
+    def _timed(self, fetch, *args):
+        tracer = self.connection.tracer
+        if tracer is None or not tracer.enabled or self._sql is None:
+            return fetch(*args)
+        started = time.perf_counter()
+        try:
+            return fetch(*args)
+        finally:
+            tracer.record_fetch(self._sql, time.perf_counter() - started)
+
+    def fetchone(self):
+        return self._timed(super().fetchone)
+
+    def fetchmany(self, size=None):
+        return self._timed(super().fetchmany, self.arraysize if size is None else size)
+
+    def fetchall(self):
+        return self._timed(super().fetchall)
+
+
+# sqlite3's Connection.execute builds its cursor in C without going through Cursor.execute,
+# so the shortcut methods are routed through a TracedCursor explicitly.
+class TracedConnection(sqlite3.Connection):
+    tracer = None
+
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq):
+        return self.cursor().executemany(sql, seq)
@@ -0,0 +1,141 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import quote
+
+JOBS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS report_jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT NOT NULL UNIQUE, report TEXT NOT NULL,
+    kind TEXT NOT NULL, format TEXT NOT NULL, params TEXT NOT NULL, data_version TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'queued' CHECK(state IN ('queued', 'running', 'done', 'failed')),
+    progress REAL NOT NULL DEFAULT 0, message TEXT, artifact TEXT, filename TEXT, error TEXT,
+    created_by INTEGER, created_at REAL NOT NULL, updated_at REAL NOT NULL, finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_report_jobs_report ON report_jobs(report, id);
+"""
+
+JOB_FIELDS = ("id", "kind", "format", "state", "progress", "message", "filename", "error", "created_at", "finished_at")
+
+
+def _digest(*parts):
+    return hashlib.sha1(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+
+# Runs in a pool process with its own connection (URI-enabled, so tasks can attach archives).
+# Progress writes are throttled so a report over thousands of students does not turn into
+# thousands of write transactions.
+def run_job(db_path, job_id, task, fmt, params, artifact_dir):
+    conn = sqlite3.connect(f"file:{quote(db_path)}", uri=True, timeout=30)
+    conn.row_factory = sqlite3.Row
+    last = [0.0]
+
+    def update(sql, args):
+        with conn:
+            conn.execute(sql, (*args, time.time(), job_id))
+
+    def progress(fraction, message=None):
+        if time.monotonic() - last[0] >= 0.5:
+            last[0] = time.monotonic()
+            update("UPDATE report_jobs SET progress = ?, message = COALESCE(?, message), updated_at = ? WHERE id = ?", (round(fraction, 4), message))
+
+    tmp = None
+    try:
+        update("UPDATE report_jobs SET state = 'running', progress = 0, updated_at = ? WHERE id = ?", ())
+        job = conn.execute("SELECT key, report FROM report_jobs WHERE id = ?", (job_id,)).fetchone()
+        os.makedirs(artifact_dir, exist_ok=True)
+        path = os.path.join(artifact_dir, f"{job['key']}.{fmt}")
+        tmp = f"{path}.{os.getpid()}.tmp"
+        filename = task(conn, params, fmt, tmp, progress)
+        os.replace(tmp, path)
+        update("UPDATE report_jobs SET state = 'done', progress = 1, message = NULL, artifact = ?, filename = ?, finished_at = ?, updated_at = ? WHERE id = ?", (path, filename, time.time()))
+        # Older builds of the same report were made from data that has since changed.
+        with conn:
+            for old in conn.execute("SELECT id, artifact FROM report_jobs WHERE report = ? AND id < ?", (job["report"], job_id)).fetchall():
+                if old["artifact"] and os.path.exists(old["artifact"]):
+                    os.remove(old["artifact"])
+                conn.execute("DELETE FROM report_jobs WHERE id = ?", (old["id"],))
+    except Exception as exc:
+        if tmp and os.path.exists(tmp):
+            os.remove(tmp)
+        update("UPDATE report_jobs SET state = 'failed', error = ?, updated_at = ? WHERE id = ?", (str(exc)[:500],))
+    finally:
+        conn.close()
+
+
+# SQLite-backed report queue. A job is keyed by (kind, format, params, data_version): asking for
+# the same report again returns the queued, running or finished job instead of building it twice,
+# and a data change produces a new key. Work runs in a spawn-context process pool so rendering a
+# large report never holds a gunicorn worker's request thread or GIL. Jobs whose process died are
+# picked up again once they have not reported progress for stale_after seconds.
+class JobQueue:
+    def __init__(self, db_path, artifact_dir, max_workers=2, stale_after=600):
+        self.db_path = db_path
+        self.artifact_dir = artifact_dir
+        self.max_workers = max_workers
+        self.stale_after = stale_after
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pid = None
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None or self._pid != os.getpid():
+                self._pool = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+                self._pid = os.getpid()
+            return self._pool
+
+    def submit(self, db, task, kind, fmt, params, data_version, user_id=None):
+        report = _digest(kind, fmt, params)
+        key = _digest(report, data_version)
+        now = time.time()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            job = db.execute("SELECT id, state, artifact, updated_at FROM report_jobs WHERE key = ?", (key,)).fetchone()
+            if job is None:
+                job_id = db.execute(
+                    "INSERT INTO report_jobs(key, report, kind, format, params, data_version, created_by, created_at, updated_at) VALUES (?,?,?,?,?,?,?,?,?)",
+                    (key, report, kind, fmt, json.dumps(params, sort_keys=True), data_version, user_id, now, now)).lastrowid
+                dispatch = True
+            else:
+                job_id = job["id"]
+                dispatch = (job["state"] == "failed"
+                            or (job["state"] == "done" and not (job["artifact"] and os.path.exists(job["artifact"])))
+                            or (job["state"] in ("queued", "running") and job["updated_at"] < now - self.stale_after))
+                if dispatch:
+                    db.execute("UPDATE report_jobs SET state = 'queued', progress = 0, message = NULL, error = NULL, updated_at = ? WHERE id = ?", (now, job_id))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        if dispatch:
+            self._dispatch(job_id, task, fmt, params)
+        return self.get(db, job_id)
+
+    def _dispatch(self, job_id, task, fmt, params):
+        try:
+            future = self._executor().submit(run_job, self.db_path, job_id, task, fmt, params, self.artifact_dir)
+        except Exception as exc:
+            self._fail(job_id, exc)
+            return
+        future.add_done_callback(lambda f: f.exception() and self._fail(job_id, f.exception()))
+
+    # Only reached when the pool itself broke (e.g. the child was killed); run_job records its own errors.
+    def _fail(self, job_id, exc):
+        with self._lock:
+            self._pool = None
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                conn.execute("UPDATE report_jobs SET state = 'failed', error = ?, updated_at = ? WHERE id = ? AND state != 'done'", (str(exc)[:500] or type(exc).__name__, time.time(), job_id))
+        finally:
+            conn.close()
+
+    def get(self, db, job_id):
+        row = db.execute(f"SELECT {', '.join(JOB_FIELDS)}, artifact, created_by FROM report_jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
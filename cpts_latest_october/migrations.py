@@ -0,0 +1,87 @@
+import sqlite3
+
+
+class MigrationError(Exception):
+    pass
+
+
+# Splits a multi-statement script so it can run inside an explicit transaction
+# (executescript would COMMIT first). complete_statement knows about trigger bodies.
+def execute_script(db, script):
+    statement = ""
+    for part in script.split(";"):
+        statement += part + ";"
+        if sqlite3.complete_statement(statement):
+            if statement.strip(" \t\n;"):
+                db.execute(statement)
+            statement = ""
+    if statement.strip(" \t\n;"):
+        raise MigrationError(f"Incomplete SQL statement: {statement.strip()[:80]}")
+
+
+# Ordered schema migrations keyed on PRAGMA user_version. Each step runs in its own
+# BEGIN IMMEDIATE transaction together with the user_version bump, so a failed step leaves
+# the database at the previous version and concurrent starters serialize on the write lock.
+class Migrations:
+    def __init__(self):
+        self.steps = []
+
+    def step(self, version):
+        def register(fn):
+            if self.steps and version <= self.steps[-1][0]:
+                raise ValueError(f"Migration {version} ({fn.__name__}) is out of order")
+            self.steps.append((version, fn))
+            return fn
+        return register
+
+    @property
+    def latest(self):
+        return self.steps[-1][0] if self.steps else 0
+
+    def pending(self, version):
+        return [(v, fn) for v, fn in self.steps if v > version]
+
+    def current(self, path):
+        conn = sqlite3.connect(path)
+        try:
+            return conn.execute("PRAGMA user_version").fetchone()[0]
+        finally:
+            conn.close()
+
+    # Returns the list of (version, name) applied. An up-to-date database costs one pragma read.
+    def migrate(self, path, log=None):
+        conn = sqlite3.connect(path, isolation_level=None, timeout=30)
+        conn.row_factory = sqlite3.Row
+        applied = []
+        try:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version > self.latest:
+                raise MigrationError(f"Database is at schema version {version}, newer than this code ({self.latest})")
+            if version == self.latest:
+                return applied
+            conn.execute("PRAGMA journal_mode=WAL")
+            for target, fn in self.steps:
+                if target <= version:
+                    continue
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    # Another process may have migrated while we waited for the lock.
+                    version = conn.execute("PRAGMA user_version").fetchone()[0]
+                    if target <= version:
+                        conn.execute("ROLLBACK")
+                        continue
+                    fn(conn)
+                    conn.execute(f"PRAGMA user_version = {int(target)}")
+                    conn.execute("COMMIT")
+                except BaseException:
+                    if conn.in_transaction:
+                        conn.execute("ROLLBACK")
+                    raise
+                version = target
+                applied.append((target, fn.__name__))
+                if log:
+                    log(f"Applied migration {target}: {fn.__name__}")
+            conn.execute("PRAGMA optimize")
+            return applied
+        finally:
+            conn.close()
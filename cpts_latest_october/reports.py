@@ -0,0 +1,114 @@
+import csv
+from datetime import datetime
+
+from archive import attendance_source
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+try:
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Table, TableStyle
+except ImportError:
+    SimpleDocTemplate = None
+
+STATUS_CODES = {"Present": "P", "Absent Informed": "AI", "Absent Uninformed": "AU"}
+
+
+def available_formats():
+    return ["csv"] + (["xlsx"] if openpyxl else []) + (["pdf"] if SimpleDocTemplate else [])
+
+
+# rows is an iterator so CSV and XLSX (write-only mode) never hold the whole report. A PDF is laid
+# out as one table, so it keeps only pdf_columns (e.g. the totals, not one column per class day).
+def write_table(fmt, path, title, header, rows, pdf_columns=None):
+    if fmt == "csv":
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            out = csv.writer(f)
+            out.writerow(header)
+            out.writerows(rows)
+    elif fmt == "xlsx":
+        workbook = openpyxl.Workbook(write_only=True)
+        sheet = workbook.create_sheet(title[:31])
+        sheet.append(header)
+        for row in rows:
+            sheet.append(row)
+        workbook.save(path)
+    elif fmt == "pdf":
+        pick = (lambda r: [r[i] for i in pdf_columns]) if pdf_columns else list
+        data = [pick(header)] + [["" if v is None else str(v) for v in pick(row)] for row in rows]
+        table = Table(data, repeatRows=1)
+        table.setStyle(TableStyle([
+            ("FONTSIZE", (0, 0), (-1, -1), 8),
+            ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
+            ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
+        ]))
+        SimpleDocTemplate(path, pagesize=landscape(A4), title=title).build([Paragraph(title, getSampleStyleSheet()["Heading2"]), table])
+    else:
+        raise ValueError(f"Unsupported format {fmt}")
+
+
+def _dmy(iso):
+    return datetime.strptime(iso, "%Y-%m-%d").strftime("%d-%m-%Y")
+
+
+def _slug(text):
+    return "".join(c if c.isalnum() else "-" for c in text).strip("-").lower()
+
+
+# Full-class register for one subject: a P/AI/AU column per class day plus totals. Archived years
+# in the range are attached and read alongside the hot table.
+# params: subject_id, start, end (ISO, end exclusive).
+def attendance_report(conn, params, fmt, path, progress):
+    subject_id, start, end = params["subject_id"], params["start"], params["end"]
+    subject = conn.execute("SELECT name FROM subjects WHERE id = ?", (subject_id,)).fetchone()
+    if not subject:
+        raise ValueError("Subject not found")
+    source = attendance_source(conn, start, end)
+    dates = [r[0] for r in conn.execute(f"SELECT DISTINCT date FROM {source} WHERE subject_id = ? AND date >= ? AND date < ? ORDER BY date", (subject_id, start, end))]
+    students = conn.execute("SELECT id, roll_no, name FROM students ORDER BY roll_no").fetchall()
+    header = ["Roll No", "Name"] + [_dmy(d) for d in dates] + ["Present", "Absent Informed", "Absent Uninformed", "Attendance %"]
+
+    def rows():
+        for i, student in enumerate(students):
+            marks = dict(conn.execute(f"SELECT date, status FROM {source} WHERE student_id = ? AND date >= ? AND date < ? AND subject_id = ?",
+                                      (student["id"], start, end, subject_id)).fetchall())
+            counts = [sum(1 for s in marks.values() if s == status) for status in STATUS_CODES]
+            total = sum(counts)
+            progress((i + 1) / len(students), f"{i + 1} of {len(students)} students")
+            yield [student["roll_no"], student["name"]] + [STATUS_CODES.get(marks.get(d), "") for d in dates] + counts + [round(100.0 * counts[0] / total, 1) if total else None]
+
+    n = len(dates)
+    title = f"Attendance - {subject['name']}" + (f" ({_dmy(dates[0])} to {_dmy(dates[-1])})" if dates else "")
+    write_table(fmt, path, title, header, rows(), pdf_columns=[0, 1, n + 2, n + 3, n + 4, n + 5])
+    return f"attendance-{_slug(subject['name'])}.{fmt}"
+
+
+# Grade sheet for one subject: a column per homework (oldest first) and the student's average.
+# params: subject_id.
+def grade_sheet(conn, params, fmt, path, progress):
+    subject_id = params["subject_id"]
+    subject = conn.execute("SELECT name FROM subjects WHERE id = ?", (subject_id,)).fetchone()
+    if not subject:
+        raise ValueError("Subject not found")
+    homework = conn.execute("SELECT id, title FROM homework WHERE subject_id = ? ORDER BY posted_date, id", (subject_id,)).fetchall()
+    grades = {}
+    for r in conn.execute("SELECT hs.student_id, hs.homework_id, hs.grade FROM homework_submissions hs JOIN homework h ON h.id = hs.homework_id "
+                          "WHERE h.subject_id = ? AND hs.grade IS NOT NULL", (subject_id,)):
+        grades[(r[0], r[1])] = r[2]
+    students = conn.execute("SELECT id, roll_no, name FROM students ORDER BY roll_no").fetchall()
+    header = ["Roll No", "Name"] + [h["title"] for h in homework] + ["Graded", "Average"]
+
+    def rows():
+        for i, student in enumerate(students):
+            marks = [grades.get((student["id"], h["id"])) for h in homework]
+            given = [m for m in marks if m is not None]
+            progress((i + 1) / len(students), f"{i + 1} of {len(students)} students")
+            yield [student["roll_no"], student["name"]] + marks + [len(given), round(sum(given) / len(given), 2) if given else None]
+
+    n = len(homework)
+    write_table(fmt, path, f"Grades - {subject['name']}", header, rows(), pdf_columns=[0, 1, n + 2, n + 3])
+    return f"grades-{_slug(subject['name'])}.{fmt}"
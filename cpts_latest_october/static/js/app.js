@@ -7,7 +7,21 @@ const postJSON = async (url, body) => {
         return await res.json();
     } catch (e) { console.error("API Error:", e); return null; }
 };
+const escapeHTML = (v) => String(v ?? "").replace(/[&<>"']/g, c => ({ "&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;", "'": "&#39;" }[c]));
 const ymdToDmy = (ymd) => { if (!ymd) return ""; const [y, m, d] = ymd.split("-"); return `${d}-${m}-${y}`; };
+// EventSource that survives being turned away: a browser gives up for good on a non-200 answer (the
+// server sends 503 once a worker's streams are full), so reopen after a while from the last event seen.
+const openEvents = (url, lastEventId, handlers) => {
+    let source = null, closed = false;
+    const connect = () => {
+        if (closed) return;
+        source = new EventSource(`${url}&last_event_id=${lastEventId}`);
+        Object.entries(handlers).forEach(([event, handle]) => source.addEventListener(event, (e) => { if (e.lastEventId) lastEventId = e.lastEventId; handle(e); }));
+        source.onerror = () => { if (source.readyState === EventSource.CLOSED) setTimeout(connect, 20000 + Math.random() * 20000); };
+    };
+    connect();
+    return { close: () => { closed = true; source.close(); } };
+};
 async function loadSubjects(selectEl) {
     if (!selectEl) return;
     const subs = await getJSON("/api/subjects");
@@ -50,6 +64,54 @@ document.addEventListener("DOMContentLoaded", () => {
         }
         loadSubjects(subjSel);
         wireValidation(bodyEl, saveBtn);
+        // The open sheet: its server revision and the last known server status of every row. Saves send
+        // only the rows that differ from it; changes made elsewhere are pulled with ?since=<revision>.
+        let sheet = null, liveSource = null;
+        const checkedStatus = (row) => row.querySelector(`input[name="st_${row.dataset.studentId}"]:checked`)?.value;
+        const isDirty = (row) => checkedStatus(row) !== sheet.baseline[row.dataset.studentId];
+        const reconcile = async () => {
+            const current = sheet;
+            const data = await getJSON(`/api/get_attendance_for_store?subject_id=${current.subject_id}&date=${current.date}&since=${current.revision}`);
+            if (!data || !data.ok || current !== sheet) return 0;
+            let applied = 0, pending = false;
+            data.records.forEach(r => {
+                const row = bodyEl.querySelector(`tr[data-student-id="${r.student_id}"]`);
+                if (!row) return;
+                // A row edited here and changed elsewhere stays as the user left it; saving it reports the conflict.
+                if (isDirty(row) && checkedStatus(row) !== r.status) { pending = true; return; }
+                current.baseline[r.student_id] = r.status;
+                const radio = row.querySelector(`input[value="${r.status}"]`);
+                if (radio && !radio.checked) { radio.checked = true; applied++; }
+            });
+            if (!pending) current.revision = data.revision;
+            if (applied) wireValidation(bodyEl, saveBtn);
+            return applied;
+        };
+        const followSheet = (lastEventId) => {
+            if (liveSource) liveSource.close();
+            if (!window.EventSource) return;
+            liveSource = openEvents(`/api/events?channel=attendance:${sheet.subject_id}`, lastEventId, {
+                "attendance.saved": async (e) => {
+                    if (JSON.parse(e.data).date !== sheet.date) return;
+                    const applied = await reconcile();
+                    if (applied && statusMsg) statusMsg.innerHTML = `🔄 ${applied} mark(s) for ${sheet.date} were updated by someone else.`;
+                },
+            });
+        };
+        // A retry after a network error reuses the Idempotency-Key, so a request that did reach the
+        // server is answered from the first attempt instead of being applied twice.
+        const syncSheet = async (body) => {
+            const key = window.crypto && crypto.randomUUID ? crypto.randomUUID() : `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+            for (let attempt = 0; ; attempt++) {
+                try {
+                    const res = await fetch("/api/attendance/sync", { method: "POST", headers: { "Content-Type": "application/json", "Idempotency-Key": key }, body: JSON.stringify(body) });
+                    return { status: res.status, data: await res.json() };
+                } catch (e) {
+                    if (attempt >= 3) { console.error("API Error:", e); return { status: 0, data: { error: "Network error" } }; }
+                    await new Promise(resolve => setTimeout(resolve, 1000 * 2 ** attempt));
+                }
+            }
+        };
         const checkExistingAttendance = async () => {
             const subject_id = subjSel.value;
             const selectedDate = dateInp.value;
@@ -61,22 +123,37 @@ document.addEventListener("DOMContentLoaded", () => {
             const date = ymdToDmy(selectedDate);
             const data = await getJSON(`/api/get_attendance_for_store?subject_id=${subject_id}&date=${date}`);
             if (data && data.ok && data.records) {
+                sheet = { subject_id, date, revision: data.revision, baseline: {} };
                 let attendanceTaken = data.records.some(r => r.status !== 'none');
-                data.records.forEach(r => { if (r.status !== 'none') { const radio = document.querySelector(`tr[data-student-id="${r.student_id}"] input[value="${r.status}"]`); if (radio) radio.checked = true; } });
+                data.records.forEach(r => { if (r.status !== 'none') { sheet.baseline[r.student_id] = r.status; const radio = document.querySelector(`tr[data-student-id="${r.student_id}"] input[value="${r.status}"]`); if (radio) radio.checked = true; } });
                 if (statusMsg) statusMsg.innerHTML = attendanceTaken ? `✅ Attendance for ${date} already exists. You can edit it.` : `ℹ️ No attendance found for ${date}. Please mark it below.`;
                 wireValidation(bodyEl, saveBtn);
+                followSheet(data.last_event_id);
             }
         };
         subjSel.addEventListener("change", checkExistingAttendance);
         dateInp.addEventListener("change", checkExistingAttendance);
         document.getElementById("attendanceForm").addEventListener("submit", async (e) => {
             e.preventDefault();
-            const date = ymdToDmy(dateInp.value);
-            const subject_id = parseInt(subjSel.value, 10);
-            const marks = [...bodyEl.querySelectorAll("tr")].map(r => ({ student_id: parseInt(r.dataset.studentId, 10), status: r.querySelector(`input[name="st_${r.dataset.studentId}"]:checked`).value }));
-            const resp = await postJSON("/api/save_attendance", { date, subject_id, marks });
-            if (resp && resp.ok) { alert("✅ Attendance stored successfully!"); if(statusMsg) statusMsg.innerHTML = `✅ Attendance for ${date} already exists. You can edit it.`; }
-            else { alert("❌ Failed to store: " + (resp ? resp.error : "Unknown error")); }
+            if (!sheet) return;
+            const current = sheet;
+            const changes = [...bodyEl.querySelectorAll("tr")].filter(isDirty).map(r => ({ student_id: parseInt(r.dataset.studentId, 10), status: checkedStatus(r) }));
+            if (!changes.length) { if (statusMsg) statusMsg.innerHTML = `✅ No changes to save for ${current.date}.`; return; }
+            const { status, data } = await syncSheet({ date: current.date, subject_id: parseInt(current.subject_id, 10), base_revision: current.revision, changes });
+            if (status === 200 && data.ok) {
+                changes.forEach(c => { current.baseline[c.student_id] = c.status; });
+                await reconcile();
+                alert("✅ Attendance stored successfully!"); if (statusMsg) statusMsg.innerHTML = `✅ Attendance for ${current.date} already exists. You can edit it.`;
+            } else if (status === 409) {
+                data.conflicts.forEach(c => {
+                    current.baseline[c.student_id] = c.status;
+                    const radio = bodyEl.querySelector(`tr[data-student-id="${c.student_id}"] input[value="${c.status}"]`);
+                    if (radio) radio.checked = true;
+                });
+                await reconcile();
+                alert(`⚠️ ${data.error}. Their marks are shown now; check them and save again.`);
+            }
+            else { alert("❌ Failed to store: " + (data.error || "Unknown error")); }
         });
     }
 
@@ -143,6 +220,7 @@ document.addEventListener("DOMContentLoaded", () => {
                 html += `<table class="table"><thead><tr><th>S.No</th><th>Roll No</th><th>Name</th><th>Status</th></tr></thead><tbody>`;
                 rows.forEach((r, i) => { html += `<tr><td>${i+1}</td><td>${r.roll_no}</td><td>${r.name}</td><td>${r.status}</td></tr>`; });
             } else {
+                html += `<p><a class="btn" href="/api/get_attendance?${params.toString()}&format=csv">Download CSV</a></p>`;
                 html += `<table class="table"><thead><tr><th>S.No</th><th>Date</th><th>Roll No</th><th>Name</th><th>Status</th></tr></thead><tbody>`;
                 rows.forEach((r, i) => { html += `<tr><td>${i+1}</td><td>${r.date}</td><td>${r.roll_no}</td><td>${r.name}</td><td>${r.status}</td></tr>`; });
             }
@@ -170,7 +248,7 @@ document.addEventListener("DOMContentLoaded", () => {
             if (this.value === "year") yearInputContainer.style.display = "inline-block";
         });
 
-        document.getElementById("searchBtn").addEventListener("click", async () => {
+        const runSearch = async (studentId) => {
             const info = document.getElementById("studentInfo");
             const rep = document.getElementById("studentReport");
             const query = document.getElementById("searchQuery").value.trim();
@@ -184,6 +262,7 @@ document.addEventListener("DOMContentLoaded", () => {
                 month: document.getElementById('monthInput').value,
                 date: document.getElementById('dateInput').value,
             });
+            if (studentId) params.append('student_id', studentId);
 
             info.innerHTML = "Searching…";
             rep.innerHTML = "";
@@ -194,6 +273,8 @@ document.addEventListener("DOMContentLoaded", () => {
             
             const s = data.student;
             info.innerHTML = `<div><strong>${s.name}</strong> — Roll No: <strong>${s.roll_no}</strong></div>`;
+            const others = (data.matches || []).filter(m => m.id !== s.id);
+            if (others.length) info.innerHTML += `<p>Other matches: ${others.map(m => `<a href="#" class="student-match" data-student-id="${m.id}">${m.name} (${m.roll_no})</a>`).join(", ")}</p>`;
             const rows = data.rows;
             if (rows.length === 0) { rep.innerHTML = "<p>No attendance records found for this filter.</p>"; return; }
             
@@ -201,6 +282,12 @@ document.addEventListener("DOMContentLoaded", () => {
             rows.forEach((r, i) => { html += `<tr><td>${i+1}</td><td>${r.date}</td><td>${r.subject}</td><td>${r.status}</td></tr>`; });
             html += `</tbody></table>`;
             rep.innerHTML = html;
+        };
+        document.getElementById("searchBtn").addEventListener("click", () => runSearch());
+        document.getElementById("studentInfo").addEventListener("click", (e) => {
+            if (!e.target.classList.contains("student-match")) return;
+            e.preventDefault();
+            runSearch(e.target.dataset.studentId);
         });
     }
     
@@ -228,8 +315,72 @@ document.addEventListener("DOMContentLoaded", () => {
         const dueDateField = document.getElementById('hwDueDate');
         const subjectFilter = document.getElementById('subjectFilter');
         const dateFilter = document.getElementById('dateFilter');
+        const loadMoreBtn = document.getElementById('loadMoreBtn');
+        const gradeStatus = document.getElementById('gradeSaveStatus');
+        const initialFilters = new URLSearchParams(window.location.search);
         loadSubjects(subjectSel);
-        loadSubjects(subjectFilter);
+        dateFilter.value = initialFilters.get('date') || '';
+
+        // Gradebook grid: loaded page by page from the columnar grade matrix endpoint.
+        let nextCursor = null;
+        const renderMatrix = (data, append) => {
+            const hw = data.homework, st = data.students, n = st.id.length;
+            const thead = homeworkTable.tHead, tbody = homeworkTable.tBodies[0];
+            thead.innerHTML = `<tr><th>Assignment Details</th>${st.name.map(name => `<th>${escapeHTML(name)}</th>`).join('')}</tr>`;
+            const rows = hw.id.map((id, i) => `
+                <tr data-homework-id="${id}">
+                    <td data-subject-id="${hw.subject_id[i]}" data-description="${escapeHTML(hw.description[i])}" data-due-date="${hw.due_date[i]}">
+                        <strong class="hw-title">${escapeHTML(hw.title[i])}</strong>
+                        <div style="font-size: 0.9em; color: var(--muted);">
+                            <span>Due: ${hw.due_date[i]}</span> | <span>Posted: ${hw.posted_date[i]}</span>
+                        </div>
+                        <div style="margin-top: 10px;">
+                            <a href="/homework/doubts/${id}">View Doubts</a>
+                            <button class="btn btn-edit" style="font-size:0.8em; padding: 4px 8px;">Edit</button>
+                            <button class="btn btn-delete" style="font-size:0.8em; padding: 4px 8px;">Delete</button>
+                        </div>
+                    </td>
+                    ${st.id.map((sid, j) => `<td><input type="number" class="grade-input" placeholder="N/A" data-homework-id="${id}" data-student-id="${sid}" value="${data.grades[i * n + j] ?? ''}"></td>`).join('')}
+                </tr>`).join('');
+            if (!append) tbody.innerHTML = rows || `<tr><td colspan="${n + 1}" style="text-align: center;">No assignments match filter.</td></tr>`;
+            else tbody.insertAdjacentHTML('beforeend', rows);
+            nextCursor = data.next;
+            loadMoreBtn.style.display = nextCursor ? 'inline-block' : 'none';
+        };
+        const loadMatrix = async (append) => {
+            const params = new URLSearchParams();
+            if (subjectFilter.value) params.append('subject_id', subjectFilter.value);
+            if (dateFilter.value) params.append('date', dateFilter.value);
+            if (append && nextCursor) params.append('after', nextCursor);
+            const data = await getJSON(`/api/homework/grade_matrix?${params.toString()}`);
+            if (data && data.ok) renderMatrix(data, append);
+        };
+        loadSubjects(subjectFilter).then(() => { subjectFilter.value = initialFilters.get('subject_id') || ''; loadMatrix(false); });
+        loadMoreBtn.addEventListener('click', () => loadMatrix(true));
+
+        // Grade edits are queued and saved together through the batch endpoint.
+        const pendingGrades = new Map();
+        let flushTimer = null;
+        const takePending = () => { const grades = [...pendingGrades.values()]; pendingGrades.clear(); return grades; };
+        const flushGrades = async () => {
+            clearTimeout(flushTimer);
+            const grades = takePending();
+            if (!grades.length) return;
+            gradeStatus.textContent = `Saving ${grades.length} grade(s)…`;
+            const resp = await postJSON('/api/homework/grades', { grades });
+            const failed = new Set(((resp && resp.errors) || []).map(e => e.row));
+            grades.forEach((g, i) => {
+                const input = homeworkTable.querySelector(`.grade-input[data-homework-id="${g.homework_id}"][data-student-id="${g.student_id}"]`);
+                if (!input) return;
+                input.style.backgroundColor = resp && !failed.has(i) ? '#d4edda' : '#f8d7da';
+                setTimeout(() => { input.style.backgroundColor = ''; }, 1000);
+            });
+            gradeStatus.textContent = resp && resp.ok ? 'All grades saved.' : `Some grades were not saved: ${resp ? resp.error : 'network error'}`;
+        };
+        window.addEventListener('beforeunload', () => {
+            const grades = takePending();
+            if (grades.length) navigator.sendBeacon('/api/homework/grades', new Blob([JSON.stringify({ grades })], { type: 'application/json' }));
+        });
         const resetForm = () => { form.reset(); homeworkIdField.value = ''; formTitle.textContent = 'Post New Homework'; submitBtn.textContent = 'Save Homework'; cancelBtn.style.display = 'none'; };
         form.addEventListener('submit', async (e) => {
             e.preventDefault();
@@ -243,11 +394,13 @@ document.addEventListener("DOMContentLoaded", () => {
             if (resp && resp.ok) { alert(`Homework ${homeworkId ? 'updated' : 'posted'}!`); location.reload(); }
             else { alert('Error: Operation failed.'); }
         });
-        document.getElementById('filterBtn').addEventListener('click', () => {
+        document.getElementById('filterBtn').addEventListener('click', async () => {
             const params = new URLSearchParams();
             if (subjectFilter.value) params.append('subject_id', subjectFilter.value);
             if (dateFilter.value) params.append('date', dateFilter.value);
-            window.location.href = `/homework/manage?${params.toString()}`;
+            history.replaceState(null, '', `/homework/manage?${params.toString()}`);
+            await flushGrades();
+            loadMatrix(false);
         });
         homeworkTable.addEventListener('click', (e) => {
             const target = e.target;
@@ -279,12 +432,11 @@ document.addEventListener("DOMContentLoaded", () => {
         homeworkTable.addEventListener('change', async (e) => {
             if (e.target.classList.contains('grade-input')) {
                 const input = e.target;
-                await postJSON('/api/homework/grade', {
-                    homework_id: input.dataset.homeworkId, student_id: input.dataset.studentId,
-                    grade: input.value === '' ? null : parseInt(input.value, 10)
-                });
-                input.style.backgroundColor = '#d4edda';
-                setTimeout(() => { input.style.backgroundColor = ''; }, 1000);
+                const homework_id = parseInt(input.dataset.homeworkId, 10), student_id = parseInt(input.dataset.studentId, 10);
+                pendingGrades.set(`${homework_id}:${student_id}`, { homework_id, student_id, grade: input.value === '' ? null : parseInt(input.value, 10) });
+                gradeStatus.textContent = `${pendingGrades.size} unsaved change(s)…`;
+                clearTimeout(flushTimer);
+                flushTimer = setTimeout(flushGrades, 800);
             }
         });
         cancelBtn.addEventListener('click', resetForm);
@@ -306,9 +458,59 @@ document.addEventListener("DOMContentLoaded", () => {
         });
     }
     
+    // --- HOMEWORK: Staff Status Overview ---
+    if (page === 'homework_overview') {
+        const subjectFilter = document.getElementById('subjectFilter');
+        const statusTable = document.getElementById('statusTable');
+        const loadMoreBtn = document.getElementById('loadMoreBtn');
+        const rosterPanel = document.getElementById('rosterPanel');
+        const rosterFilter = document.getElementById('rosterFilter');
+        const rosterBody = document.querySelector('#rosterTable tbody');
+        let nextCursor = null, selected = null;
+        const loadSummary = async (append) => {
+            const params = new URLSearchParams();
+            if (subjectFilter.value) params.append('subject_id', subjectFilter.value);
+            if (append && nextCursor) params.append('after', nextCursor);
+            const data = await getJSON(`/api/homework/status_summary?${params.toString()}`);
+            if (!data || !data.ok) return;
+            const rows = data.homework.map(h => `
+                <tr data-homework-id="${h.id}" data-title="${escapeHTML(h.title)}" style="cursor: pointer;">
+                    <td><strong>${escapeHTML(h.title)}</strong></td><td>${escapeHTML(h.subject)}</td><td>${h.due_date}</td>
+                    <td>${h.completed}</td><td>${h.graded}</td><td>${h.pending}</td>
+                    <td>${h.unanswered ? `<a href="/homework/doubts/${h.id}">${h.unanswered} of ${h.doubts}</a>` : h.doubts ? `0 of ${h.doubts}` : '–'}</td>
+                </tr>`).join('');
+            const tbody = statusTable.tBodies[0];
+            if (!append) tbody.innerHTML = rows || '<tr><td colspan="7" style="text-align: center;">No homework has been assigned yet.</td></tr>';
+            else tbody.insertAdjacentHTML('beforeend', rows);
+            nextCursor = data.next;
+            loadMoreBtn.style.display = nextCursor ? 'inline-block' : 'none';
+        };
+        const loadRoster = async () => {
+            const params = new URLSearchParams();
+            if (rosterFilter.value) params.append('status', rosterFilter.value);
+            const data = await getJSON(`/api/homework/${selected.id}/status?${params.toString()}`);
+            if (!data || !data.ok) return;
+            rosterBody.innerHTML = data.students.map(s => `<tr><td>${escapeHTML(s.roll_no)}</td><td>${escapeHTML(s.name)}</td><td>${s.status}</td><td>${s.grade ?? ''}</td></tr>`).join('')
+                || '<tr><td colspan="4" style="text-align: center;">No students with this status.</td></tr>';
+        };
+        statusTable.addEventListener('click', (e) => {
+            const row = e.target.closest('tr[data-homework-id]');
+            if (!row || e.target.closest('a')) return;
+            selected = { id: row.dataset.homeworkId, title: row.dataset.title };
+            document.getElementById('rosterTitle').textContent = `Students: ${selected.title}`;
+            rosterPanel.style.display = 'block';
+            loadRoster().then(() => rosterPanel.scrollIntoView({ behavior: 'smooth' }));
+        });
+        rosterFilter.addEventListener('change', () => { if (selected) loadRoster(); });
+        subjectFilter.addEventListener('change', () => loadSummary(false));
+        loadMoreBtn.addEventListener('click', () => loadSummary(true));
+        loadSubjects(subjectFilter).then(() => loadSummary(false));
+    }
+
     // --- HOMEWORK: Doubts Page ---
     if (page === "homework_doubts") {
         const doubtsList = document.getElementById('doubts-list');
+        const live = !!window.EventSource;
         document.getElementById('doubt-form').addEventListener('submit', async (e) => {
             e.preventDefault();
             const form = e.target;
@@ -318,7 +520,8 @@ document.addEventListener("DOMContentLoaded", () => {
                 homework_id: form.dataset.homeworkId, student_id: student_id,
                 question: form.querySelector('textarea').value
             });
-            if (result && result.ok) location.reload(); else alert("Failed to post doubt.");
+            if (result && result.ok) { if (live) form.querySelector('textarea').value = ''; else location.reload(); }
+            else alert("Failed to post doubt.");
         });
         doubtsList.addEventListener('click', (e) => {
             const target = e.target;
@@ -364,9 +567,75 @@ document.addEventListener("DOMContentLoaded", () => {
                     doubt_id: form.dataset.doubtId,
                     answer: form.querySelector('textarea').value
                 });
-                if (result && result.ok) location.reload(); else alert("Failed to post answer.");
+                if (result && result.ok) { if (!live) location.reload(); } else alert("Failed to post answer.");
             }
         });
+
+        // Live updates: other people's questions and answers appear without a reload.
+        const homeworkId = document.getElementById('doubt-form').dataset.homeworkId;
+        const answerHTML = (d) => d.answer
+            ? `<div class="answer"><p><strong>A:</strong> ${escapeHTML(d.answer)}</p></div>`
+            : `<form class="answer-form" data-doubt-id="${d.id}">
+                <textarea rows="3" placeholder="Teacher: type your answer here..." required></textarea>
+                <button type="submit" class="btn" style="margin-top: 10px;">Post Answer</button>
+            </form>`;
+        const doubtCardHTML = (d) => `<div class="doubt-card" data-doubt-id="${d.id}">
+            <p class="question">Q: ${escapeHTML(d.question)}</p>
+            <form class="edit-doubt-form" style="display: none;" data-doubt-id="${d.id}">
+                <textarea rows="3">${escapeHTML(d.question)}</textarea>
+                <div style="margin-top: 10px; display: flex; gap: 10px;">
+                    <button type="submit" class="btn">Save Changes</button>
+                    <button type="button" class="btn btn-secondary btn-cancel-edit">Cancel</button>
+                </div>
+            </form>
+            <div class="doubt-meta">
+                <span>Asked by ${escapeHTML(d.student_name)} on ${escapeHTML(d.asked_date)}</span>
+                <div class="doubt-actions">
+                    <button class="btn-link btn-edit-doubt">Edit</button>
+                    <button class="btn-link btn-delete-doubt">Delete</button>
+                </div>
+            </div>
+            ${answerHTML(d)}
+        </div>`;
+        const cardFor = (id) => doubtsList.querySelector(`.doubt-card[data-doubt-id="${id}"]`);
+        const countsEl = document.getElementById('doubt-counts');
+        const showCounts = (c) => { if (c) countsEl.textContent = `${c.total} question(s), ${c.unanswered} unanswered`; };
+
+        // Older questions, one keyset page at a time (newest first).
+        const loadMoreBtn = document.getElementById('loadMoreDoubtsBtn');
+        loadMoreBtn.addEventListener('click', async () => {
+            const data = await getJSON(`/api/homework/${homeworkId}/doubts?after=${encodeURIComponent(loadMoreBtn.dataset.next)}`);
+            if (!data || !data.ok) return;
+            doubtsList.insertAdjacentHTML('beforeend', data.doubts.filter(d => !cardFor(d.id)).map(doubtCardHTML).join(''));
+            showCounts(data.counts);
+            loadMoreBtn.dataset.next = data.next || '';
+            loadMoreBtn.style.display = data.next ? 'inline-block' : 'none';
+        });
+        if (live) {
+            openEvents(`/api/events?channel=homework:${homeworkId}`, doubtsList.dataset.lastEventId, {
+                'doubt.asked': (e) => {
+                    const d = JSON.parse(e.data);
+                    showCounts(d.counts);
+                    if (cardFor(d.id)) return;
+                    doubtsList.querySelector('.no-doubts')?.remove();
+                    doubtsList.insertAdjacentHTML('afterbegin', doubtCardHTML(d));
+                },
+                'doubt.answered': (e) => {
+                    const d = JSON.parse(e.data), card = cardFor(d.id);
+                    showCounts(d.counts);
+                    if (!card) return;
+                    card.querySelector('.answer, .answer-form')?.remove();
+                    card.insertAdjacentHTML('beforeend', answerHTML(d));
+                },
+                'doubt.updated': (e) => {
+                    const d = JSON.parse(e.data), card = cardFor(d.id);
+                    if (!card || card.querySelector('.edit-doubt-form').style.display === 'block') return;
+                    card.querySelector('.question').textContent = `Q: ${d.question}`;
+                    card.querySelector('.edit-doubt-form textarea').value = d.question;
+                },
+                'doubt.deleted': (e) => { const d = JSON.parse(e.data); showCounts(d.counts); cardFor(d.id)?.remove(); },
+            });
+        }
     }
     
     // --- HOMEWORK: Calendar Page ---
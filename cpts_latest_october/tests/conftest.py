@@ -0,0 +1,27 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import app as cpts
+
+
+# A freshly migrated database per test (seeded subjects and students), and a client logged in as staff.
+@pytest.fixture
+def client(tmp_path):
+    path = str(tmp_path / "attendance.db")
+    cpts.app.config.update(TESTING=True, DATABASE=path, ARCHIVE_DIR=str(tmp_path / "archives"), EXERCISM_SYNC_ENABLED=False)
+    cpts.migrations.migrate(path)
+    client = cpts.app.test_client()
+    with client.session_transaction() as s:
+        s.update(user_id=1, username="teacher", role="teacher")
+    yield client
+    for key in [k for k in cpts._pools if k[0] == path]:
+        cpts._pools.pop(key).close()
+
+
+@pytest.fixture
+def db(client):
+    with cpts.app.app_context():
+        yield cpts.get_db(readonly=False)
@@ -0,0 +1,50 @@
+import pytest
+
+
+@pytest.fixture
+def students(db):
+    return [r[0] for r in db.execute("SELECT id FROM students ORDER BY id LIMIT 3")]
+
+
+def sync(client, base, changes, key=None):
+    headers = {"Idempotency-Key": key} if key else {}
+    res = client.post("/api/attendance/sync", json={"date": "03-06-2024", "subject_id": 1, "base_revision": base, "changes": changes}, headers=headers)
+    return res.status_code, res.get_json()
+
+
+def marks(db):
+    return {r[0]: (r[1], r[2]) for r in db.execute("SELECT student_id, status, revision FROM attendance WHERE date = '2024-06-03' AND subject_id = 1")}
+
+
+def test_replayed_key_returns_the_first_response(client, db, students):
+    a, b, _ = students
+    status, first = sync(client, 0, [{"student_id": a, "status": "Present"}, {"student_id": b, "status": "Absent Informed"}], key="k1")
+    assert (status, first["saved"], first["revision"]) == (200, 2, 1)
+    # A retry, even one whose body changed in the meantime, is answered from the stored response.
+    status, again = sync(client, 0, [{"student_id": a, "status": "Absent Uninformed"}], key="k1")
+    assert status == 200
+    assert again == first | {"replayed": True}
+    assert marks(db) == {a: ("Present", 1), b: ("Absent Informed", 1)}
+    assert db.execute("SELECT revision FROM attendance_sheets WHERE date = '2024-06-03' AND subject_id = 1").fetchone()[0] == 1
+
+
+def test_conflicting_change_is_a_409_and_saves_nothing(client, db, students):
+    a, b, c = students
+    assert sync(client, 0, [{"student_id": a, "status": "Present"}], key="first")[0] == 200
+    # A second teacher still on revision 0 marks the same student differently, plus another student.
+    status, body = sync(client, 0, [{"student_id": a, "status": "Absent Informed"}, {"student_id": c, "status": "Present"}], key="second")
+    assert status == 409
+    assert body["revision"] == 1
+    assert body["conflicts"] == [{"student_id": a, "status": "Present", "revision": 1}]
+    assert marks(db) == {a: ("Present", 1)}
+    # The 409 is not stored against the key, so the client can resolve it and retry.
+    status, body = sync(client, 1, [{"student_id": a, "status": "Absent Informed"}, {"student_id": c, "status": "Present"}], key="second")
+    assert (status, body["revision"]) == (200, 2)
+
+
+def test_changes_to_other_students_merge(client, db, students):
+    a, b, _ = students
+    sync(client, 0, [{"student_id": a, "status": "Present"}])
+    status, body = sync(client, 0, [{"student_id": a, "status": "Present"}, {"student_id": b, "status": "Absent Uninformed"}])
+    assert (status, body["saved"], body["revision"]) == (200, 1, 2)
+    assert marks(db) == {a: ("Present", 1), b: ("Absent Uninformed", 2)}
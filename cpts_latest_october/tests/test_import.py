@@ -0,0 +1,38 @@
+import io
+
+import app as cpts
+
+
+def upload(client, kind, text):
+    return client.post(f"/api/import/{kind}", data={"file": (io.BytesIO(text.encode()), f"{kind}.csv")}, content_type="multipart/form-data")
+
+
+def test_bad_rows_are_reported_by_line_and_the_rest_saved(client, db, monkeypatch):
+    monkeypatch.setitem(cpts.app.config, "IMPORT_CHUNK_SIZE", 2)  # the good rows straddle chunk boundaries
+    res = upload(client, "attendance", "\n".join([
+        "date,subject_id,roll_no,status",
+        "03-06-2024,1,24820001,P",
+        "2024/06/03,1,24820002,P",
+        "03-06-2024,1,24820002,AI",
+        "03-06-2024,1,99999999,P",
+        "",
+        "03-06-2024,1,24820003,Late",
+        "04-06-2024,1,24820003,AU",
+    ]))
+    body = res.get_json()
+    assert res.status_code == 200
+    assert (body["ok"], body["rows"], body["saved"], body["failed"]) == (False, 6, 3, 3)
+    assert [e["line"] for e in body["errors"]] == [3, 5, 7]
+    assert "2024/06/03" in body["errors"][0]["error"]
+    assert "99999999" in body["errors"][1]["error"]
+    assert "Late" in body["errors"][2]["error"]
+    saved = db.execute("SELECT date, s.roll_no, status FROM attendance a JOIN students s ON s.id = a.student_id ORDER BY date, roll_no").fetchall()
+    assert [tuple(r) for r in saved] == [("2024-06-03", "24820001", "Present"), ("2024-06-03", "24820002", "Absent Informed"), ("2024-06-04", "24820003", "Absent Uninformed")]
+
+
+def test_nothing_saved_is_a_400(client, db):
+    res = upload(client, "attendance", "date,subject_id,roll_no,status\n03-06-2024,99,24820001,P\n")
+    body = res.get_json()
+    assert res.status_code == 400
+    assert (body["saved"], body["errors"]) == (0, [{"line": 2, "error": "Unknown subject 99"}])
+    assert db.execute("SELECT COUNT(*) FROM attendance").fetchone()[0] == 0